@@ -0,0 +1,179 @@
+"""
+Allocation search over the weight simplex.
+
+Without rebalancing a DCA portfolio is linear in its weights: each ticker's buys
+depend only on its own price and signals, so the daily value curve of weights w is
+w @ (value curve of a 100% position in each ticker). One pass over the aligned panel
+builds those per-ticker curves for Standard and Smart DCA; every candidate weighting
+is then a matrix product, so thousands are scored per second.
+"""
+import hashlib
+import json
+import logging
+import time
+import numpy as np
+import pandas as pd
+from backtest import contribution_schedule
+from market_panel import MarketPanel
+from metrics import drawdowns
+from perf import span, incr
+from strategy_rules import STANDARD_RULES, evaluate_strategies, pro_rules, referenced_fields
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SAMPLES = 5000
+# Candidates scored per matrix product (bounds the samples x days temporaries)
+SAMPLE_CHUNK = 512
+# Bump to invalidate cached allocation results by hand
+ALLOCATION_CACHE_VERSION = 1
+
+def sample_weights(n_tickers, samples=DEFAULT_SAMPLES, seed=0):
+    """
+    Candidate weightings (rows sum to 1): every single-ticker portfolio, equal weight,
+    then uniform draws from the simplex (Dirichlet(1)) up to `samples` rows.
+    """
+    fixed = np.vstack([np.eye(n_tickers), np.full((1, n_tickers), 1 / n_tickers)])
+    rng = np.random.default_rng(seed)
+    drawn = rng.dirichlet(np.ones(n_tickers), size=max(samples - len(fixed), 0))
+    return np.vstack([fixed, drawn])[:max(samples, len(fixed))]
+
+def allocation_basis(panel, monthly_budget, initial_investment=0, contribution_frequency='monthly', spec=None):
+    """
+    Daily value and invested curves of a 100% position in each ticker, for Standard
+    and the rule table `spec` (default: get_strategy_pro's rules).
+    Returns {'dates', 'tickers', 'value': (2 x days x tickers), 'invested': (2 x days x tickers)} or None.
+    """
+    spec = spec or pro_rules()
+    contrib_dates, positions = contribution_schedule(panel, contribution_frequency)
+    if contrib_dates is None: return None
+    period_budget = monthly_budget if contribution_frequency == 'monthly' else monthly_budget / 4.33
+
+    inputs = panel.take(referenced_fields(spec), positions)
+    prices = inputs['Close']                                              # (periods x tickers)
+    spend = period_budget * evaluate_strategies([STANDARD_RULES, spec], inputs, panel.tickers)
+    start_units = initial_investment / prices[0] if initial_investment > 0 else np.zeros(len(panel.tickers))
+    units = start_units + np.cumsum(spend / prices, axis=1)
+    invested = initial_investment + np.cumsum(spend, axis=1)
+
+    # Holdings are constant between contribution bars (as in backtest.daily_valuation)
+    common = panel.common_positions()
+    effective = positions.min(axis=1)
+    common = common[common >= effective[0]]
+    period = np.searchsorted(effective, common, side='right') - 1
+    closes = np.asarray(panel.field('Close'))[common]
+    return {
+        'dates': panel.dates[common],
+        'tickers': list(panel.tickers),
+        'value': units[:, period] * closes,
+        'invested': invested[:, period]
+    }
+
+def evaluate_weights(basis, weights):
+    """
+    Metrics of every weighting (rows of `weights`, summing to 1) from allocation_basis.
+    Returns {metric: (samples,) array}: roi / max drawdown (%) of Standard and Smart,
+    alpha_pp (Smart ROI - Standard ROI) and capital_deployed (Smart vs Standard, %).
+    """
+    weights = np.atleast_2d(np.asarray(weights, dtype=float))
+    out = {k: np.empty(len(weights)) for k in ['std_roi', 'std_mdd', 'smart_roi', 'smart_mdd']}
+    invested_final = {}
+    for lo in range(0, len(weights), SAMPLE_CHUNK):
+        w = weights[lo:lo + SAMPLE_CHUNK]
+        for s, name in enumerate(['std', 'smart']):
+            values = w @ basis['value'][s].T                             # (chunk x days)
+            invested = w @ basis['invested'][s][-1]
+            invested_final.setdefault(name, []).append(invested)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                out[f'{name}_roi'][lo:lo + len(w)] = np.where(invested > 0, (values[:, -1] - invested) / invested * 100, np.nan)
+            out[f'{name}_mdd'][lo:lo + len(w)] = drawdowns(values, basis['dates'])[0]
+    std_inv, smart_inv = (np.concatenate(invested_final[n]) for n in ['std', 'smart'])
+    out['alpha_pp'] = out['smart_roi'] - out['std_roi']
+    out['mdd_change_pp'] = out['smart_mdd'] - out['std_mdd']
+    out['capital_deployed'] = smart_inv / std_inv * 100
+    return out
+
+def efficient_set(df, ret='smart_roi', risk='smart_mdd'):
+    """Rows no other row beats on both return and drawdown (drawdowns are negative: higher is better)."""
+    order = df.sort_values([risk, ret], ascending=[False, False], kind='stable')
+    best = order[ret].cummax().shift(fill_value=-np.inf)
+    return order.loc[order[ret] > best]
+
+def _cache_key(panel, monthly_budget, initial_investment, contribution_frequency, spec, samples, seed, current):
+    from result_cache import strategy_code_version
+    payload = {
+        'kind': 'allocation',
+        'version': ALLOCATION_CACHE_VERSION,
+        'data': panel.fingerprint(),
+        'budget': float(monthly_budget),
+        'initial': float(initial_investment),
+        'frequency': contribution_frequency,
+        'spec': spec,
+        'samples': int(samples),
+        'seed': seed,
+        'current': sorted(current.items()) if current else None,
+        'code': strategy_code_version()
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+def optimize_allocation(data, monthly_budget, samples=DEFAULT_SAMPLES, seed=0, initial_investment=0,
+                        contribution_frequency='monthly', spec=None, current=None, cache=True):
+    """
+    Score `samples` weightings of the panel's tickers (see sample_weights; `current`,
+    a {ticker: weight} dict, is scored too) over the panel's whole period.
+    Rebalancing is not modelled: it makes value curves nonlinear in the weights.
+
+    data: MarketPanel or fetch_data dict.
+    cache: True (shared result cache), a ResultCache, or False. Results are keyed by
+    the panel's content, so one ticker set and range is computed once.
+    Returns {'samples': DataFrame (weights in % per ticker + evaluate_weights metrics,
+             'current' flag), 'efficient': the return-vs-drawdown frontier,
+             'best_alpha': row with the highest Smart alpha, 'current': its row or None,
+             'per_second': weightings scored per second} or None without data.
+    """
+    panel = data if isinstance(data, MarketPanel) else MarketPanel.from_data_map(data)
+    if len(panel.tickers) == 0: return None
+    spec = spec or pro_rules()
+
+    store = key = None
+    if cache:
+        from result_cache import get_result_cache
+        store = get_result_cache() if cache is True else cache
+        key = _cache_key(panel, monthly_budget, initial_investment, contribution_frequency, spec, samples, seed, current)
+        result = store.get(key)
+        if result is not None:
+            incr("allocation.cache_hit")
+            return result
+
+    with span("allocation.optimize", tickers=len(panel.tickers), samples=samples) as s:
+        t0 = time.perf_counter()
+        basis = allocation_basis(panel, monthly_budget, initial_investment, contribution_frequency, spec)
+        if basis is None: return None
+        weights = sample_weights(len(panel.tickers), samples, seed)
+        total = sum(current.get(t, 0) for t in panel.tickers) if current else 0
+        if total > 0:
+            weights = np.vstack([weights, [current.get(t, 0) / total for t in panel.tickers]])
+        metrics = evaluate_weights(basis, weights)
+        elapsed = time.perf_counter() - t0
+        s["days"] = len(basis['dates'])
+    incr("allocation.samples", len(weights))
+
+    df = pd.DataFrame(weights * 100, columns=panel.tickers)
+    for name, values in metrics.items():
+        df[name] = values
+    df['current'] = False
+    if total > 0:
+        df.loc[df.index[-1], 'current'] = True
+    frontier = efficient_set(df.dropna(subset=['smart_roi', 'smart_mdd']))
+    result = {
+        'samples': df,
+        'efficient': frontier,
+        'best_alpha': df.loc[df['alpha_pp'].idxmax()] if df['alpha_pp'].notna().any() else None,
+        'current': df.loc[df['current']].iloc[0] if df['current'].any() else None,
+        'per_second': len(weights) / elapsed if elapsed > 0 else float('inf')
+    }
+    if store is not None:
+        try:
+            store.put(key, result)
+        except OSError as e:
+            logger.warning("Could not store allocation result: %s", e)
+    return result
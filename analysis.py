@@ -1,11 +1,16 @@
+import math
 import pandas as pd
 import numpy as np
+from perf import timed, incr
 
+@timed("analysis.calculate_indicators")
 def calculate_indicators_pro(df):
     """
     Enhanced indicator calculation.
     Assumes df has ['Close', 'High', 'Low'] columns.
     """
+    incr("analysis.rows_processed", len(df))
+
     # 1. Standard RSI
     delta = df['Close'].diff()
     gain = delta.where(delta > 0, 0)
@@ -50,6 +55,57 @@ def calculate_indicators_pro(df):
         
     return df
 
+# === COMPACT FORM (process pools) ===
+# Columns calculate_indicators_pro adds, in order; Impulse travels as int8 codes
+INDICATOR_COLUMNS = ['RSI', 'MA20', 'STD20', 'BB_Upper', 'BB_Lower', 'BB_PctB', 'MA50', 'MA200', 'Dist_MA200',
+                     'MACD_Line', 'MACD_Signal', 'MACD_Hist', 'EMA13']
+IMPULSE_COLORS = ['Blue', 'Green', 'Red']
+
+def indicator_arrays(closes):
+    """
+    calculate_indicators_pro for a chunk of Close arrays, returned as plain arrays
+    (cheap to pickle): [(values (rows x INDICATOR_COLUMNS), impulse codes), ...].
+    """
+    out = []
+    for close in closes:
+        df = calculate_indicators_pro(pd.DataFrame({'Close': close}))
+        impulse = pd.Categorical(df['Impulse'], categories=IMPULSE_COLORS).codes.astype(np.int8)
+        out.append((df[INDICATOR_COLUMNS].to_numpy(dtype=float), impulse))
+    return out
+
+def attach_indicators(df, values, impulse):
+    """df plus indicator_arrays output, with the same columns as calculate_indicators_pro(df)."""
+    block = pd.DataFrame(values, index=df.index, columns=INDICATOR_COLUMNS)
+    block['Impulse'] = np.asarray(IMPULSE_COLORS, dtype=object)[impulse]
+    out = pd.concat([df.drop(columns=block.columns, errors='ignore'), block], axis=1)
+    out.columns.name = df.columns.name
+    return out
+
+# === WARM-UP REQUIREMENTS ===
+# Bars of history each indicator needs (including the bar itself) before its value is final.
+# Rolling windows need their full length; ewm(adjust=False) averages need enough bars for
+# the seed's remaining weight (1 - alpha)^n to fall below EMA_TOLERANCE.
+EMA_TOLERANCE = 1e-4
+
+def ema_horizon(alpha, tol=EMA_TOLERANCE):
+    return math.ceil(math.log(tol) / math.log(1 - alpha))
+
+_MACD_WARMUP = ema_horizon(2 / 27) + ema_horizon(2 / 10)  # slow EMA, then the signal EMA on top
+INDICATOR_WARMUP = {
+    'RSI': ema_horizon(1 / 14) + 1,  # the first bar has no change
+    'MA20': 20, 'STD20': 20, 'BB_Upper': 20, 'BB_Lower': 20, 'BB_PctB': 20,
+    'MA50': 50,
+    'MA200': 200, 'Dist_MA200': 200,
+    'MACD_Line': ema_horizon(2 / 27), 'MACD_Signal': _MACD_WARMUP, 'MACD_Hist': _MACD_WARMUP,
+    'EMA13': ema_horizon(2 / 14),
+    'Impulse': max(ema_horizon(2 / 14), _MACD_WARMUP) + 1  # compares with the previous bar
+}
+
+def warmup_bars(fields=None):
+    """Bars of history needed for the given indicators (default: all of calculate_indicators_pro)."""
+    fields = INDICATOR_WARMUP if fields is None else [f for f in fields if f in INDICATOR_WARMUP]
+    return max((INDICATOR_WARMUP[f] for f in fields), default=0)
+
 def get_strategy_pro(price, indicators, vix_val, ticker='VOO'):
     """
     vix_val: Current VIX index value (float)
@@ -121,6 +177,24 @@ def get_strategy_pro(price, indicators, vix_val, ticker='VOO'):
     
     return round(multiplier, 2), label
 
+# Tunable constants of get_strategy_pro (see strategy_rules.pro_rules)
+PRO_DEFAULT_PARAMS = {
+    'vix_floor': 20,         # Layer 1: VIX level where scaling starts
+    'vix_scale': 40,         # Layer 1: +1.0x per this many VIX points above the floor
+    'depth_scale': 2.5,      # Layer 2: multiplier added per 100% below MA200
+    'rsi_panic': 35,         # Layer 3: oversold threshold (QQQ uses rsi_panic_qqq)
+    'rsi_panic_qqq': 30,
+    'rsi_dip_band': 10,      # Layer 3: "buy the dip" zone above the panic threshold
+    'rsi_panic_mult': 1.3,
+    'rsi_dip_mult': 1.15,
+    'bb_mult': 1.2,          # Layer 3: price below the lower band
+    'rsi_high': 70,          # Layer 4: overbought threshold
+    'fade_red_mult': 0.6,
+    'fade_blue_mult': 0.8,
+    'floor': 0.5,            # Safety rail
+    'cap': 3.0
+}
+
 # --- V1: ORIGINAL BLUNT INSTRUMENT (For Backtesting Comparison) ---
 def get_strategy_v1(price, indicators, vix_val):
     if vix_val > 30: return 2.0, "V1: PANIC"
@@ -135,6 +209,22 @@ def get_strategy_v1(price, indicators, vix_val):
     if indicators.get('RSI', 50) > 85: return 0.6, "V1: EUPHORIA"
     return 1.0, "V1: STANDARD"
 
+def indicators_from_row(row):
+    """Build the indicator dict expected by the strategy functions from one DataFrame row."""
+    return {
+        'MA200': row.get('MA200', float('nan')),
+        'MA50': row.get('MA50', float('nan')),
+        'BB_Lower': row.get('BB_Lower', float('nan')),
+        'BB_Upper': row.get('BB_Upper', float('nan')),
+        'BB_PctB': row.get('BB_PctB', 0.5),
+        'Dist_MA200': row.get('Dist_MA200', 0),
+        'RSI': row.get('RSI', 50),
+        'MACD_Hist': row.get('MACD_Hist', 0),
+        'Impulse': row.get('Impulse', 'Blue'),
+        'TNX': row.get('TNX', 4.0),
+        'TNX_MA50': row.get('TNX_MA50', 4.0)
+    }
+
 # Backward compatibility - keep original function names for imports
 calculate_indicators = calculate_indicators_pro
 get_strategy_current = get_strategy_pro
@@ -1,8 +1,12 @@
 import streamlit as st
-import yfinance as yf
 import pandas as pd
 from config import COMMON_TICKERS, APP_STYLE
-from ui_pages import show_manifesto_page, show_dashboard_page, show_backtest_page
+from ui_pages import show_manifesto_page, show_dashboard_page, show_backtest_page, show_screener_page, show_perf_debug_panel
+from data_handler import validate_ticker
+from perf import DEBUG_PANEL, configure_logging
+
+# Quiet by default; SMART_DCA_LOG_LEVEL=INFO prints the per-span JSON logs
+configure_logging(default='WARNING')
 
 # --- 1. CONFIGURATION & STYLING ---
 st.set_page_config(
@@ -13,19 +17,6 @@ st.set_page_config(
 st.markdown(APP_STYLE, unsafe_allow_html=True)
 
 # --- 2. HELPER FUNCTIONS ---
-def validate_ticker(ticker):
-    """Checks if a ticker exists on Yahoo Finance."""
-    t = ticker.upper().strip()
-    if not t: return False, t
-    try:
-        # We fetch 5 days of history. If it's empty, the ticker likely doesn't exist.
-        hist = yf.Ticker(t).history(period="5d")
-        if hist.empty:
-            return False, t
-        return True, t
-    except Exception:
-        return False, t
-
 def add_ticker_to_portfolio():
     """Callback to add the typed ticker from text input."""
     t_raw = st.session_state.ticker_input_bar
@@ -57,7 +48,7 @@ def add_ticker_to_portfolio():
 with st.sidebar:
     page = st.radio(
         "Go to:",
-        ["The Manifesto", "Action Dashboard", "Backtest Performance"]
+        ["The Manifesto", "Action Dashboard", "Backtest Performance", "Universe Screener"]
     )
     st.markdown("---")
     st.header("Smart Portfolio")
@@ -152,4 +143,9 @@ if page == "The Manifesto":
 elif page == "Action Dashboard":
     show_dashboard_page(tickers, weights_dict)
 elif page == "Backtest Performance":
-    show_backtest_page(tickers, weights_dict)
\ No newline at end of file
+    show_backtest_page(tickers, weights_dict)
+elif page == "Universe Screener":
+    show_screener_page()
+
+if DEBUG_PANEL:
+    show_perf_debug_panel()
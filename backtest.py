@@ -1,84 +1,243 @@
+import numpy as np
 import pandas as pd
 from analysis import get_strategy_v1, get_strategy_current
+from market_panel import MarketPanel, IMPULSE_CODES
+from perf import timed, incr
 
-def run_portfolio_backtest(tickers_data, weights, monthly_budget, initial_investment=0, enable_rebalancing=False, contribution_frequency='monthly'):
+# Indicator inputs for the strategy functions and the default used when a column is missing
+INDICATOR_DEFAULTS = {
+    'MA200': float('nan'),
+    'MA50': float('nan'),
+    'BB_Lower': float('nan'),
+    'BB_Upper': float('nan'),
+    'BB_PctB': 0.5,
+    'Dist_MA200': 0,
+    'RSI': 50,
+    'MACD_Hist': 0,
+    'TNX': 4.0,
+    'TNX_MA50': 4.0
+}
+
+def _contribution_dates(common_index, contribution_frequency):
+    if contribution_frequency == 'weekly':
+        return common_index.to_series().resample('W').last().index
+    return common_index.to_series().resample('ME').last().index
+
+def contribution_schedule(panel, contribution_frequency='monthly'):
+    """
+    Contribution dates and, per ticker, the panel position of the bar used on each date.
+    Returns (contrib_dates, positions) with positions shaped (dates x tickers), or (None, None).
+    """
+    common = panel.common_positions()
+    if len(panel.tickers) == 0 or len(common) == 0: return None, None
+    contrib_dates = _contribution_dates(panel.dates[common], contribution_frequency)
+    positions = np.column_stack([panel.nearest_positions(t, contrib_dates) for t in panel.tickers])
+    return contrib_dates, positions
+
+def _ticker_columns(panel, t, positions):
+    """Gather every input the strategies need for one ticker at the given date positions."""
+    cols = {'Close': panel.series('Close', t)[positions]}
+    cols['VIX'] = panel.series('VIX', t)[positions] if panel.has_field('VIX') else np.full(len(positions), 20)
+    for name in INDICATOR_DEFAULTS:
+        if panel.has_field(name):
+            cols[name] = panel.series(name, t)[positions]
+    codes = panel.impulse[positions, panel.ticker_index(t)]
+    cols['Impulse'] = [IMPULSE_CODES[c] if c >= 0 else 'Blue' for c in codes]
+    return cols
+
+@timed("backtest.run_portfolio_backtest")
+def run_portfolio_backtest(tickers_data, weights, monthly_budget, initial_investment=0, enable_rebalancing=False, contribution_frequency='monthly', daily=False, checkpoint=False, resume=None):
+    """
+    tickers_data: {ticker: DataFrame} from fetch_data, or a MarketPanel (fetch_data(..., as_panel=True)).
+    The dict form is aligned into a panel first; results are identical either way.
+    daily=True adds a 'daily' mark-to-market curve (see daily_valuation).
+    checkpoint=True adds a JSON-serializable 'checkpoint'; pass it back as resume= to
+    simulate only the periods after it (see iter_portfolio_backtest).
+    """
+    res = None
+    for res in iter_portfolio_backtest(tickers_data, weights, monthly_budget, initial_investment,
+                                       enable_rebalancing, contribution_frequency, chunk_periods=None, daily=daily,
+                                       checkpoint=checkpoint, resume=resume):
+        pass
+    return res
+
+def daily_valuation(panel, positions, holdings_hist, invested_hist):
+    """
+    Mark-to-market curves on every common trading day from the first contribution on.
+
+    positions: (periods x tickers) bar positions used for each contribution (contribution_schedule)
+    holdings_hist: {key: (periods x tickers) units held after each period's buys/rebalance}
+    invested_hist: {key: (periods,) cumulative amount invested after each period}
+    Holdings are constant from one contribution bar to the next, so every value is holdings x that day's close.
+    """
+    common = panel.common_positions()
+    effective = positions.min(axis=1)
+    common = common[common >= effective[0]]
+    period = np.searchsorted(effective, common, side='right') - 1
+    closes = np.asarray(panel.field('Close'))[common]
+    out = {'dates': panel.dates[common]}
+    for k, h in holdings_hist.items():
+        out[f'{k}_val'] = (np.asarray(h)[period] * closes).sum(axis=1)
+        out[f'{k}_invested'] = np.asarray(invested_hist[k])[period]
+    return out
+
+def _backtest_result(contrib_dates, hist, inv, rebalancing_events, done, daily=None):
+    res = {
+        'dates': contrib_dates[:done],
+        # Standard
+        'std_val': hist['std'][:done], 'std_invested': inv['std'],
+        # V1
+        'v1_val': hist['v1'][:done], 'v1_invested': inv['v1'],
+        # Current
+        'smart_val': hist['cur'][:done], 'smart_invested': inv['cur'], # Mapped to 'smart' for App UI
+        'cur_val': hist['cur'][:done], 'cur_invested': inv['cur'],     # Explicit key for comparison script
+        'rebalancing_events': list(rebalancing_events),
+        'progress': (done, len(contrib_dates)),
+        'complete': done == len(contrib_dates)
+    }
+    if daily is not None:
+        res['daily'] = daily
+    return res
+
+# === CHECKPOINTS ===
+# Bump when the checkpoint layout changes; older checkpoints are then refused
+CHECKPOINT_VERSION = 1
+_CURVE_KEYS = [f'{k}_{part}' for k in ['std', 'v1', 'cur'] for part in ('val', 'invested')]
+
+def _checkpoint_params(tickers, norm_weights, monthly_budget, initial_investment, enable_rebalancing, contribution_frequency):
+    return {
+        'tickers': list(tickers),
+        'weights': [float(norm_weights[t]) for t in tickers],
+        'budget': float(monthly_budget),
+        'initial': float(initial_investment),
+        'rebalancing': bool(enable_rebalancing),
+        'frequency': contribution_frequency
+    }
+
+def _check_resume(resume, panel, params, daily):
+    if resume.get('version') != CHECKPOINT_VERSION:
+        raise ValueError("Checkpoint was written by another backtest version; rerun in full")
+    if resume['params'] != params:
+        raise ValueError("Checkpoint belongs to a backtest with other tickers, weights or options")
+    if daily and 'daily' not in resume:
+        raise ValueError("Checkpoint has no daily curves; it was written without daily=True")
+    common = panel.common_positions()
+    if len(common) == 0 or panel.dates[common[0]] > pd.Timestamp(resume['resume_from']):
+        raise ValueError(f"Panel must start on or before the checkpoint's resume_from ({resume['resume_from']})")
+
+def _settled_periods(panel, positions):
+    """
+    Leading contribution periods that later bars cannot change: every ticker's bar is
+    followed by another one, so no newer bar can be nearer to the contribution date.
+    """
+    settled = (positions < panel.last_positions()[None, :]).all(axis=1)
+    return len(settled) if settled.all() else int(np.argmin(settled))
+
+def iter_portfolio_backtest(tickers_data, weights, monthly_budget, initial_investment=0, enable_rebalancing=False, contribution_frequency='monthly', chunk_periods=24, daily=False, checkpoint=False, resume=None):
+    """
+    Same simulation as run_portfolio_backtest, yielding a partial result every
+    chunk_periods contribution periods (None = only the final result).
+    With daily=True the final result also carries the daily mark-to-market curves.
+
+    Partial results have the final result's keys, cut at the periods simulated so far,
+    plus 'progress' (done, total) and 'complete'. Stop iterating to abandon the run.
+
+    checkpoint=True: the final result carries 'checkpoint', the state after the last
+    period whose bars are final (holdings, invested totals, period count and the
+    history so far; the rebalance schedule follows from the period count).
+    resume=checkpoint: continue from it, simulating only later periods. The panel needs
+    bars from checkpoint['resume_from'] on; with the same bars the result is identical
+    to a full rerun.
+    """
     total_weight = sum(weights.values())
-    if total_weight == 0: return None
+    if total_weight == 0: return
     norm_weights = {k: v/total_weight for k,v in weights.items()}
-    
+
     period_budget = monthly_budget if contribution_frequency == 'monthly' else monthly_budget / 4.33
-    
-    common_index = None
-    for t, df in tickers_data.items():
-        if common_index is None: common_index = df.index
-        else: common_index = common_index.intersection(df.index)
-    
-    if common_index is None or len(common_index) == 0: return None
-    
-    if contribution_frequency == 'weekly':
-        contrib_dates = common_index.to_series().resample('W').last().index
+
+    if isinstance(tickers_data, MarketPanel):
+        panel = tickers_data
     else:
-        contrib_dates = common_index.to_series().resample('ME').last().index
-    
-    # Init Histories for STD, V1, CURRENT
-    hist = {k: [] for k in ['std', 'v1', 'cur']}
-    inv = {k: 0.0 for k in ['std', 'v1', 'cur']}
-    holdings = {k: {t: 0.0 for t in tickers_data} for k in ['std', 'v1', 'cur']}
-    
-    # Initial Investment
-    if initial_investment > 0:
-        first_date = contrib_dates[0]
-        for t in tickers_data.keys():
-            if t not in tickers_data: continue
-            try:
-                idx = tickers_data[t].index.get_indexer([first_date], method='nearest')[0]
-                price = tickers_data[t].iloc[idx]['Close']
+        if not tickers_data or any(df.empty for df in tickers_data.values()): return
+        panel = MarketPanel.from_data_map(tickers_data)
+    tickers = panel.tickers
+    params = _checkpoint_params(tickers, norm_weights, monthly_budget, initial_investment,
+                                enable_rebalancing, contribution_frequency)
+
+    # Nearest bar per ticker for every contribution date, resolved once up front
+    contrib_dates, positions = contribution_schedule(panel, contribution_frequency)
+    if contrib_dates is None: return
+    offset = 0
+    if resume is not None:
+        _check_resume(resume, panel, params, daily)
+        new = contrib_dates > pd.Timestamp(resume['dates'][-1])
+        contrib_dates, positions = contrib_dates[new], positions[new]
+        offset = resume['periods']
+    incr("backtest.steps", len(contrib_dates) * len(tickers))
+    cols = {t: _ticker_columns(panel, t, positions[:, j]) for j, t in enumerate(tickers)}
+
+    rebalance_every = 12 if contribution_frequency == 'monthly' else 52
+    hold_hist = {k: [] for k in ['std', 'v1', 'cur']}
+    inv_hist = {k: [] for k in ['std', 'v1', 'cur']}
+
+    if resume is None:
+        all_dates = contrib_dates
+        # Init Histories for STD, V1, CURRENT
+        hist = {k: [] for k in ['std', 'v1', 'cur']}
+        inv = {k: 0.0 for k in ['std', 'v1', 'cur']}
+        holdings = {k: {t: 0.0 for t in tickers} for k in ['std', 'v1', 'cur']}
+
+        # Initial Investment
+        if initial_investment > 0:
+            for t in tickers:
+                price = cols[t]['Close'][0]
                 alloc = initial_investment * norm_weights[t]
                 for k in ['std', 'v1', 'cur']:
                     holdings[k][t] += alloc / price
                     inv[k] += alloc
-            except: continue
-    
-    rebalancing_events = []
-    
-    for i, date in enumerate(contrib_dates):
+
+        rebalancing_events = []
+    else:
+        all_dates = pd.DatetimeIndex(resume['dates']).append(contrib_dates)
+        hist = {k: list(resume['values'][k]) for k in ['std', 'v1', 'cur']}
+        inv = dict(resume['invested'])
+        holdings = {k: dict(zip(tickers, resume['holdings'][k])) for k in ['std', 'v1', 'cur']}
+        rebalancing_events = [pd.Timestamp(d) for d in resume['rebalancing_events']]
+        if daily:
+            # The checkpoint's holdings value the days up to the first new contribution
+            through = panel.dates.get_loc(pd.Timestamp(resume['resume_from']))
+            positions_daily = np.vstack([np.full((1, len(tickers)), through), positions])
+            for k in ['std', 'v1', 'cur']:
+                hold_hist[k].append(list(resume['holdings'][k]))
+                inv_hist[k].append(resume['invested'][k])
+
+    settled = _settled_periods(panel, positions) if checkpoint else 0
+    state = None
+
+    for n, date in enumerate(contrib_dates):
+        i = offset + n
         vals = {k: 0.0 for k in ['std', 'v1', 'cur']}
-        
-        for t in tickers_data.keys():
-            if t not in tickers_data: continue
-            try:
-                idx = tickers_data[t].index.get_indexer([date], method='nearest')[0]
-                row = tickers_data[t].iloc[idx]
-                price = row['Close']
-            except: continue
-            
+
+        for t in tickers:
+            c = cols[t]
+            price = c['Close'][n]
+
             # --- Indicators ---
-            vix_val = row.get('VIX', 20)
-            inds = {
-                'MA200': row.get('MA200', float('nan')), 
-                'MA50': row.get('MA50', float('nan')), 
-                'BB_Lower': row.get('BB_Lower', float('nan')), 
-                'BB_Upper': row.get('BB_Upper', float('nan')),
-                'BB_PctB': row.get('BB_PctB', 0.5),
-                'Dist_MA200': row.get('Dist_MA200', 0),
-                'RSI': row.get('RSI', 50), 
-                'MACD_Hist': row.get('MACD_Hist', 0),
-                'Impulse': row.get('Impulse', 'Blue'),
-                'TNX': row.get('TNX', 4.0),
-                'TNX_MA50': row.get('TNX_MA50', 4.0)
-            }
-            
+            vix_val = c['VIX'][n]
+            inds = {name: (c[name][n] if name in c else default) for name, default in INDICATOR_DEFAULTS.items()}
+            inds['Impulse'] = c['Impulse'][n]
+
             base_alloc = period_budget * norm_weights[t]
-            
+
             # 1. Standard
             holdings['std'][t] += base_alloc / price
             inv['std'] += base_alloc
-            
+
             # 2. V1 (Original)
             m1, _ = get_strategy_v1(price, inds, vix_val)
             holdings['v1'][t] += (base_alloc * m1) / price
             inv['v1'] += (base_alloc * m1)
-            
+
             # 3. Current (Smart Impulse with Pro improvements)
             m_cur, _ = get_strategy_current(price, inds, vix_val, ticker=t)
             holdings['cur'][t] += (base_alloc * m_cur) / price
@@ -86,34 +245,240 @@ def run_portfolio_backtest(tickers_data, weights, monthly_budget, initial_invest
 
             for k in ['std', 'v1', 'cur']:
                 vals[k] += holdings[k][t] * price
-        
+
         # Rebalancing
-        if enable_rebalancing and i % (12 if contribution_frequency == 'monthly' else 52) == 0 and i > 0:
-            rebalanced = False
-            totals = {k: sum(holdings[k][t] * tickers_data[t].iloc[tickers_data[t].index.get_indexer([date], method='nearest')[0]]['Close'] for t in tickers_data if t in holdings[k]) for k in ['std', 'v1', 'cur']}
-            
-            for t in tickers_data:
-                try:
-                    idx = tickers_data[t].index.get_indexer([date], method='nearest')[0]
-                    price = tickers_data[t].iloc[idx]['Close']
-                    for k in ['std', 'v1', 'cur']:
-                        if totals[k] > 0:
-                            holdings[k][t] = (totals[k] * norm_weights[t]) / price
-                    rebalanced = True
-                except: continue
-            if rebalanced: rebalancing_events.append(date)
-            
+        if enable_rebalancing and i % rebalance_every == 0 and i > 0:
+            totals = {k: sum(holdings[k][t] * cols[t]['Close'][n] for t in tickers) for k in ['std', 'v1', 'cur']}
+
+            for t in tickers:
+                price = cols[t]['Close'][n]
+                for k in ['std', 'v1', 'cur']:
+                    if totals[k] > 0:
+                        holdings[k][t] = (totals[k] * norm_weights[t]) / price
+            rebalancing_events.append(date)
+
         for k in ['std', 'v1', 'cur']:
             hist[k].append(vals[k])
-        
+            if daily:
+                hold_hist[k].append([holdings[k][t] for t in tickers])
+                inv_hist[k].append(inv[k])
+
+        if n + 1 == settled:
+            state = {
+                'holdings': {k: [float(holdings[k][t]) for t in tickers] for k in ['std', 'v1', 'cur']},
+                'invested': {k: float(inv[k]) for k in ['std', 'v1', 'cur']},
+                'rebalancing_events': len(rebalancing_events),
+                'through': panel.dates[positions[n].min()]
+            }
+
+        if chunk_periods and (i + 1) % chunk_periods == 0 and i + 1 < len(all_dates):
+            yield _backtest_result(all_dates, hist, inv, rebalancing_events, i + 1)
+
+    curves = None
+    if daily:
+        if resume is None:
+            curves = daily_valuation(panel, positions, hold_hist, inv_hist)
+        else:
+            new_curves = daily_valuation(panel, positions_daily, hold_hist, inv_hist)
+            curves = {'dates': pd.DatetimeIndex(resume['daily']['dates']).append(new_curves['dates'])}
+            for key in _CURVE_KEYS:
+                curves[key] = np.concatenate([np.asarray(resume['daily'][key], dtype=float), new_curves[key]])
+        curves['smart_val'], curves['smart_invested'] = curves['cur_val'], curves['cur_invested']
+    res = _backtest_result(all_dates, hist, inv, rebalancing_events, len(all_dates), curves)
+    if checkpoint:
+        res['checkpoint'] = _make_checkpoint(params, offset + settled, all_dates, hist, rebalancing_events,
+                                             state, curves) if state else resume
+    yield res
+
+def _make_checkpoint(params, periods, all_dates, hist, rebalancing_events, state, curves):
+    through = state['through']
+    ckpt = {
+        'version': CHECKPOINT_VERSION,
+        'params': params,
+        'periods': periods,
+        'dates': [d.strftime('%Y-%m-%d') for d in all_dates[:periods]],
+        'values': {k: [float(v) for v in hist[k][:periods]] for k in ['std', 'v1', 'cur']},
+        'holdings': state['holdings'],
+        'invested': state['invested'],
+        'rebalancing_events': [d.strftime('%Y-%m-%d') for d in rebalancing_events[:state['rebalancing_events']]],
+        # First bar a resumed run needs: the last settled contribution's earliest bar
+        'resume_from': through.strftime('%Y-%m-%d')
+    }
+    if curves is not None:
+        before = np.asarray(curves['dates'] < through)
+        ckpt['daily'] = {'dates': [d.strftime('%Y-%m-%d') for d in curves['dates'][before]]}
+        ckpt['daily'].update({key: np.asarray(curves[key])[before].tolist() for key in _CURVE_KEYS})
+    return ckpt
+
+@timed("backtest.run_strategy_backtest")
+def run_strategy_backtest(tickers_data, weights, monthly_budget, strategies, initial_investment=0, enable_rebalancing=False, contribution_frequency='monthly'):
+    """
+    Backtest any number of rule-table strategies (see strategy_rules) in one pass.
+
+    strategies: {name: rule_table}
+    Returns {'dates', 'names', 'values': {name: [...]}, 'invested': {name: total},
+             'invested_curve': {name: [...]}, 'rebalancing_events'}.
+    """
+    from strategy_rules import evaluate_strategies, referenced_fields
+
+    total_weight = sum(weights.values())
+    if total_weight == 0 or not strategies: return None
+
+    panel = tickers_data if isinstance(tickers_data, MarketPanel) else MarketPanel.from_data_map(tickers_data)
+    contrib_dates, positions = contribution_schedule(panel, contribution_frequency)
+    if contrib_dates is None: return None
+    tickers = panel.tickers
+    names = list(strategies)
+    incr("backtest.steps", len(contrib_dates) * len(tickers) * len(names))
+
+    period_budget = monthly_budget if contribution_frequency == 'monthly' else monthly_budget / 4.33
+    norm_w = np.array([weights.get(t, 0) / total_weight for t in tickers])
+
+    fields = set().union(*(referenced_fields(strategies[n]) for n in names))
+    inputs = panel.take(fields, positions)
+    prices = inputs['Close']                                    # (dates x tickers)
+    mults = evaluate_strategies([strategies[n] for n in names], inputs, tickers)  # (strategies x dates x tickers)
+
+    spend = period_budget * norm_w * mults
+    buys = spend / prices
+    start_units = initial_investment * norm_w / prices[0] if initial_investment > 0 else np.zeros(len(tickers))
+    invested_curve = (initial_investment if initial_investment > 0 else 0.0) + np.cumsum(spend.sum(axis=2), axis=1)
+
+    rebalancing_events = []
+    if not enable_rebalancing:
+        holdings = start_units + np.cumsum(buys, axis=1)
+        values = (holdings * prices).sum(axis=2)
+    else:
+        rebalance_every = 12 if contribution_frequency == 'monthly' else 52
+        values = np.empty(mults.shape[:2])
+        holdings = np.broadcast_to(start_units, (len(names), len(tickers))).copy()
+        for i, date in enumerate(contrib_dates):
+            holdings += buys[:, i]
+            values[:, i] = (holdings * prices[i]).sum(axis=1)
+            if i % rebalance_every == 0 and i > 0:
+                totals = values[:, i:i + 1]
+                holdings = np.where(totals > 0, totals * norm_w / prices[i], holdings)
+                rebalancing_events.append(date)
+
     return {
         'dates': contrib_dates,
-        # Standard
-        'std_val': hist['std'], 'std_invested': inv['std'],
-        # V1
-        'v1_val': hist['v1'], 'v1_invested': inv['v1'],
-        # Current
-        'smart_val': hist['cur'], 'smart_invested': inv['cur'], # Mapped to 'smart' for App UI
-        'cur_val': hist['cur'], 'cur_invested': inv['cur'],     # Explicit key for comparison script
+        'names': names,
+        'values': {n: values[k].tolist() for k, n in enumerate(names)},
+        'invested': {n: float(invested_curve[k, -1]) for k, n in enumerate(names)},
+        'invested_curve': {n: invested_curve[k].tolist() for k, n in enumerate(names)},
         'rebalancing_events': rebalancing_events
-    }
\ No newline at end of file
+    }
+
+# === EVENT-DRIVEN TRIGGERS ===
+# Each trigger is a named list of strategy_rules conditions, checked on every trading day.
+# 'Multiplier' is the strategy multiplier of that day (get_strategy_pro's rule table by default).
+DEFAULT_TRIGGERS = [
+    {'name': 'multiplier', 'when': [('Multiplier', '>=', 1.5)]},
+    {'name': 'vix_spike', 'when': [('VIX', '>=', 30)]},
+    {'name': 'bb_breakdown', 'when': [('BB_PctB', '<', 0)]}
+]
+
+@timed("backtest.run_trigger_backtest")
+def run_trigger_backtest(tickers_data, weights, monthly_budget, triggers=None, strategy=None, reserve_pct=1.0,
+                         max_deploy_pct=0.5, max_deploy_amount=None, cooldown_days=5, initial_investment=0,
+                         contribution_frequency='monthly'):
+    """
+    Cash-reserve strategy that deploys on trigger events, scanned on every common trading day.
+
+    Contributions arrive on the usual schedule; reserve_pct of each goes to a cash sleeve per
+    ticker and the rest is invested that day. On a day where any trigger fires for a ticker,
+    max_deploy_pct of its sleeve (at most max_deploy_amount) is invested at that day's close,
+    then the ticker waits cooldown_days trading days before it can deploy again.
+
+    Triggers are evaluated as (days x tickers) arrays in one pass; only days with an event
+    are walked in order to track cash and cooldowns.
+    Returns run_strategy_backtest-style output on daily dates ('Standard' vs 'Trigger'; values
+    include idle cash) plus 'cash', 'deployed' and an 'events' DataFrame (date, ticker, trigger, amount).
+    """
+    from strategy_rules import compile_conditions, compile_strategy, condition_fields, pro_rules, referenced_fields
+
+    total_weight = sum(weights.values())
+    if total_weight == 0: return None
+    panel = tickers_data if isinstance(tickers_data, MarketPanel) else MarketPanel.from_data_map(tickers_data)
+    contrib_dates, positions = contribution_schedule(panel, contribution_frequency)
+    if contrib_dates is None: return None
+    tickers = panel.tickers
+    triggers = DEFAULT_TRIGGERS if triggers is None else triggers
+    strategy = strategy or pro_rules()
+
+    common = panel.common_positions()
+    common = common[common >= positions.min(axis=1)[0]]
+    days = panel.dates[common]
+    n_days = len(common)
+    incr("backtest.steps", n_days * len(tickers))
+
+    # Every field the triggers (and the strategy behind 'Multiplier') read, for all days at once
+    fields = {'Close'}.union(*(condition_fields(t['when']) for t in triggers))
+    needs_mult = 'Multiplier' in fields
+    fields.discard('Multiplier')
+    if needs_mult: fields |= referenced_fields(strategy)
+    inputs = panel.take(fields, np.broadcast_to(common[:, None], (n_days, len(tickers))))
+    if needs_mult:
+        inputs['Multiplier'] = compile_strategy(strategy, tickers)(inputs)
+    closes = inputs['Close']
+
+    fired = np.stack([compile_conditions(t['when'], tickers)(inputs) for t in triggers]) if triggers \
+        else np.zeros((1, n_days, len(tickers)), dtype=bool)
+    event = fired.any(axis=0)
+    first_trigger = fired.argmax(axis=0)
+
+    # Contribution cash flows per day and ticker
+    norm_w = np.array([weights.get(t, 0) / total_weight for t in tickers])
+    period_budget = monthly_budget if contribution_frequency == 'monthly' else monthly_budget / 4.33
+    inflow = np.zeros(n_days)
+    np.add.at(inflow, np.searchsorted(common, positions.min(axis=1)), period_budget)
+    flows = inflow[:, None] * norm_w
+    reserve_in = flows * reserve_pct
+    spend = flows - reserve_in
+    if initial_investment > 0:
+        spend[0] += initial_investment * norm_w
+
+    # Walk the event days: cash available = reserve received so far - already deployed
+    cum_reserve = np.cumsum(reserve_in, axis=0)
+    deploy = np.zeros_like(flows)
+    deployed = np.zeros(len(tickers))
+    next_ok = np.zeros(len(tickers), dtype=int)
+    cap = np.inf if max_deploy_amount is None else max_deploy_amount
+    for d in np.flatnonzero(event.any(axis=1)):
+        ready = event[d] & (d >= next_ok)
+        if not ready.any(): continue
+        amount = np.where(ready, np.minimum((cum_reserve[d] - deployed) * max_deploy_pct, cap), 0.0)
+        amount[amount < 0.01] = 0.0
+        if not amount.any(): continue
+        deploy[d] = amount
+        deployed += amount
+        next_ok = np.where(amount > 0, d + cooldown_days, next_ok)
+
+    holdings = np.cumsum((spend + deploy) / closes, axis=0)
+    cash = cum_reserve - np.cumsum(deploy, axis=0)
+    trigger_val = (holdings * closes).sum(axis=1) + cash.sum(axis=1)
+    std_flows = flows.copy()
+    if initial_investment > 0:
+        std_flows[0] += initial_investment * norm_w
+    std_val = (np.cumsum(std_flows / closes, axis=0) * closes).sum(axis=1)
+    invested_curve = np.cumsum(inflow) + (initial_investment if initial_investment > 0 else 0.0)
+
+    d_idx, t_idx = np.nonzero(deploy)
+    events = pd.DataFrame({
+        'date': days[d_idx],
+        'ticker': np.asarray(tickers, dtype=object)[t_idx],
+        'trigger': np.asarray([t['name'] for t in triggers] or ['none'], dtype=object)[first_trigger[d_idx, t_idx]],
+        'amount': deploy[d_idx, t_idx]
+    })
+    names = ['Standard', 'Trigger']
+    return {
+        'dates': days,
+        'names': names,
+        'values': {'Standard': std_val.tolist(), 'Trigger': trigger_val.tolist()},
+        'invested': {n: float(invested_curve[-1]) for n in names},
+        'invested_curve': {n: invested_curve.tolist() for n in names},
+        'cash': cash.sum(axis=1).tolist(),
+        'deployed': float(deploy.sum()),
+        'events': events,
+        'rebalancing_events': []
+    }
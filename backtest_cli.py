@@ -0,0 +1,243 @@
+"""
+Headless portfolio backtests with columnar output.
+
+    python backtest_cli.py --portfolio VOO:60,QQQ:40 --range 2015-01-01:2024-12-31 --out results
+    python backtest_cli.py --portfolio VOO:100 --portfolio VOO:50,QQQ:50 --range 2010-01-01:2020-01-01 \
+        --range 2015-01-01:2025-01-01 --rebalance --frequency weekly --out results
+    python backtest_cli.py --batch runs.jsonl --out results --format csv
+
+Every --portfolio is run over every --range (with the shared options), plus every run
+of a --batch file: a JSON list or JSONL of objects with 'weights' ({ticker: %}),
+'start', 'end' and optionally 'name', 'budget', 'initial', 'rebalance', 'frequency'.
+Market data is fetched once per date range for the union of its tickers.
+
+Writes two tables to --out:
+    summary   one row per run and strategy (std, v1, smart): run options, final value,
+              invested, ROI, alpha vs Standard and the metrics.batch_metrics columns
+    curves    daily mark-to-market curves in long format: run, strategy, date, value, invested
+Parquet needs pyarrow (or fastparquet); without one the tables are written as CSV.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import uuid
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from perf import span, incr
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ['parquet', 'feather', 'csv', 'pickle']
+FREQUENCIES = ['monthly', 'weekly']
+STRATEGIES = ['std', 'v1', 'smart']
+RUN_DEFAULTS = {'budget': 3000.0, 'initial': 0.0, 'rebalance': False, 'frequency': 'monthly'}
+
+# === RUN SPECS ===
+def parse_portfolio(text):
+    """'VOO:60,QQQ:40' -> {'VOO': 60.0, 'QQQ': 40.0}; a bare ticker gets weight 1."""
+    weights = {}
+    for part in filter(None, (p.strip() for p in text.replace(';', ',').split(','))):
+        ticker, _, weight = part.partition(':')
+        weights[ticker.strip().upper()] = float(weight) if weight else 1.0
+    if not weights:
+        raise ValueError(f"Empty portfolio: {text!r}")
+    return weights
+
+def parse_range(text):
+    """'2015-01-01:2024-12-31' -> (start, end) Timestamps."""
+    start, sep, end = text.partition(':')
+    if not sep:
+        raise ValueError(f"Range must look like START:END, got {text!r}")
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    if end <= start:
+        raise ValueError(f"Range ends before it starts: {text!r}")
+    return start, end
+
+def normalize_run(spec, index):
+    """Validate one run spec and fill in the defaults."""
+    unknown = set(spec) - set(RUN_DEFAULTS) - {'name', 'weights', 'start', 'end'}
+    if unknown:
+        raise ValueError(f"Unknown run option(s): {', '.join(sorted(unknown))}")
+    weights = spec['weights']
+    weights = parse_portfolio(weights) if isinstance(weights, str) else {t.upper(): float(w) for t, w in weights.items()}
+    run = {**RUN_DEFAULTS, **{k: v for k, v in spec.items() if v is not None}}
+    run.update(name=str(spec.get('name') or f"run{index:03d}"), weights=weights,
+               start=pd.Timestamp(spec['start']), end=pd.Timestamp(spec['end']),
+               budget=float(run['budget']), initial=float(run['initial']), rebalance=bool(run['rebalance']))
+    if run['end'] <= run['start']:
+        raise ValueError(f"{run['name']}: range ends before it starts")
+    if run['frequency'] not in FREQUENCIES:
+        raise ValueError(f"{run['name']}: frequency must be one of {FREQUENCIES}")
+    return run
+
+def load_batch(path):
+    """Run specs from a JSON list or a JSONL file."""
+    text = Path(path).read_text()
+    if text.lstrip().startswith('['):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip() and not line.lstrip().startswith('#')]
+
+def build_runs(portfolios=(), ranges=(), batch=(), **options):
+    """Every portfolio x range with the shared options, then the batch specs."""
+    specs = [{'weights': w, 'start': s, 'end': e, **options} for w in portfolios for s, e in ranges]
+    specs += list(batch)
+    runs = [normalize_run(spec, i) for i, spec in enumerate(specs)]
+    names = [r['name'] for r in runs]
+    if len(set(names)) != len(names):
+        raise ValueError("Run names must be unique")
+    return runs
+
+# === EXECUTION ===
+def _summary_rows(run, res):
+    from metrics import backtest_metrics
+    table = backtest_metrics(res)
+    std_roi = table.loc['std', 'roi']
+    rows = []
+    for strategy in STRATEGIES:
+        m = table.loc[strategy]
+        rows.append({
+            'run': run['name'],
+            'strategy': strategy,
+            'tickers': ' '.join(run['weights']),
+            'weights': json.dumps(run['weights']),
+            'start': run['start'],
+            'end': run['end'],
+            'budget': run['budget'],
+            'initial': run['initial'],
+            'rebalance': run['rebalance'],
+            'frequency': run['frequency'],
+            **{k: float(v) for k, v in m.items()},
+            'alpha_pp': float(m['roi'] - std_roi),
+            'rebalancing_events': len(res['rebalancing_events']) if strategy == 'smart' else 0
+        })
+    return rows
+
+def _curve_frame(run, res):
+    daily = res['daily']
+    n = len(daily['dates'])
+    return pd.DataFrame({
+        'run': np.repeat(run['name'], n * len(STRATEGIES)),
+        'strategy': np.repeat(STRATEGIES, n),
+        'date': np.tile(pd.DatetimeIndex(daily['dates']).to_numpy(), len(STRATEGIES)),
+        'value': np.concatenate([np.asarray(daily[f'{s}_val'], dtype=float) for s in STRATEGIES]),
+        'invested': np.concatenate([np.asarray(daily[f'{s}_invested'], dtype=float) for s in STRATEGIES])
+    })
+
+def run_batch(runs, fetch=None):
+    """
+    Run every spec of build_runs. Market data is fetched once per (start, end) for the
+    union of that range's tickers; each run backtests its own tickers of that panel.
+    fetch(tickers, start, end) -> MarketPanel (default data_handler.fetch_data).
+    Returns (summary DataFrame, curves DataFrame, {run name: error}).
+    """
+    from backtest import run_portfolio_backtest
+    if fetch is None:
+        from data_handler import fetch_data
+        fetch = lambda tickers, start, end: fetch_data(tickers, start, end, as_panel=True)
+
+    by_range = {}
+    for run in runs:
+        by_range.setdefault((run['start'], run['end']), []).append(run)
+
+    summary, curves, errors = [], [], {}
+    for (start, end), group in by_range.items():
+        tickers = sorted({t for run in group for t in run['weights']})
+        with span("backtest_cli.fetch", tickers=len(tickers), runs=len(group)):
+            panel = fetch(tickers, start.to_pydatetime(), end.to_pydatetime())
+        for run in group:
+            missing = [t for t in run['weights'] if t not in panel.tickers]
+            if missing:
+                errors[run['name']] = f"no data for {', '.join(missing)}"
+                continue
+            with span("backtest_cli.run", run=run['name']):
+                res = run_portfolio_backtest(panel.select(list(run['weights'])), run['weights'], run['budget'],
+                                             run['initial'], run['rebalance'], run['frequency'], daily=True)
+            if res is None:
+                errors[run['name']] = "no overlapping data in range"
+                continue
+            summary.extend(_summary_rows(run, res))
+            curves.append(_curve_frame(run, res))
+            incr("backtest_cli.runs")
+    summary = pd.DataFrame(summary)
+    curves = pd.concat(curves, ignore_index=True) if curves else pd.DataFrame(columns=['run', 'strategy', 'date', 'value', 'invested'])
+    return summary, curves, errors
+
+# === OUTPUT ===
+def _has_arrow():
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def resolve_format(fmt):
+    """Requested format, or CSV when Parquet/Feather have no engine installed."""
+    if fmt == 'feather' and not _has_arrow():
+        logger.warning("Feather needs pyarrow; writing CSV instead")
+        return 'csv'
+    if fmt == 'parquet' and not _has_arrow():
+        try:
+            import fastparquet  # noqa: F401
+        except ImportError:
+            logger.warning("Parquet needs pyarrow or fastparquet; writing CSV instead")
+            return 'csv'
+    return fmt
+
+def write_table(df, path, fmt):
+    """Write one table atomically (temp file + rename). Returns the path written."""
+    path = Path(path).with_suffix('.' + {'pickle': 'pkl'}.get(fmt, fmt))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}.tmp")
+    try:
+        if fmt == 'parquet':
+            df.to_parquet(tmp, index=False)
+        elif fmt == 'feather':
+            df.reset_index(drop=True).to_feather(tmp)
+        elif fmt == 'csv':
+            df.to_csv(tmp, index=False)
+        else:
+            df.to_pickle(tmp)
+        os.replace(tmp, path)
+    finally:
+        tmp.unlink(missing_ok=True)
+    return path
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run Smart DCA portfolio backtests without the UI and save the results.")
+    parser.add_argument("--portfolio", action="append", default=[], help="TICKER:WEIGHT,... (repeatable)")
+    parser.add_argument("--range", action="append", default=[], dest="ranges", help="START:END dates (repeatable)")
+    parser.add_argument("--batch", help="JSON/JSONL file of run specs")
+    parser.add_argument("--budget", type=float, default=RUN_DEFAULTS['budget'], help="Monthly budget ($)")
+    parser.add_argument("--initial", type=float, default=RUN_DEFAULTS['initial'], help="Initial investment ($)")
+    parser.add_argument("--rebalance", action="store_true", help="Enable rebalancing")
+    parser.add_argument("--frequency", choices=FREQUENCIES, default=RUN_DEFAULTS['frequency'])
+    parser.add_argument("--out", required=True, help="Output directory")
+    parser.add_argument("--format", choices=FORMATS, default='parquet')
+    args = parser.parse_args(argv)
+
+    try:
+        if bool(args.portfolio) != bool(args.ranges):
+            raise ValueError("--portfolio and --range go together")
+        runs = build_runs([parse_portfolio(p) for p in args.portfolio], [parse_range(r) for r in args.ranges],
+                          load_batch(args.batch) if args.batch else (),
+                          budget=args.budget, initial=args.initial, rebalance=args.rebalance, frequency=args.frequency)
+    except (ValueError, KeyError, OSError) as e:
+        parser.error(str(e))
+    if not runs:
+        parser.error("nothing to run: give --portfolio/--range or --batch")
+
+    print(f"[ SYSTEM ] {len(runs)} backtest run(s)")
+    summary, curves, errors = run_batch(runs)
+    fmt = resolve_format(args.format)
+    for name, df in (('summary', summary), ('curves', curves)):
+        print(f"[ SYSTEM ] Wrote {write_table(df, Path(args.out) / name, fmt)} ({len(df)} rows)")
+    for name, error in errors.items():
+        print(f"!! {name}: {error}")
+    if errors:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from backtest import iter_portfolio_backtest
+from data_handler import fetch_data
+from perf import span, incr
+from result_cache import get_result_cache, result_key
+
+logger = logging.getLogger(__name__)
+
+# Shared by every session; bounds how many backtests run at once
+BACKTEST_WORKERS = int(os.environ.get("SMART_DCA_BACKTEST_WORKERS", "4"))
+# A job nobody has polled for this long is cancelled (tab closed, session gone)
+ABANDON_AFTER_S = 30
+
+_executor = ThreadPoolExecutor(max_workers=BACKTEST_WORKERS, thread_name_prefix="backtest")
+
+class BacktestJob:
+    """
+    One backtest running on the shared executor.
+
+    The worker publishes each partial result from iter_portfolio_backtest; readers
+    follow them with updates(). cancel() stops the run at the next chunk.
+    panel: the already fetched MarketPanel, or None to fetch it on the worker thread
+    (st.cache_data needs the script thread, so Streamlit callers pass it in).
+    """
+    def __init__(self, tickers, weights, start_date, end_date, monthly_budget,
+                 initial_investment=0, enable_rebalancing=False, contribution_frequency='monthly',
+                 chunk_periods=24, daily=False, panel=None):
+        self.params = (tuple(tickers), tuple(sorted(weights.items())), start_date, end_date,
+                       monthly_budget, initial_investment, enable_rebalancing, contribution_frequency)
+        self.chunk_periods = chunk_periods
+        self.daily = daily
+        self.panel = panel
+        self.result = None       # latest partial (or final) result
+        self.error = None
+        self.done = False
+        self._version = 0
+        self._cancel = threading.Event()
+        self._cond = threading.Condition()
+        self._last_seen = time.monotonic()
+        self.future = _executor.submit(self._run)
+
+    def _publish(self, result=None, error=None, done=False):
+        with self._cond:
+            if result is not None: self.result = result
+            if error is not None: self.error = error
+            self.done = self.done or done
+            self._version += 1
+            self._cond.notify_all()
+
+    def _abandoned(self):
+        return time.monotonic() - self._last_seen > ABANDON_AFTER_S
+
+    def _run(self):
+        tickers, weights, start_date, end_date, budget, initial, rebalance, freq = self.params
+        weights = dict(weights)
+        try:
+            with span("backtest_job.run", tickers=len(tickers), frequency=freq) as s:
+                panel = self.panel if self.panel is not None else fetch_data(list(tickers), start_date, end_date, as_panel=True)
+                self.panel = None  # the job keeps only its results
+                if not panel:
+                    self._publish(error="No data found for this range.", done=True)
+                    return
+                if self.cancelled(): return
+
+                cache = get_result_cache()
+                key = result_key(panel, weights, budget, initial, rebalance, freq, self.daily)
+                cached = cache.get(key)
+                if cached is not None:
+                    incr("result_cache.hit")
+                    s["cached"] = True
+                    self._publish(result=cached, done=True)
+                    return
+                incr("result_cache.miss")
+
+                chunks = 0
+                for partial in iter_portfolio_backtest(panel, weights, budget, initial, rebalance, freq,
+                                                       chunk_periods=self.chunk_periods, daily=self.daily):
+                    chunks += 1
+                    self._publish(result=partial)
+                    if self._abandoned(): self._cancel.set()
+                    if self.cancelled():
+                        incr("backtest_job.cancelled")
+                        s["cancelled"] = True
+                        return
+                s["chunks"] = chunks
+
+                if self.result is None:
+                    self._publish(error="Data mismatch or empty result.", done=True)
+                    return
+                try:
+                    cache.put(key, self.result)
+                except OSError as e:
+                    logger.warning("Could not store backtest result: %s", e)
+                self._publish(done=True)
+        except Exception as e:
+            logger.exception("Backtest job failed")
+            self._publish(error=f"Backtest failed: {e}", done=True)
+        finally:
+            if not self.done:
+                self._publish(done=True)
+
+    def cancel(self):
+        self._cancel.set()
+
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def updates(self, timeout=5.0):
+        """
+        Yield the latest result every time the worker publishes, until the job is done.
+        Intermediate partials are skipped if the reader is slower than the worker.
+        """
+        seen, last = -1, None
+        while True:
+            with self._cond:
+                self._last_seen = time.monotonic()
+                if self._version == seen and not self.done:
+                    self._cond.wait(timeout)
+                if self._version == seen and not self.done:
+                    continue  # timed out; loop to refresh _last_seen
+                seen = self._version
+                result, done = self.result, self.done
+            if result is not None and result is not last:
+                last = result
+                yield result
+            if done: return
+
+def start_backtest(previous, tickers, weights, start_date, end_date, *args, **kwargs):
+    """
+    Cancel the previous job (if any) and start a new one. Market data is fetched on the
+    calling thread, where fetch_data's st.cache_data has its script context.
+    """
+    if previous is not None and not previous.done:
+        previous.cancel()
+    panel = fetch_data(list(tickers), start_date, end_date, as_panel=True)
+    return BacktestJob(tickers, weights, start_date, end_date, *args, panel=panel, **kwargs)
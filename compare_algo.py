@@ -10,18 +10,21 @@ warnings.simplefilter(action='ignore', category=FutureWarning)
 
 import pandas as pd
 import numpy as np
+from attribution import layer_attribution
 from backtest import run_portfolio_backtest
+from metrics import backtest_metrics
 from data_handler import fetch_data
 from datetime import datetime
 
 # ==========================================
 # HELPER FUNCTIONS
 # ==========================================
-def get_metrics(values, invested):
+def get_metrics(values, invested, daily_values=None):
     vals = np.array(values)
-    # Max Drawdown
-    peak = np.maximum.accumulate(vals)
-    drawdown = (vals - peak) / peak
+    # Max Drawdown (on the daily mark-to-market curve when given; contribution dates miss intra-period dips)
+    dd_vals = np.array(daily_values) if daily_values is not None else vals
+    peak = np.maximum.accumulate(dd_vals)
+    drawdown = (dd_vals - peak) / peak
     mdd = drawdown.min() * 100
     
     # Profit & ROI
@@ -51,7 +54,8 @@ def run_scenario(name, tickers, weights, start_date_str, end_date_str, budget=30
         budget, 
         initial_investment=0, 
         contribution_frequency='monthly',
-        enable_rebalancing=True
+        enable_rebalancing=True,
+        daily=True
     )
     
     if not results:
@@ -59,15 +63,17 @@ def run_scenario(name, tickers, weights, start_date_str, end_date_str, budget=30
         return
 
     # Metrics
-    m_std = get_metrics(results['std_val'], results['std_invested'])
-    m_v1  = get_metrics(results['v1_val'], results['v1_invested'])
-    m_cur = get_metrics(results['cur_val'], results['cur_invested'])
+    daily = results['daily']
+    m_std = get_metrics(results['std_val'], results['std_invested'], daily['std_val'])
+    m_v1  = get_metrics(results['v1_val'], results['v1_invested'], daily['v1_val'])
+    m_cur = get_metrics(results['cur_val'], results['cur_invested'], daily['cur_val'])
     
     # Comparisons
     alpha_v1 = m_v1[3] - m_std[3]
     alpha_cur = m_cur[3] - m_std[3]
     cap_v1 = (m_v1[1] / m_std[1]) * 100
     cap_cur = (m_cur[1] / m_std[1]) * 100
+    risk = backtest_metrics(results)  # rows: std, v1, smart (= current)
 
     # Report
     print("\n" + "="*95)
@@ -88,6 +94,24 @@ def run_scenario(name, tickers, weights, start_date_str, end_date_str, budget=30
     
     # Drawdown
     print(f"{'Max Drawdown':<22} | {m_std[4]:>15.1f}% | {m_v1[4]:>15.1f}% | {m_cur[4]:>17.1f}%")
+
+    # Risk-adjusted (daily mark-to-market)
+    for label, key, unit in [("Money-Weighted (XIRR)", 'xirr', '%'), ("Time-Weighted / yr", 'twr_annual', '%'),
+                             ("Volatility", 'volatility', '%'), ("Sharpe", 'sharpe', ''),
+                             ("Sortino", 'sortino', ''), ("Longest Drawdown", 'max_drawdown_days', 'd')]:
+        row = risk[key]
+        print(f"{label:<22} | {row['std']:>15.2f}{unit:1} | {row['v1']:>15.2f}{unit:1} | {row['smart']:>17.2f}{unit:1}")
+
+    # Which layer of the current strategy did it (each layer switched off in turn, one batched run)
+    attr = layer_attribution(data_map, weights, budget, enable_rebalancing=True, contribution_frequency='monthly')
+    if attr is not None:
+        print("-" * 95)
+        print(f"{'LAYER ATTRIBUTION':<22} | {'ACTIVE':>8} | {'AVG LOG-MULT':>12} | {'EXTRA CAPITAL':>14} | {'ALPHA':>8} | {'PROFIT':>12}")
+        print("-" * 95)
+        for layer, r in attr.iterrows():
+            active = f"{r['active_pct']:>7.1f}%" if r['active_pct'] == r['active_pct'] else f"{'-':>8}"
+            print(f"{layer:<22} | {active} | {r['log_mult']:>+12.3f} | ${r['capital_deployed']:>+13,.0f} | "
+                  f"{r['alpha_pp']:>+7.1f}% | ${r['profit']:>+11,.0f}")
     print("="*95)
 
 # ==========================================
@@ -1,8 +1,21 @@
+import logging
+import math
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import wraps
 import streamlit as st
-import yfinance as yf
 import pandas as pd
 from datetime import timedelta
-from analysis import calculate_indicators
+from analysis import attach_indicators, calculate_indicators, indicator_arrays, warmup_bars
+from market_calendar import cache_window, sessions_back, trading_days
+from market_data import get_provider
+from market_panel import MarketPanel
+from perf import span, incr
+from single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
 
 def _streamlit_context_exists() -> bool:
     """Return True when running inside a Streamlit script context."""
@@ -12,58 +25,262 @@ def _streamlit_context_exists() -> bool:
     except Exception:
         return False
 
+_cache_probe = threading.local()
+
 def cache_data_if_available(func=None, **cache_kwargs):
     """Wrap st.cache_data when a Streamlit script context exists."""
     def decorator(target):
-        if _streamlit_context_exists():
-            return st.cache_data(**cache_kwargs)(target)
-        return target
+        if not _streamlit_context_exists():
+            return target
+
+        name = target.__name__
+
+        @wraps(target)
+        def on_miss(*args, **kwargs):
+            # Only executes when st.cache_data has no stored value
+            _cache_probe.missed = True
+            return target(*args, **kwargs)
+
+        cached = st.cache_data(**cache_kwargs)(on_miss)
+
+        @wraps(target)
+        def wrapper(*args, **kwargs):
+            _cache_probe.missed = False
+            result = cached(*args, **kwargs)
+            incr(f"cache.{name}.{'miss' if _cache_probe.missed else 'hit'}")
+            return result
+
+        wrapper.clear = cached.clear
+        return wrapper
 
     if func is not None:
         return decorator(func)
     return decorator
 
-@cache_data_if_available
-def fetch_data(tickers, start_date, end_date):
-    # Fetch extra data prior to start_date to calculate MA200 correctly
-    fetch_start = start_date - timedelta(days=400)
+# Concurrent downloads of the same symbol and window share one request
+_download_flight = SingleFlight("data.download")
+
+def _download(symbol, start, end):
+    """
+    Provider download (yf.download by default), coalesced per (provider, symbol, start day,
+    end day) across threads and processes. Every caller gets its own copy of the frame.
+    """
+    key = (get_provider().name, symbol, pd.Timestamp(start).strftime('%Y-%m-%d'), pd.Timestamp(end).strftime('%Y-%m-%d'))
+    return _download_flight.do(key, lambda: _download_uncoalesced(symbol, start, end)).copy()
+
+def _download_uncoalesced(symbol, start, end):
+    """Provider download wrapped in a timing span with row/byte counters."""
+    with span("data.download", ticker=symbol) as s:
+        df = get_provider().download(symbol, start, end)
+        n_bytes = int(df.memory_usage(deep=True).sum()) if not df.empty else 0
+        s["rows"] = len(df)
+        s["bytes"] = n_bytes
+    incr("data.rows_downloaded", len(df))
+    incr("data.bytes_downloaded", n_bytes)
+    return df
+
+def validate_ticker(ticker):
+    """Checks if a ticker exists on Yahoo Finance."""
+    t = ticker.upper().strip()
+    if not t: return False, t
+    try:
+        # We fetch 5 days of history. If it's empty, the ticker likely doesn't exist.
+        with span("data.validate_ticker", ticker=t):
+            hist = get_provider().history(t, "5d")
+        if hist.empty:
+            return False, t
+        return True, t
+    except Exception:
+        return False, t
+
+def validate_tickers(tickers):
+    """Batch version of validate_ticker: one download for many symbols. Returns the set that exist."""
+    symbols = sorted({t.upper().strip() for t in tickers if t and t.strip()})
+    if not symbols: return set()
+    with span("data.validate_tickers", tickers=len(symbols)):
+        df = get_provider().download_many(symbols, "5d")
+    if df.empty: return set()
+    if not isinstance(df.columns, pd.MultiIndex):
+        return set(symbols) if df['Close'].notna().any() else set()
+    present = set(df.columns.get_level_values(0))
+    return {t for t in symbols if t in present and df[t]['Close'].notna().any()}
+
+# === PARALLEL INDICATORS ===
+# Processes for indicator computation; smaller universes stay on the calling thread,
+# where pool round-trips would cost more than they save
+INDICATOR_WORKERS = int(os.environ.get("SMART_DCA_INDICATOR_WORKERS", os.cpu_count() or 1))
+PARALLEL_MIN_TICKERS = 16
+# Aim for a few chunks per worker: enough to balance uneven histories, few enough
+# that per-task pickling stays negligible
+CHUNKS_PER_WORKER = 4
+
+_indicator_pool = None
+_indicator_pool_lock = threading.Lock()
+
+def _get_indicator_pool(workers):
+    global _indicator_pool
+    with _indicator_pool_lock:
+        if _indicator_pool is None:
+            # spawn: forking a threaded server (Streamlit) can deadlock the children
+            _indicator_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+        return _indicator_pool
+
+def _reset_indicator_pool():
+    global _indicator_pool
+    with _indicator_pool_lock:
+        pool, _indicator_pool = _indicator_pool, None
+    if pool is not None: pool.shutdown(wait=False, cancel_futures=True)
+
+def _compute_serial(frames):
+    out = {}
+    for t, df in frames.items():
+        try:
+            out[t] = calculate_indicators(df)
+        except Exception as e:
+            logger.warning("Error computing indicators for %s: %s", t, e)
+            incr("data.fetch_errors")
+    return out
+
+def compute_indicators(frames, workers=None):
+    """
+    calculate_indicators for {ticker: DataFrame}, fanned out over a process pool when
+    the universe is large. Workers get only the Close arrays, a chunk of tickers per
+    task, and send back compact arrays. Returns {ticker: DataFrame} in input order.
+    """
+    workers = INDICATOR_WORKERS if workers is None else workers
+    tickers = list(frames)
+    if workers <= 1 or len(tickers) < PARALLEL_MIN_TICKERS:
+        return _compute_serial(frames)
+
+    size = max(1, math.ceil(len(tickers) / (workers * CHUNKS_PER_WORKER)))
+    chunks = [tickers[i:i + size] for i in range(0, len(tickers), size)]
+    with span("data.indicators_parallel", tickers=len(tickers), chunks=len(chunks), workers=workers):
+        try:
+            payloads = [[frames[t]['Close'].to_numpy(dtype=float) for t in chunk] for chunk in chunks]
+            results = list(_get_indicator_pool(workers).map(indicator_arrays, payloads))
+        except Exception as e:
+            logger.warning("Parallel indicator computation failed, computing serially: %s", e)
+            incr("data.indicators_parallel_fallback")
+            _reset_indicator_pool()
+            return _compute_serial(frames)
+        out = {}
+        for chunk, arrays in zip(chunks, results):
+            for t, (values, impulse) in zip(chunk, arrays):
+                out[t] = attach_indicators(frames[t], values, impulse)
+        incr("analysis.rows_processed", sum(len(df) for df in frames.values()))
+    return out
+
+# === FETCH PLANNING ===
+# Extra sessions on top of the warm-up, for closures missing from market_calendar and provider gaps
+FETCH_MARGIN_SESSIONS = 5
+
+def _sessions_before(day, bars):
+    """Timedelta back from `day` to the start of a window holding `bars` (+ margin) sessions before it."""
+    first = sessions_back(day, bars + FETCH_MARGIN_SESSIONS)
+    return timedelta(days=(pd.Timestamp(day).date() - first).days)
+
+def plan_fetch_start(start_date, warmup=None):
+    """
+    First day to download so indicators are final from start_date on.
+    warmup: bars of history needed (default analysis.warmup_bars(), i.e. MA200's 200 bars).
+    Counted in exchange sessions (market_calendar), so holidays never shorten the warm-up.
+    """
+    bars = warmup_bars() if warmup is None else warmup
+    return start_date - _sessions_before(start_date, bars) if bars else start_date
+
+def recent_window_start(end_date, bars=1):
+    """Start of a window holding the last `bars` sessions up to end_date (1 = just the latest bar)."""
+    return end_date - _sessions_before(end_date, bars)
+
+def check_fetch_plan(first, last, warmup=None):
+    """
+    Trading days in [first, last] whose planned fetch window holds fewer than `warmup`
+    sessions before them (should be empty), e.g. check_fetch_plan('2003-01-01', '2026-12-31').
+    """
+    bars = warmup_bars() if warmup is None else warmup
+    first, last = pd.Timestamp(first), pd.Timestamp(last)
+    sessions = trading_days(plan_fetch_start(first, bars), last)
+    days = sessions[sessions >= first]
+    starts = pd.DatetimeIndex([plan_fetch_start(d, bars) for d in days])
+    held = sessions.searchsorted(days) - sessions.searchsorted(starts)
+    return list(days[held < bars])
+
+# Bound on cached fetch_data results; versions superseded by a newer close age out first
+FETCH_CACHE_MAX_ENTRIES = int(os.environ.get("SMART_DCA_FETCH_CACHE_ENTRIES", 256))
+
+def fetch_data(tickers, start_date, end_date, as_panel=False, warmup=None):
+    """
+    Download prices + macro data and compute indicators.
+
+    Extra history before start_date is planned from the indicators' warm-up needs
+    (see plan_fetch_start); pass warmup=0 when the caller only needs raw bars.
+    Returns {ticker: DataFrame} (each with VIX/TNX columns) by default, or a
+    MarketPanel (one shared date index, macro stored once) when as_panel=True.
+
+    Cached along the exchange calendar (market_calendar.cache_window): windows in
+    the past are cached for good; a window reaching today holds bars up to the last
+    completed session and is refetched only after the next close has settled.
+    """
+    start_day, end_day, version = cache_window(start_date, end_date)
+    if end_day <= start_day:
+        # Nothing has closed in the window yet (e.g. a window starting today, before the close)
+        return MarketPanel.from_frames({}, {}) if as_panel else {}
+    return _fetch_data_cached(list(tickers), start_day, end_day, as_panel, warmup, version)
+
+@cache_data_if_available(max_entries=FETCH_CACHE_MAX_ENTRIES)
+def _fetch_data_cached(tickers, start_date, end_date, as_panel, warmup, data_version):
+    # data_version only keys the cache (last completed session for live windows)
+    with span("data.fetch_data", tickers=len(tickers), as_panel=as_panel, version=data_version) as fetch_span:
+        data = _fetch_data(tickers, start_date, end_date, as_panel, warmup)
+        fetch_span["loaded"] = len(data.tickers) if as_panel else len(data)
+    return data
+
+def _fetch_data(tickers, start_date, end_date, as_panel=False, warmup=None):
+    fetch_start = plan_fetch_start(start_date, warmup)
     data_dict = {}
-    
+
     # 1. FETCH MACRO DATA (VIX + TNX)
     try:
         # FIX: Added auto_adjust=False to silence FutureWarnings
-        vix = yf.download("^VIX", start=fetch_start, end=end_date, progress=False, auto_adjust=False)['Close']
+        vix = _download("^VIX", fetch_start, end_date)['Close']
         if isinstance(vix, pd.DataFrame): vix = vix.iloc[:, 0]
-        
-        tnx = yf.download("^TNX", start=fetch_start, end=end_date, progress=False, auto_adjust=False)['Close']
+
+        tnx = _download("^TNX", fetch_start, end_date)['Close']
         if isinstance(tnx, pd.DataFrame): tnx = tnx.iloc[:, 0]
-    except:
+    except Exception as e:
         # Fallback if download fails
+        logger.warning("Macro download failed, using VIX=20 / TNX=4.0 fallback: %s", e)
+        incr("data.macro_fallback")
         dates = pd.date_range(start=fetch_start, periods=1)
         vix = pd.Series(20, index=dates)
         tnx = pd.Series(4.0, index=dates)
 
     # 2. FETCH TICKER DATA
+    raw = {}
     for t in tickers:
         try:
             # FIX: Added auto_adjust=False
-            df = yf.download(t, start=fetch_start, end=end_date, progress=False, auto_adjust=False)
+            df = _download(t, fetch_start, end_date)
             if df.empty: continue
-            
+
             if isinstance(df.columns, pd.MultiIndex):
                 df.columns = df.columns.get_level_values(0)
-            
-            # Merge Macro Data
-            df['VIX'] = vix.reindex(df.index).ffill()
-            df['TNX'] = tnx.reindex(df.index).ffill()
-            
-            # Calculate Indicators
-            df = calculate_indicators(df)
-            
-            mask = (df.index >= pd.Timestamp(start_date)) & (df.index <= pd.Timestamp(end_date))
-            data_dict[t] = df.loc[mask]
+
+            # Merge Macro Data (the panel keeps a single copy instead)
+            if not as_panel:
+                df['VIX'] = vix.reindex(df.index).ffill()
+                df['TNX'] = tnx.reindex(df.index).ffill()
+            raw[t] = df
         except Exception as e:
-            print(f"Error fetching {t}: {e}")
+            logger.warning("Error fetching %s: %s", t, e)
+            incr("data.fetch_errors")
             continue
-            
-    return data_dict
\ No newline at end of file
+
+    # 3. INDICATORS (process pool for large universes)
+    for t, df in compute_indicators(raw).items():
+        mask = (df.index >= pd.Timestamp(start_date)) & (df.index <= pd.Timestamp(end_date))
+        data_dict[t] = df.loc[mask]
+
+    if as_panel:
+        return MarketPanel.from_frames(data_dict, {'VIX': vix, 'TNX': tnx})
+    return data_dict
@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+
+# Points per chart trace; enough to look identical to the full series at chart width
+MAX_CHART_POINTS = 1500
+
+def lttb_indices(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets: indices of n_out points that keep the visual shape of (x, y).
+    Always keeps the first and last point. Returns all indices if the series is already short enough.
+    """
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+
+    # n_out - 2 buckets between the fixed first and last points
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    out = np.empty(n_out, dtype=int)
+    out[0], out[-1] = 0, n - 1
+
+    a = 0
+    for b in range(n_out - 2):
+        lo, hi = edges[b], edges[b + 1]
+        # Average of the next bucket (or the last point) is the third triangle vertex
+        nlo, nhi = hi, (edges[b + 2] if b + 2 < len(edges) else n)
+        cx, cy = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(area.argmax())
+        out[b + 1] = a
+    return out
+
+def downsample_series(dates, values, n_out=MAX_CHART_POINTS):
+    """LTTB-downsample a dated series for plotting. Returns (dates, values)."""
+    dates = pd.DatetimeIndex(dates)
+    values = np.asarray(values, dtype=float)
+    idx = lttb_indices(dates.asi8, values, n_out)
+    return dates[idx], values[idx]
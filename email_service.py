@@ -3,6 +3,7 @@ import os
 import json
 import urllib.parse
 from datetime import datetime
+from perf import span, incr
 
 logger = logging.getLogger(__name__)
 
@@ -17,6 +18,9 @@ except ModuleNotFoundError:
 RESEND_API_KEY = os.environ.get('RESEND_API_KEY')
 FROM_EMAIL = os.environ.get('FROM_EMAIL', 'Smart DCA <onboarding@resend.dev>')
 
+# How often (in subscribers) bulk sends report progress
+PROGRESS_EVERY = 50
+
 def _ensure_resend():
     if resend is None:
         raise RuntimeError("Install the 'resend' package (`pip install resend`) to enable Smart DCA email features.")
@@ -114,14 +118,17 @@ def send_confirmation_email(user_email, weights, budget, weeks, email_config=Non
     """
 
     try:
-        r = resend_module.Emails.send({
-            "from": sender,
-            "to": user_email,
-            "subject": "Smart DCA: Subscription Confirmed",
-            "html": html_content
-        })
+        with span("email.send", kind="confirmation"):
+            r = resend_module.Emails.send({
+                "from": sender,
+                "to": user_email,
+                "subject": "Smart DCA: Subscription Confirmed",
+                "html": html_content
+            })
+        incr("email.sent")
         return r
     except Exception as e:
+        incr("email.failed")
         print(f"Error sending email: {e}")
         raise e
 
@@ -159,20 +166,30 @@ def send_unsubscribe_email(user_email, email_config=None):
     """
 
     try:
-        resend_module.Emails.send({
-            "from": sender,
-            "to": user_email,
-            "subject": "Smart DCA: Unsubscribed",
-            "html": html_content
-        })
+        with span("email.send", kind="unsubscribe"):
+            resend_module.Emails.send({
+                "from": sender,
+                "to": user_email,
+                "subject": "Smart DCA: Unsubscribed",
+                "html": html_content
+            })
+        incr("email.sent")
     except Exception as e:
+        incr("email.failed")
         print(f"Error sending unsubscribe email: {e}")
 
-def send_notification_email(user_email, action_data, total_invest, weights):
+def send_notification_email(user_email, action_data, total_invest, weights, email_config=None):
     """
     Sends the weekly/monthly action report.
     """
     resend_module = _ensure_resend()
+    if email_config:
+        api_key = email_config.get('api_key')
+        if api_key:
+            resend_module.api_key = api_key
+        sender = email_config.get('from_email', FROM_EMAIL)
+    else:
+        sender = FROM_EMAIL
     chart_url = generate_pie_chart_url(weights)
     
     # Build the action table HTML
@@ -239,13 +256,58 @@ def send_notification_email(user_email, action_data, total_invest, weights):
     """
 
     try:
-        resend_module.Emails.send({
-            "from": FROM_EMAIL,
-            "to": user_email,
-            "subject": f"Smart DCA Alert: Deploy ${total_invest:,.0f}",
-            "html": html_content
-        })
+        with span("email.send", kind="notification"):
+            resend_module.Emails.send({
+                "from": sender,
+                "to": user_email,
+                "subject": f"Smart DCA Alert: Deploy ${total_invest:,.0f}",
+                "html": html_content
+            })
+        incr("email.sent")
         return True
     except Exception as e:
+        incr("email.failed")
         print(f"Error sending notification email: {e}")
-        return False
\ No newline at end of file
+        return False
+
+def send_recommendations_to_subscribers(email_config=None, subscriptions=None, snapshot=None,
+                                        today=None, on_progress=None, dry_run=False):
+    """
+    Sends the action report to every active subscriber that is due today.
+
+    Args:
+        email_config: {'api_key', 'from_email'} passed through to send_notification_email
+        subscriptions: Iterable of subscriptions (defaults to all active ones)
+        snapshot: Precomputed market snapshot (built from the subscribers' tickers if omitted)
+        today: Date used for the schedule check (defaults to now)
+        on_progress: Optional callback(stats) invoked every PROGRESS_EVERY subscribers
+        dry_run: Build every report but skip the actual send
+
+    Returns a stats dict: processed / sent / failed / skipped.
+    """
+    from recommendations import build_market_snapshot, build_action_plan, is_due
+    from subscription_manager import get_active_subscriptions
+
+    if subscriptions is None:
+        subscriptions = get_active_subscriptions()
+    if snapshot is None:
+        subscriptions = list(subscriptions)
+        snapshot = build_market_snapshot({t for s in subscriptions for t in s.get('tickers', [])})
+
+    stats = {'processed': 0, 'sent': 0, 'failed': 0, 'skipped': 0}
+    for sub in subscriptions:
+        stats['processed'] += 1
+        action_data, total_invest = build_action_plan(sub, snapshot) if is_due(sub, today) else ([], 0)
+        if not action_data:
+            stats['skipped'] += 1
+        elif dry_run or send_notification_email(sub['email'], action_data, total_invest, sub.get('weights', {}), email_config):
+            stats['sent'] += 1
+        else:
+            stats['failed'] += 1
+
+        if on_progress and stats['processed'] % PROGRESS_EVERY == 0:
+            on_progress(stats)
+
+    if on_progress:
+        on_progress(stats)
+    return stats
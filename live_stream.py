@@ -0,0 +1,254 @@
+import math
+import time
+from collections import deque
+import pandas as pd
+from analysis import get_strategy_multiplier, indicators_from_row
+
+# ==========================================
+# FEEDS
+# ==========================================
+class BarFeed:
+    """
+    Source of new bars.
+    poll() returns the bars released since the previous call as
+    [(ticker, timestamp, bar_dict), ...] where bar_dict has at least 'Close'
+    and optionally 'VIX' / 'TNX'.
+    """
+    def poll(self):
+        raise NotImplementedError
+
+    def exhausted(self):
+        return False
+
+class ReplayFeed(BarFeed):
+    """
+    Plays stored history back as if it were live.
+
+    Args:
+        data_map: {ticker: DataFrame} (fetch_data output)
+        start: First timestamp to replay; earlier rows are left for seeding
+        bars_per_second: Replay speed, in trading days released per wall-clock second
+        clock: Time source (injectable for tests)
+    """
+    def __init__(self, data_map, start=None, bars_per_second=1.0, clock=time.monotonic):
+        dates = None
+        for df in data_map.values():
+            dates = df.index if dates is None else dates.union(df.index)
+        if start is not None:
+            dates = dates[dates >= pd.Timestamp(start)]
+        self.dates = dates
+        self.bars_per_second = bars_per_second
+        self.clock = clock
+        # Align once into plain float lists so poll() is a few list lookups per bar
+        self._cols = {}
+        for t, df in data_map.items():
+            aligned = df.reindex(self.dates)
+            self._cols[t] = {c: aligned[c].astype(float).tolist() for c in ('Close', 'VIX', 'TNX') if c in df.columns}
+        self._pos = 0
+        self._t0 = None
+
+    def poll(self):
+        now = self.clock()
+        if self._t0 is None:
+            self._t0 = now
+        due = min(len(self.dates), int((now - self._t0) * self.bars_per_second) + 1)
+        bars = []
+        while self._pos < due:
+            date = self.dates[self._pos]
+            for t, cols in self._cols.items():
+                if cols['Close'][self._pos] == cols['Close'][self._pos]:  # skip NaN (no bar that day)
+                    bars.append((t, date, {c: v[self._pos] for c, v in cols.items()}))
+            self._pos += 1
+        return bars
+
+    def exhausted(self):
+        return self._pos >= len(self.dates)
+
+    def progress(self):
+        return self._pos, len(self.dates)
+
+# ==========================================
+# INCREMENTAL INDICATORS
+# ==========================================
+class _RollingWindow:
+    """Fixed-size window with O(1) running mean / sample std."""
+    def __init__(self, size):
+        self.size = size
+        self.values = deque()
+        self.total = 0.0
+        self.total_sq = 0.0
+
+    def push(self, x):
+        self.values.append(x)
+        self.total += x
+        self.total_sq += x * x
+        if len(self.values) > self.size:
+            old = self.values.popleft()
+            self.total -= old
+            self.total_sq -= old * old
+
+    def mean(self):
+        if len(self.values) < self.size: return math.nan
+        return self.total / self.size
+
+    def std(self):
+        if len(self.values) < self.size: return math.nan
+        var = (self.total_sq - self.total * self.total / self.size) / (self.size - 1)
+        return math.sqrt(max(var, 0.0))
+
+def _ema_step(prev, x, alpha):
+    # ewm(adjust=False): first value seeds the average
+    return x if prev is None else prev + alpha * (x - prev)
+
+class IncrementalIndicators:
+    """
+    O(1)-per-bar version of calculate_indicators_pro for a single ticker.
+    Produces the same columns (RSI, BB, MA50/200, Dist_MA200, MACD, EMA13, Impulse).
+    """
+    def __init__(self):
+        self.prev_close = None
+        self.avg_gain = None
+        self.avg_loss = None
+        self.ema12 = None
+        self.ema26 = None
+        self.signal = None
+        self.ema13 = None
+        self.ma20 = _RollingWindow(20)
+        self.ma50 = _RollingWindow(50)
+        self.ma200 = _RollingWindow(200)
+        self.last = {}
+
+    def update(self, close, vix=None, tnx=None):
+        delta = close - self.prev_close if self.prev_close is not None else math.nan
+        gain = delta if delta > 0 else 0.0
+        loss = -delta if delta < 0 else 0.0
+        self.prev_close = close
+
+        self.avg_gain = _ema_step(self.avg_gain, gain, 1 / 14)
+        self.avg_loss = _ema_step(self.avg_loss, loss, 1 / 14)
+        if self.avg_loss == 0:
+            rsi = math.nan if self.avg_gain == 0 else 100.0
+        else:
+            rsi = 100 - 100 / (1 + self.avg_gain / self.avg_loss)
+
+        self.ma20.push(close)
+        self.ma50.push(close)
+        self.ma200.push(close)
+        ma20, std20 = self.ma20.mean(), self.ma20.std()
+        bb_upper, bb_lower = ma20 + 2 * std20, ma20 - 2 * std20
+        band = bb_upper - bb_lower
+        ma200 = self.ma200.mean()
+
+        self.ema12 = _ema_step(self.ema12, close, 2 / 13)
+        self.ema26 = _ema_step(self.ema26, close, 2 / 27)
+        macd = self.ema12 - self.ema26
+        self.signal = _ema_step(self.signal, macd, 2 / 10)
+        hist = macd - self.signal
+
+        prev_ema, prev_hist = self.ema13, self.last.get('MACD_Hist')
+        self.ema13 = _ema_step(self.ema13, close, 2 / 14)
+        impulse = 'Blue'
+        if prev_ema is not None and prev_hist is not None:
+            if self.ema13 > prev_ema and hist > prev_hist: impulse = 'Green'
+            elif self.ema13 < prev_ema and hist < prev_hist: impulse = 'Red'
+
+        self.last = {
+            'Close': close, 'RSI': rsi,
+            'MA20': ma20, 'STD20': std20, 'BB_Upper': bb_upper, 'BB_Lower': bb_lower,
+            'BB_PctB': (close - bb_lower) / band if band else math.nan,
+            'MA50': self.ma50.mean(), 'MA200': ma200,
+            'Dist_MA200': close / ma200 - 1 if ma200 == ma200 else math.nan,
+            'MACD_Line': macd, 'MACD_Signal': self.signal, 'MACD_Hist': hist,
+            'EMA13': self.ema13, 'Impulse': impulse,
+            'VIX': vix if vix is not None else self.last.get('VIX', 20.0),
+            'TNX': tnx if tnx is not None else self.last.get('TNX', 4.0),
+        }
+        return self.last
+
+    def seed(self, closes):
+        for c in closes:
+            self.update(float(c))
+        return self.last
+
+    _SCALARS = ('prev_close', 'avg_gain', 'avg_loss', 'ema12', 'ema26', 'signal', 'ema13')
+
+    def to_state(self):
+        """JSON-serializable state; from_state() continues exactly where this left off."""
+        state = {k: getattr(self, k) for k in self._SCALARS}
+        state['closes'] = list(self.ma200.values)  # MA20/MA50 windows are its tail
+        state['last'] = dict(self.last)
+        return state
+
+    @classmethod
+    def from_state(cls, state):
+        ind = cls()
+        for k in cls._SCALARS:
+            setattr(ind, k, state[k])
+        for window in (ind.ma20, ind.ma50, ind.ma200):
+            for c in state['closes'][-window.size:]:
+                window.push(c)
+        ind.last = dict(state['last'])
+        return ind
+
+# ==========================================
+# LIVE MONITOR
+# ==========================================
+class LiveMonitor:
+    """Keeps indicator state per ticker and re-scores only the tickers that received a bar."""
+    def __init__(self, tickers, weights, budget):
+        self.tickers = list(tickers)
+        self.weights = weights
+        self.budget = budget
+        self.states = {t: IncrementalIndicators() for t in self.tickers}
+        self.scores = {}
+        self.last_date = None
+        self.ticks = 0
+
+    def seed(self, data_map, before=None):
+        """Warm up from history (rows strictly before `before`)."""
+        for t in self.tickers:
+            if t not in data_map: continue
+            df = data_map[t]
+            if before is not None:
+                df = df.loc[df.index < pd.Timestamp(before)]
+            if df.empty: continue
+            state = self.states[t]
+            for close, vix, tnx in zip(df['Close'], df.get('VIX', [None] * len(df)), df.get('TNX', [None] * len(df))):
+                state.update(float(close), vix, tnx)
+            self._score(t, df.index[-1])
+
+    def apply(self, bars):
+        for t, date, bar in bars:
+            if t not in self.states: continue
+            self.states[t].update(float(bar['Close']), bar.get('VIX'), bar.get('TNX'))
+            self._score(t, date)
+            self.ticks += 1
+        return len(bars)
+
+    def _score(self, t, date):
+        ind = self.states[t].last
+        mult, reason = get_strategy_multiplier(ind['Close'], indicators_from_row(ind), ind['VIX'])
+        self.scores[t] = (date, mult, reason)
+        self.last_date = date if self.last_date is None else max(self.last_date, date)
+
+    def vix(self):
+        for t in self.tickers:
+            if self.states[t].last: return self.states[t].last['VIX']
+        return float('nan')
+
+    def action_rows(self):
+        """Same columns as the Action Dashboard table, plus the bar date."""
+        rows = []
+        total = 0.0
+        for t in self.tickers:
+            if t not in self.scores: continue
+            date, mult, reason = self.scores[t]
+            ind = self.states[t].last
+            final_amt = self.budget * (self.weights.get(t, 0) / 100) * mult
+            total += final_amt
+            rows.append({
+                "Ticker": t, "Bar Date": date.strftime('%Y-%m-%d'), "Price": f"${ind['Close']:.2f}",
+                "RSI": f"{ind['RSI']:.1f}", "Impulse": ind['Impulse'],
+                "Condition": reason, "Action": f"{mult}x", "Target Invest": f"${final_amt:.0f}"
+            })
+        return rows, total
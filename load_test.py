@@ -0,0 +1,202 @@
+"""
+Concurrent-session load test for the Streamlit app.
+
+    python load_test.py --sessions 8 --iterations 3
+    python load_test.py --sessions 32 --pages dashboard --latency-ms 150
+    python load_test.py --sessions 16 --market-data replay:recordings --json load.json
+
+Every simulated session is an AppTest of app.py driven like a user: open the app,
+go to the Action Dashboard and press Analyze, go to Backtest Performance and press
+Run Simulation (the run waits for the background backtest to finish). Sessions run
+in parallel threads of this process and share its caches, like the sessions of one
+server replica. Market data comes from a fake provider (synthetic bars by default),
+so the numbers measure the app rather than Yahoo Finance.
+
+Reports p50/p95/p99 per action, throughput and memory per session.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+APP_PATH = Path(__file__).resolve().parent / "app.py"
+PAGES = ['dashboard', 'backtest']
+ACTIONS = ['open'] + PAGES
+
+def _rss_mb():
+    """Current resident memory of this process in MB (peak where only that is available)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except (OSError, ValueError, AttributeError):
+        if resource is None: return float('nan')
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == 'darwin' else peak / 1024
+
+def _check(at, action):
+    if at.exception:
+        raise RuntimeError(f"{action}: {at.exception[0].message}")
+    if at.error:
+        raise RuntimeError(f"{action}: {at.error[0].value}")
+
+def _button(at, label):
+    return next(b for b in at.button if b.label == label)
+
+class _Session:
+    """One simulated user."""
+    def __init__(self, index, distinct, timeout):
+        from streamlit.testing.v1 import AppTest
+        self.index = index
+        # Distinct sessions backtest different periods, so results are not shared
+        self.start_year = 2015 + index % 8 if distinct else 2020
+        self.at = AppTest.from_file(str(APP_PATH), default_timeout=timeout)
+
+    def _timed(self, action, step):
+        from perf import span
+        with span(f"loadtest.{action}", session=self.index):
+            step()
+            _check(self.at, action)
+
+    def open(self):
+        self._timed('open', self.at.run)
+
+    def dashboard(self):
+        def step():
+            self.at.sidebar.radio[0].set_value("Action Dashboard").run()
+            _button(self.at, "Analyze Current Market").click().run()
+        self._timed('dashboard', step)
+
+    def backtest(self):
+        def step():
+            self.at.sidebar.radio[0].set_value("Backtest Performance").run()
+            self.at.date_input[0].set_value(date(self.start_year, 1, 1))
+            _button(self.at, "Run Simulation").click().run()
+        self._timed('backtest', step)
+
+def run_load_test(sessions=8, iterations=3, pages=PAGES, ramp_s=0.0, distinct=False, timeout=300):
+    """
+    Drive `sessions` concurrent AppTest sessions through `pages`, `iterations` times each.
+    Returns a report dict (per-action latency stats, throughput, memory, cache counters).
+    """
+    import streamlit as st
+    from perf import current_run, start_run, summarize
+
+    # App modules are imported by the first session's script run (inside a Streamlit context,
+    # so fetch_data gets its st.cache_data wrapper as on the server)
+    st.cache_data.clear()
+    start_run(label=f"load_test:{sessions}x{iterations}")
+    baseline_mb = _rss_mb()
+    alive = []  # sessions stay referenced until the end so their memory is counted
+    alive_lock = threading.Lock()
+    errors = []
+
+    def user(i):
+        if ramp_s: time.sleep(ramp_s * i / sessions)
+        session = _Session(i, distinct, timeout)
+        with alive_lock:
+            alive.append(session)
+        try:
+            session.open()
+            for _ in range(iterations):
+                for page in pages:
+                    getattr(session, page)()
+        except Exception as e:
+            errors.append(f"session {i}: {e}")
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sessions) as pool:
+        list(pool.map(user, range(sessions)))
+    elapsed = time.perf_counter() - t0
+    end_mb = _rss_mb()
+
+    run = current_run()
+    summary = summarize(run)
+    actions = {a: summary[f"loadtest.{a}"] for a in ACTIONS if f"loadtest.{a}" in summary}
+    completed = sum(s['count'] - s['errors'] for s in actions.values())
+    report = {
+        'sessions': sessions,
+        'iterations': iterations,
+        'pages': list(pages),
+        'seconds': round(elapsed, 3),
+        'actions': actions,
+        'throughput_per_s': round(completed / elapsed, 3) if elapsed else 0.0,
+        'memory_mb': {
+            'baseline': round(baseline_mb, 1),
+            'end': round(end_mb, 1),
+            'per_session': round((end_mb - baseline_mb) / max(len(alive), 1), 2)
+        },
+        'counters': {k: v for k, v in run['counters'].items() if k.startswith(('cache.', 'result_cache.', 'data.'))},
+        'app_spans': {k: v for k, v in summary.items() if not k.startswith('loadtest.')},
+        'errors': errors
+    }
+    return report
+
+def print_report(report, provider_name):
+    print(f"\n[ LOAD TEST ] {report['sessions']} sessions x {report['iterations']} iterations "
+          f"({', '.join(report['pages'])}) | provider: {provider_name} | {report['seconds']:.1f}s")
+    print("=" * 78)
+    print(f"{'ACTION':<12} | {'COUNT':>6} | {'ERRORS':>6} | {'P50 ms':>9} | {'P95 ms':>9} | {'P99 ms':>9} | {'MAX ms':>9}")
+    print("-" * 78)
+    for action, s in report['actions'].items():
+        print(f"{action:<12} | {s['count']:>6} | {s['errors']:>6} | {s['p50_ms']:>9.0f} | {s['p95_ms']:>9.0f} | "
+              f"{s['p99_ms']:>9.0f} | {s['max_ms']:>9.0f}")
+    print("-" * 78)
+    mem = report['memory_mb']
+    print(f"Throughput: {report['throughput_per_s']:.2f} actions/s")
+    print(f"Memory: {mem['baseline']:.0f} MB before, {mem['end']:.0f} MB after, ~{mem['per_session']:.1f} MB per session")
+    if report['counters']:
+        print("Counters: " + ", ".join(f"{k}={v:g}" for k, v in sorted(report['counters'].items())))
+    for e in report['errors'][:10]:
+        print(f"!! {e}")
+    print("=" * 78)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate concurrent Smart DCA app sessions against fake market data.")
+    parser.add_argument("--sessions", type=int, default=8, help="Concurrent simulated users")
+    parser.add_argument("--iterations", type=int, default=3, help="Page visits per session")
+    parser.add_argument("--pages", nargs="+", choices=PAGES, default=PAGES)
+    parser.add_argument("--ramp-s", type=float, default=0.0, help="Spread session starts over this many seconds")
+    parser.add_argument("--distinct", action="store_true",
+                        help="Give each session its own backtest period (defeats the shared result cache)")
+    parser.add_argument("--market-data", default="synthetic", help="'synthetic' or 'replay:<dir>' (see market_data.py)")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Simulated provider latency per request")
+    parser.add_argument("--result-cache", help="Backtest result cache directory (default: a fresh temporary one)")
+    parser.add_argument("--timeout", type=float, default=300, help="Seconds one page run may take")
+    parser.add_argument("--json", help="Also write the report to this file")
+    parser.add_argument("--ledger", action="store_true", help="Write the perf timing ledger of the run")
+    args = parser.parse_args(argv)
+
+    # Before the app modules read them at import time
+    os.environ["SMART_DCA_RESULT_CACHE"] = args.result_cache or tempfile.mkdtemp(prefix="smart_dca_load_")
+    os.environ["SMART_DCA_REPLAY_LATENCY_MS"] = str(args.latency_ms)
+    if args.market_data.split(":")[0] not in ("synthetic", "replay"):
+        parser.error("--market-data must be 'synthetic' or 'replay:<dir>' (a load test never calls Yahoo)")
+
+    from market_data import provider_from_spec, set_provider
+    provider = provider_from_spec(args.market_data)
+    set_provider(provider)
+
+    report = run_load_test(args.sessions, args.iterations, args.pages, args.ramp_s, args.distinct, args.timeout)
+    print_report(report, f"{provider.name} ({args.latency_ms:g} ms)")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2, default=str)
+    if args.ledger:
+        from perf import write_ledger
+        print(f"Timing ledger: {write_ledger()}")
+    if report['errors']:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
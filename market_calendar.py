@@ -0,0 +1,157 @@
+"""
+NYSE trading calendar for cache expiry.
+
+Daily bars only change when a session closes: every bar before the last completed
+session is final, and the latest one is replaced once per trading day, shortly
+after the close. cache_window() turns a (start, end) request into a cache key
+built on that: windows in the past never expire, windows reaching today expire
+when the next session close (plus a settle delay for the provider) has passed.
+Weekends and exchange holidays never expire anything.
+"""
+import os
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+import numpy as np
+import pandas as pd
+
+EXCHANGE_TZ = ZoneInfo("America/New_York")
+CLOSE_TIME = time(16, 0)
+EARLY_CLOSE_TIME = time(13, 0)
+# Minutes after the close before the provider's daily bar is considered final
+SETTLE_MINUTES = int(os.environ.get("SMART_DCA_CLOSE_SETTLE_MIN", 30))
+
+# Unscheduled closures (weather, national days of mourning)
+SPECIAL_CLOSURES = {
+    date(2001, 9, 11), date(2001, 9, 12), date(2001, 9, 13), date(2001, 9, 14),
+    date(2004, 6, 11), date(2007, 1, 2), date(2012, 10, 29), date(2012, 10, 30),
+    date(2018, 12, 5), date(2025, 1, 9)
+}
+
+# === HOLIDAY RULES ===
+def _easter(year):
+    """Gregorian Easter Sunday (anonymous algorithm)."""
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = b // 4, b % 4
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month = (h + l - 7 * m + 114) // 31
+    day = (h + l - 7 * m + 114) % 31 + 1
+    return date(year, month, day)
+
+def _nth_weekday(year, month, weekday, n):
+    """n-th (1-based; -1 = last) weekday (Mon=0) of a month."""
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+def _observed(day):
+    """Saturday holidays move to Friday, Sunday holidays to Monday."""
+    if day.weekday() == 5: return day - timedelta(days=1)
+    if day.weekday() == 6: return day + timedelta(days=1)
+    return day
+
+@lru_cache(maxsize=None)
+def holidays(year):
+    """Full-day NYSE closures of a year."""
+    days = {
+        _nth_weekday(year, 1, 0, 3),                # Martin Luther King Jr. Day
+        _nth_weekday(year, 2, 0, 3),                # Washington's Birthday
+        _easter(year) - timedelta(days=2),          # Good Friday
+        _nth_weekday(year, 5, 0, -1),               # Memorial Day
+        _observed(date(year, 7, 4)),                # Independence Day
+        _nth_weekday(year, 9, 0, 1),                # Labor Day
+        _nth_weekday(year, 11, 3, 4),               # Thanksgiving
+        _observed(date(year, 12, 25)),              # Christmas
+    }
+    # New Year's Day on a Saturday is not made up on the Friday before
+    new_year = date(year, 1, 1)
+    if new_year.weekday() != 5: days.add(_observed(new_year))
+    if year >= 2022: days.add(_observed(date(year, 6, 19)))  # Juneteenth
+    days |= {d for d in SPECIAL_CLOSURES if d.year == year}
+    return frozenset(days)
+
+def is_trading_day(day):
+    day = pd.Timestamp(day).date()
+    return day.weekday() < 5 and day not in holidays(day.year)
+
+def close_time(day):
+    """Scheduled close of a session (1 pm before Independence Day, after Thanksgiving, on Christmas Eve)."""
+    day = pd.Timestamp(day).date()
+    early = {date(day.year, 7, 3), _nth_weekday(day.year, 11, 3, 4) + timedelta(days=1), date(day.year, 12, 24)}
+    return EARLY_CLOSE_TIME if day in early else CLOSE_TIME
+
+def previous_session(day):
+    """Last trading day strictly before `day`."""
+    day = pd.Timestamp(day).date() - timedelta(days=1)
+    while not is_trading_day(day):
+        day -= timedelta(days=1)
+    return day
+
+@lru_cache(maxsize=64)
+def _holiday_array(first_year, last_year):
+    return np.array(sorted(d for y in range(first_year, last_year + 1) for d in holidays(y)), dtype='datetime64[D]')
+
+def sessions_back(day, n):
+    """The n-th trading day strictly before `day` (so [result, day) holds n sessions)."""
+    day = pd.Timestamp(day).date()
+    if n <= 0: return day
+    years = _holiday_array(day.year - n // 240 - 2, day.year + 1)
+    return pd.Timestamp(np.busday_offset(np.datetime64(day, 'D'), -n, roll='forward', holidays=years)).date()
+
+def trading_days(start, end):
+    """DatetimeIndex of the trading days in [start, end]."""
+    start, end = pd.Timestamp(start).date(), pd.Timestamp(end).date()
+    days = np.arange(np.datetime64(start, 'D'), np.datetime64(end, 'D') + 1)
+    return pd.DatetimeIndex(days[np.is_busday(days, holidays=_holiday_array(start.year, end.year))])
+
+def _settled_at(day):
+    """Exchange-time moment the daily bar of `day` is final."""
+    close = datetime.combine(day, close_time(day), tzinfo=EXCHANGE_TZ)
+    return close + timedelta(minutes=SETTLE_MINUTES)
+
+def _exchange_now(now=None):
+    if now is None: return datetime.now(EXCHANGE_TZ)
+    now = pd.Timestamp(now)
+    return (now.tz_convert(EXCHANGE_TZ) if now.tzinfo else now.tz_localize(EXCHANGE_TZ)).to_pydatetime()
+
+# === SESSION STATE ===
+def last_completed_session(now=None):
+    """Latest trading day whose daily bar is final at `now` (default: the current time)."""
+    now = _exchange_now(now)
+    today = now.date()
+    if is_trading_day(today) and now >= _settled_at(today):
+        return today
+    return previous_session(today)
+
+def next_refresh(now=None):
+    """Exchange-time moment the latest daily bar next changes (next settled close after `now`)."""
+    now = _exchange_now(now)
+    day = now.date()
+    while not is_trading_day(day) or now >= _settled_at(day):
+        day += timedelta(days=1)
+    return _settled_at(day)
+
+def cache_window(start_date, end_date, now=None):
+    """
+    Normalize a daily-bar request for caching: (start_day, end_day, version).
+
+    Days are midnight timestamps; end_day keeps yf.download's exclusive-end meaning
+    (an end with a time of day is rounded up to the next midnight, which keeps its bar).
+    A window ending at or before the last completed session is final: version None,
+    cacheable forever. A window reaching past it is clipped to end after that
+    session and versioned by its date, so it changes once per session close.
+    """
+    start_day = pd.Timestamp(start_date).normalize()
+    end_day = pd.Timestamp(end_date).ceil('D')
+    last = pd.Timestamp(last_completed_session(now))
+    cap = last + pd.Timedelta(days=1)
+    if end_day >= cap:
+        return start_day, cap, last.strftime('%Y-%m-%d')
+    return start_day, end_day, None
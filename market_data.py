@@ -0,0 +1,278 @@
+"""
+Market data providers.
+
+Every Yahoo Finance call in the app goes through the active provider:
+
+    YahooProvider      live yfinance (default)
+    RecordingProvider  live calls, each raw response also saved to a directory
+    ReplayProvider     serves saved responses only, with optional latency and failures
+    SyntheticProvider  generated random-walk bars for any symbol (load tests, demos)
+
+Select one with SMART_DCA_MARKET_DATA ("record:<dir>", "replay:<dir>" or "synthetic"),
+the scheduler's --market-data option, or set_provider() in code. Replay tuning:
+SMART_DCA_REPLAY_LATENCY_MS, SMART_DCA_REPLAY_JITTER_MS, SMART_DCA_REPLAY_FAILURE_RATE
+and SMART_DCA_REPLAY_SEED (the latency also applies to synthetic data).
+"""
+import logging
+import os
+import pickle
+import random
+import re
+import threading
+import time
+import uuid
+import zlib
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+class MissingRecording(LookupError):
+    """Replay mode was asked for a response that was never recorded."""
+
+class InjectedFailure(ConnectionError):
+    """Failure raised on purpose by ReplayProvider(failure_rate=...)."""
+
+def _day(value):
+    return pd.Timestamp(value).strftime('%Y-%m-%d')
+
+def _safe(symbol):
+    return re.sub(r'[^A-Za-z0-9._=-]', '_', symbol)
+
+# === PROVIDERS ===
+class YahooProvider:
+    name = "yahoo"
+
+    def download(self, symbol, start, end):
+        """Daily bars for one symbol (raw yf.download output)."""
+        import yfinance as yf
+        return yf.download(symbol, start=start, end=end, progress=False, auto_adjust=False)
+
+    def history(self, symbol, period="5d"):
+        """Recent bars for one symbol (raw Ticker.history output)."""
+        import yfinance as yf
+        return yf.Ticker(symbol).history(period=period)
+
+    def download_many(self, symbols, period="5d"):
+        """Recent bars for many symbols in one request, grouped by ticker."""
+        import yfinance as yf
+        return yf.download(list(symbols), period=period, progress=False, auto_adjust=False, group_by='ticker')
+
+def _recording_name(method, symbol, *parts):
+    return "__".join([method, _safe(symbol), *parts]) + ".pkl"
+
+class RecordingProvider:
+    """
+    Wraps a provider and saves every raw response (or the exception it raised)
+    as a pickle named after the call, e.g. download__VOO__2019-01-01__2024-06-30.pkl.
+    """
+    name = "record"
+
+    def __init__(self, directory, inner=None):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.inner = inner or YahooProvider()
+
+    def _record(self, name, call):
+        try:
+            result = call()
+        except Exception as e:
+            self._save(name, {'error': repr(e), 'type': type(e).__name__})
+            raise
+        self._save(name, {'data': result})
+        return result
+
+    def _save(self, name, payload):
+        path = self.directory / name
+        tmp = path.with_name(f".{name}.{uuid.uuid4().hex[:8]}.tmp")
+        with open(tmp, 'wb') as f:
+            pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    def download(self, symbol, start, end):
+        return self._record(_recording_name("download", symbol, _day(start), _day(end)),
+                            lambda: self.inner.download(symbol, start, end))
+
+    def history(self, symbol, period="5d"):
+        return self._record(_recording_name("history", symbol, period),
+                            lambda: self.inner.history(symbol, period))
+
+    def download_many(self, symbols, period="5d"):
+        key = "+".join(sorted(symbols))
+        return self._record(_recording_name("download_many", key, period),
+                            lambda: self.inner.download_many(symbols, period))
+
+class ReplayProvider:
+    """
+    Serves recorded responses; never touches the network.
+
+    A download() with no exact recording falls back to the recording of the same
+    symbol that overlaps the requested range most, sliced to that range, so runs
+    keyed on "today" still replay after the day changes.
+
+    latency_ms / jitter_ms: delay added to every call (uniform jitter on top)
+    failure_rate: probability that a call raises InjectedFailure
+    seed: makes the latency and failure sequence reproducible
+    """
+    name = "replay"
+
+    def __init__(self, directory, latency_ms=0, jitter_ms=0, failure_rate=0.0, seed=None):
+        self.directory = Path(directory)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.failure_rate = failure_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _delay_and_fail(self, what):
+        with self._lock:
+            delay = self.latency_ms + (self._rng.uniform(0, self.jitter_ms) if self.jitter_ms else 0)
+            fail = self.failure_rate > 0 and self._rng.random() < self.failure_rate
+        if delay: time.sleep(delay / 1000)
+        if fail: raise InjectedFailure(f"Injected failure for {what}")
+
+    def _load(self, path):
+        with open(path, 'rb') as f:
+            payload = pickle.load(f)
+        if 'error' in payload:
+            raise ConnectionError(f"Recorded {payload['type']}: {payload['error']}")
+        return payload['data'].copy()
+
+    def _closest_download(self, symbol, start, end):
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        best, best_overlap = None, pd.Timedelta(0)
+        for path in self.directory.glob(f"download__{_safe(symbol)}__*.pkl"):
+            rec_start, rec_end = (pd.Timestamp(p) for p in path.stem.split("__")[2:4])
+            overlap = min(end, rec_end) - max(start, rec_start)
+            if overlap > best_overlap:
+                best, best_overlap = path, overlap
+        return best
+
+    def download(self, symbol, start, end):
+        self._delay_and_fail(symbol)
+        path = self.directory / _recording_name("download", symbol, _day(start), _day(end))
+        if path.exists():
+            return self._load(path)
+        path = self._closest_download(symbol, start, end)
+        if path is None:
+            raise MissingRecording(f"No recording of {symbol} overlapping {_day(start)}..{_day(end)} in {self.directory}")
+        df = self._load(path)
+        # yf.download's end date is exclusive
+        return df.loc[(df.index >= pd.Timestamp(start)) & (df.index < pd.Timestamp(end))]
+
+    def history(self, symbol, period="5d"):
+        self._delay_and_fail(symbol)
+        path = self.directory / _recording_name("history", symbol, period)
+        if not path.exists():
+            raise MissingRecording(f"No history recording for {symbol} in {self.directory}")
+        return self._load(path)
+
+    def download_many(self, symbols, period="5d"):
+        self._delay_and_fail(",".join(symbols))
+        path = self.directory / _recording_name("download_many", "+".join(sorted(symbols)), period)
+        if not path.exists():
+            raise MissingRecording(f"No batch recording for {sorted(symbols)} in {self.directory}")
+        return self._load(path)
+
+class SyntheticProvider:
+    """
+    Deterministic random-walk bars for any symbol: the same symbol gives the same
+    series in every call and every process. ^VIX and ^TNX get plausible levels.
+    latency_ms: delay added to every call
+    """
+    name = "synthetic"
+    CALENDAR = ('2000-01-03', '2035-12-31')
+
+    def __init__(self, latency_ms=0):
+        self.latency_ms = latency_ms
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def _close(self, symbol):
+        with self._lock:
+            if symbol not in self._series:
+                rng = np.random.default_rng(zlib.crc32(symbol.encode()))
+                dates = pd.bdate_range(*self.CALENDAR)
+                steps = rng.normal(0, 1, len(dates))
+                if symbol == '^VIX':
+                    # Mean-reverting around 18 in log space
+                    level = np.empty(len(dates))
+                    x = 0.0
+                    for i, e in enumerate(steps):
+                        x = 0.97 * x + 0.08 * e
+                        level[i] = x
+                    values = 18 * np.exp(level)
+                elif symbol == '^TNX':
+                    values = np.clip(4 + np.cumsum(steps * 0.03), 0.5, 8)
+                else:
+                    values = 100 * np.exp(np.cumsum(0.0003 + 0.012 * steps))
+                self._series[symbol] = pd.Series(values, index=dates)
+            return self._series[symbol]
+
+    def _bars(self, close):
+        return pd.DataFrame({'Open': close, 'High': close * 1.005, 'Low': close * 0.995, 'Close': close,
+                             'Adj Close': close, 'Volume': 1e6})
+
+    def _sleep(self):
+        if self.latency_ms: time.sleep(self.latency_ms / 1000)
+
+    def download(self, symbol, start, end):
+        self._sleep()
+        close = self._close(symbol)
+        close = close.loc[(close.index >= pd.Timestamp(start)) & (close.index < pd.Timestamp(end))]
+        df = self._bars(close)
+        df.columns = pd.MultiIndex.from_product([df.columns, [symbol]], names=['Price', 'Ticker'])
+        return df
+
+    def history(self, symbol, period="5d"):
+        self._sleep()
+        close = self._close(symbol)
+        return self._bars(close.loc[close.index <= pd.Timestamp.now()].tail(int(period.rstrip('d') or 5)))
+
+    def download_many(self, symbols, period="5d"):
+        self._sleep()
+        now = pd.Timestamp.now()
+        n = int(period.rstrip('d') or 5)
+        return pd.concat({s: self._bars(self._close(s).loc[lambda c: c.index <= now].tail(n)) for s in symbols},
+                         axis=1)
+
+# === SELECTION ===
+_provider = None
+_provider_lock = threading.Lock()
+
+def provider_from_spec(spec):
+    """'yahoo', 'synthetic', 'record:<dir>' or 'replay:<dir>' -> provider (replay tuning read from the environment)."""
+    mode, _, directory = (spec or "yahoo").partition(":")
+    if mode == "yahoo":
+        return YahooProvider()
+    if mode == "synthetic":
+        return SyntheticProvider(latency_ms=float(os.environ.get("SMART_DCA_REPLAY_LATENCY_MS", 0)))
+    if not directory:
+        raise ValueError(f"Market data mode '{mode}' needs a directory, e.g. {mode}:recordings")
+    if mode == "record":
+        return RecordingProvider(directory)
+    if mode == "replay":
+        seed = os.environ.get("SMART_DCA_REPLAY_SEED")
+        return ReplayProvider(directory,
+                              latency_ms=float(os.environ.get("SMART_DCA_REPLAY_LATENCY_MS", 0)),
+                              jitter_ms=float(os.environ.get("SMART_DCA_REPLAY_JITTER_MS", 0)),
+                              failure_rate=float(os.environ.get("SMART_DCA_REPLAY_FAILURE_RATE", 0)),
+                              seed=int(seed) if seed else None)
+    raise ValueError(f"Unknown market data mode: {mode}")
+
+def get_provider():
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            _provider = provider_from_spec(os.environ.get("SMART_DCA_MARKET_DATA"))
+            if _provider.name != "yahoo":
+                logger.info("Market data provider: %s", _provider.name)
+        return _provider
+
+def set_provider(provider):
+    """Install a provider (None = back to the environment default). Returns the previous one."""
+    global _provider
+    with _provider_lock:
+        previous, _provider = _provider, provider
+    return previous
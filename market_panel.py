@@ -0,0 +1,285 @@
+import hashlib
+import json
+import shutil
+import uuid
+from datetime import datetime
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from perf import span
+
+PANEL_FORMAT_VERSION = 1
+
+# Preferred column order; any other numeric column is appended after these
+PANEL_FIELDS = [
+    'Open', 'High', 'Low', 'Close', 'Adj Close', 'Volume',
+    'RSI', 'MA20', 'STD20', 'BB_Upper', 'BB_Lower', 'BB_PctB',
+    'MA50', 'MA200', 'Dist_MA200',
+    'MACD_Line', 'MACD_Signal', 'MACD_Hist', 'EMA13'
+]
+# Same value for every ticker on a given date -> stored once, not per ticker
+MACRO_FIELDS = ['VIX', 'TNX']
+# Impulse is categorical; stored as int8 codes
+IMPULSE_CODES = ['Blue', 'Green', 'Red']
+
+class MarketPanel:
+    """
+    Aligned market data for many tickers.
+
+    values[f, i, j] -> field f, date position i, ticker j (float64, NaN if no bar)
+    impulse[i, j]   -> index into IMPULSE_CODES (-1 if no bar)
+    macro[m, i]     -> MACRO_FIELDS m on date i
+
+    Arrays may be read-only memory maps (see load_panel).
+    """
+    def __init__(self, dates, tickers, fields, values, impulse, macro):
+        self.dates = pd.DatetimeIndex(dates)
+        self.tickers = list(tickers)
+        self.fields = list(fields)
+        self.values = values
+        self.impulse = impulse
+        self.macro = macro
+        self._field_pos = {f: k for k, f in enumerate(self.fields)}
+        self._ticker_pos = {t: k for k, t in enumerate(self.tickers)}
+
+    def __len__(self):
+        return len(self.dates)
+
+    def __repr__(self):
+        return f"MarketPanel({len(self.tickers)} tickers x {len(self.dates)} dates x {len(self.fields)} fields)"
+
+    # --- Accessors ---
+    def field(self, name):
+        """2D (dates x tickers) view of one field. Macro fields are broadcast across tickers."""
+        if name in MACRO_FIELDS:
+            col = self.macro[MACRO_FIELDS.index(name)]
+            return np.broadcast_to(col[:, None], (len(self.dates), len(self.tickers)))
+        return self.values[self._field_pos[name]]
+
+    def series(self, name, ticker):
+        """1D array of one field for one ticker."""
+        if name in MACRO_FIELDS:
+            return self.macro[MACRO_FIELDS.index(name)]
+        return self.values[self._field_pos[name], :, self._ticker_pos[ticker]]
+
+    def has_field(self, name):
+        return name in self._field_pos or name in MACRO_FIELDS
+
+    def ticker_index(self, ticker):
+        return self._ticker_pos[ticker]
+
+    def last_position(self, ticker):
+        """Position of the ticker's most recent bar (-1 if it has none)."""
+        valid = np.flatnonzero(~np.isnan(self.series('Close', ticker)))
+        return int(valid[-1]) if len(valid) else -1
+
+    def last_positions(self):
+        """Most recent bar position of every ticker at once (-1 where a ticker has none)."""
+        valid = self.valid_mask()
+        if len(self.dates) == 0: return np.full(len(self.tickers), -1)
+        last = len(self.dates) - 1 - valid[::-1].argmax(axis=0)
+        return np.where(valid.any(axis=0), last, -1)
+
+    def nearest_positions(self, ticker, dates):
+        """
+        For each timestamp, the position of the ticker's nearest bar.
+        Vectorised equivalent of df.index.get_indexer([date], method='nearest') per date.
+        """
+        valid = np.flatnonzero(~np.isnan(self.series('Close', ticker)))
+        return valid[self.dates[valid].get_indexer(pd.DatetimeIndex(dates), method='nearest')]
+
+    def take(self, fields, positions):
+        """
+        Gather fields at per-ticker date positions.
+        positions: (n x tickers) int array, e.g. from backtest.contribution_schedule.
+        Returns {field: (n x tickers) array}; 'Impulse' gives int codes, unknown fields are NaN.
+        """
+        cols = np.arange(len(self.tickers))[None, :]
+        out = {}
+        for f in fields:
+            if f == 'Impulse':
+                out[f] = np.asarray(self.impulse)[positions, cols]
+            elif self.has_field(f):
+                out[f] = np.asarray(self.field(f))[positions, cols]
+            else:
+                out[f] = np.full(positions.shape, np.nan)
+        return out
+
+    def valid_mask(self):
+        """(dates x tickers) True where the ticker has a Close on that date."""
+        return ~np.isnan(self.field('Close'))
+
+    def common_positions(self):
+        """Date positions where every ticker has a bar (the backtest's intersection index)."""
+        return np.flatnonzero(self.valid_mask().all(axis=1))
+
+    def position_of(self, date, method='nearest'):
+        """Date position for a timestamp (nearest by default, like the backtest lookups)."""
+        return int(self.dates.get_indexer([pd.Timestamp(date)], method=method)[0])
+
+    def row(self, pos, ticker):
+        """Dict of every field for one ticker at one date position (like df.iloc[pos])."""
+        j = self._ticker_pos[ticker]
+        out = {f: float(self.values[k, pos, j]) for k, f in enumerate(self.fields)}
+        for m, name in enumerate(MACRO_FIELDS):
+            out[name] = float(self.macro[m, pos])
+        code = int(self.impulse[pos, j])
+        out['Impulse'] = IMPULSE_CODES[code] if code >= 0 else 'Blue'
+        return out
+
+    def fingerprint(self):
+        """Content hash of the panel (dates, tickers, fields and every array); computed once."""
+        if getattr(self, '_fingerprint', None) is None:
+            h = hashlib.blake2b(digest_size=16)
+            h.update(np.asarray(self.dates.values, dtype='datetime64[ns]').tobytes())
+            h.update(json.dumps([self.tickers, self.fields]).encode())
+            for arr in (self.values, self.impulse, self.macro):
+                h.update(np.ascontiguousarray(arr).tobytes())
+            self._fingerprint = h.hexdigest()
+        return self._fingerprint
+
+    def select(self, tickers):
+        """Panel restricted to some tickers (same dates; copies the arrays)."""
+        cols = [self._ticker_pos[t] for t in tickers]
+        return MarketPanel(self.dates, tickers, self.fields, np.asarray(self.values)[:, :, cols],
+                           np.asarray(self.impulse)[:, cols], np.asarray(self.macro).copy())
+
+    # --- Conversion ---
+    def to_frame(self, ticker, dropna=True):
+        """Rebuild the per-ticker DataFrame that fetch_data used to return (copies data)."""
+        j = self._ticker_pos[ticker]
+        df = pd.DataFrame(np.asarray(self.values[:, :, j]).T, index=self.dates, columns=self.fields)
+        for m, name in enumerate(MACRO_FIELDS):
+            df[name] = np.asarray(self.macro[m])
+        codes = np.asarray(self.impulse[:, j])
+        df['Impulse'] = np.array(IMPULSE_CODES, dtype=object)[np.clip(codes, 0, None)]
+        if dropna:
+            df = df.loc[~np.isnan(df['Close'].to_numpy())]
+        return df
+
+    def to_data_map(self):
+        return {t: self.to_frame(t) for t in self.tickers}
+
+    @classmethod
+    def from_data_map(cls, data_map):
+        """Align a {ticker: DataFrame} dict (fetch_data output) onto one date index."""
+        tickers, dates, fields, values, impulse = _align_frames(data_map)
+        macro = np.full((len(MACRO_FIELDS), len(dates)), np.nan)
+        for t in tickers:
+            df = data_map[t]
+            pos = dates.get_indexer(df.index)
+            for m, name in enumerate(MACRO_FIELDS):
+                if name in df.columns:
+                    col = macro[m, pos]
+                    macro[m, pos] = np.where(np.isnan(col), df[name].to_numpy(dtype=float), col)
+        return cls(dates, tickers, fields, values, impulse, macro)
+
+    @classmethod
+    def from_frames(cls, frames, macro_series):
+        """
+        Build from per-ticker frames WITHOUT macro columns plus one series per
+        macro field ({'VIX': Series, 'TNX': Series}), aligned once by forward fill.
+        """
+        tickers, dates, fields, values, impulse = _align_frames(frames)
+        macro = np.full((len(MACRO_FIELDS), len(dates)), np.nan)
+        for m, name in enumerate(MACRO_FIELDS):
+            series = macro_series.get(name)
+            if series is not None and len(series):
+                series = series[~series.index.duplicated()].sort_index()
+                macro[m] = series.reindex(dates, method='ffill').to_numpy(dtype=float)
+        return cls(dates, tickers, fields, values, impulse, macro)
+
+def _align_frames(frames):
+    """Union date index + dense (field x date x ticker) array for a dict of DataFrames."""
+    tickers = [t for t, df in frames.items() if df is not None and not df.empty]
+    if not tickers:
+        return [], pd.DatetimeIndex([]), [], np.empty((0, 0, 0)), np.empty((0, 0), dtype=np.int8)
+
+    dates = frames[tickers[0]].index
+    for t in tickers[1:]:
+        dates = dates.union(frames[t].index)
+
+    present = set()
+    for t in tickers:
+        present.update(c for c in frames[t].columns
+                       if c not in MACRO_FIELDS and c != 'Impulse' and pd.api.types.is_numeric_dtype(frames[t][c]))
+    fields = [f for f in PANEL_FIELDS if f in present] + sorted(present - set(PANEL_FIELDS))
+
+    values = np.full((len(fields), len(dates), len(tickers)), np.nan)
+    impulse = np.full((len(dates), len(tickers)), -1, dtype=np.int8)
+    code_of = {c: k for k, c in enumerate(IMPULSE_CODES)}
+
+    for j, t in enumerate(tickers):
+        df = frames[t]
+        pos = dates.get_indexer(df.index)
+        for k, f in enumerate(fields):
+            if f in df.columns:
+                values[k, pos, j] = df[f].to_numpy(dtype=float)
+        if 'Impulse' in df.columns:
+            impulse[pos, j] = df['Impulse'].map(code_of).fillna(0).to_numpy(dtype=np.int8)
+    return tickers, dates, fields, values, impulse
+
+# ==========================================
+# MEMORY-MAPPED STORAGE
+# ==========================================
+def save_panel(panel, directory):
+    """
+    Write the panel as raw .npy arrays plus a small JSON index.
+    Files are written to a temp directory and renamed into place, so readers never see half-written arrays.
+    """
+    directory = Path(directory)
+    tmp = directory.parent / f".{directory.name}.{uuid.uuid4().hex[:8]}.tmp"
+    tmp.mkdir(parents=True)
+
+    with span("panel.save", tickers=len(panel.tickers), dates=len(panel.dates)):
+        np.save(tmp / "values.npy", np.ascontiguousarray(panel.values, dtype=np.float64))
+        np.save(tmp / "impulse.npy", np.ascontiguousarray(panel.impulse, dtype=np.int8))
+        np.save(tmp / "macro.npy", np.ascontiguousarray(panel.macro, dtype=np.float64))
+        np.save(tmp / "dates.npy", panel.dates.values.astype("datetime64[ns]"))
+        index = {
+            'version': PANEL_FORMAT_VERSION,
+            'created_at': datetime.now().isoformat(),
+            'tickers': panel.tickers,
+            'fields': panel.fields,
+            'macro_fields': MACRO_FIELDS,
+            'impulse_codes': IMPULSE_CODES,
+            'first_date': panel.dates[0].isoformat() if len(panel.dates) else None,
+            'last_date': panel.dates[-1].isoformat() if len(panel.dates) else None,
+        }
+        with open(tmp / "index.json", "w") as f:
+            json.dump(index, f, indent=2)
+
+    if directory.exists():
+        old = directory.parent / f".{directory.name}.{uuid.uuid4().hex[:8]}.old"
+        directory.rename(old)
+        tmp.rename(directory)
+        shutil.rmtree(old, ignore_errors=True)
+    else:
+        tmp.rename(directory)
+    return directory
+
+def load_panel(directory, mmap=True):
+    """
+    Open a saved panel. With mmap=True the arrays are read-only memory maps:
+    opening costs O(index) and every process reading the same files shares
+    the OS page cache instead of holding its own copy.
+    """
+    directory = Path(directory)
+    with open(directory / "index.json") as f:
+        index = json.load(f)
+    if index.get('version') != PANEL_FORMAT_VERSION:
+        raise ValueError(f"Unsupported panel format version: {index.get('version')}")
+    if index['macro_fields'] != MACRO_FIELDS or index['impulse_codes'] != IMPULSE_CODES:
+        raise ValueError("Panel was written with a different field layout")
+
+    mode = 'r' if mmap else None
+    values = np.load(directory / "values.npy", mmap_mode=mode)
+    impulse = np.load(directory / "impulse.npy", mmap_mode=mode)
+    macro = np.load(directory / "macro.npy", mmap_mode=mode)
+    dates = pd.DatetimeIndex(np.load(directory / "dates.npy"))
+    return MarketPanel(dates, index['tickers'], index['fields'], values, impulse, macro)
+
+def write_market_snapshot(tickers, start_date, end_date, directory):
+    """Fetch once and write the aligned panel for process-pool workers to map."""
+    from data_handler import fetch_data
+    return save_panel(MarketPanel.from_data_map(fetch_data(tickers, start_date, end_date)), directory)
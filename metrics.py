@@ -0,0 +1,170 @@
+import numpy as np
+import pandas as pd
+
+XIRR_MAX_ITER = 50
+XIRR_TOL = 1e-10
+
+def _days(dates):
+    """Days since the first date, as floats (independent of the index's time unit)."""
+    dates = pd.DatetimeIndex(dates)
+    return np.asarray((dates - dates[0]) / pd.Timedelta(days=1), dtype=float)
+
+def periods_per_year(dates):
+    """Trading periods per year implied by the spacing of dates (daily, weekly or monthly)."""
+    if len(dates) < 2: return 1
+    spacing = np.median(np.diff(_days(dates)))
+    if spacing <= 3: return 252
+    if spacing <= 8: return 52
+    return 12
+
+def cash_flows_from_invested(invested):
+    """Per-date contributions from cumulative invested curves (S x T)."""
+    invested = np.atleast_2d(np.asarray(invested, dtype=float))
+    return np.diff(invested, axis=1, prepend=0.0)
+
+def period_returns(values, cash_flows):
+    """
+    Time-weighted period returns (S x T-1): growth of the capital held at the previous
+    date, with that period's contribution (already included in the value) removed.
+    """
+    prev = values[:, :-1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r = (values[:, 1:] - cash_flows[:, 1:]) / prev - 1
+    return np.where(prev > 0, r, 0.0)
+
+def _npv(amounts, years, x):
+    """NPV of each row at continuous rate x = log(1 + r)."""
+    return (amounts * np.exp(-years * x[:, None])).sum(axis=1)
+
+def xirr(cash_flows, final_values, dates, guess=0.1):
+    """
+    Money-weighted annual return of many cash-flow streams at once.
+
+    cash_flows: (S x T) money put in on each date; final_values: (S,) value on the last date.
+    Batched Newton on log(1 + r); rows it does not settle fall back to batched bisection.
+    Returns (S,) rates; NaN where no rate zeroes the NPV.
+    """
+    years = _days(dates) / 365.0
+    amounts = -np.asarray(cash_flows, dtype=float).copy()
+    amounts[:, -1] += final_values
+    scale = np.abs(amounts).sum(axis=1)
+
+    x = np.full(amounts.shape[0], np.log1p(guess))
+    active = np.ones(amounts.shape[0], dtype=bool)
+    with np.errstate(over='ignore', divide='ignore', invalid='ignore'):
+        for _ in range(XIRR_MAX_ITER):
+            idx = np.flatnonzero(active)
+            if not len(idx): break
+            a = amounts[idx]
+            disc = np.exp(-years * x[idx, None])
+            npv = (a * disc).sum(axis=1)
+            d_npv = -(years * a * disc).sum(axis=1)
+            step = np.clip(npv / d_npv, -1.0, 1.0)  # damped: at most e^1 change per iteration
+            x[idx] -= step
+            active[idx[~np.isfinite(step) | (np.abs(step) < XIRR_TOL)]] = False
+
+        ok = np.isfinite(x) & (np.abs(_npv(amounts, years, x)) <= 1e-8 * scale)
+
+        # Bisection on the rest, where the NPV changes sign over the bracket
+        rest = np.flatnonzero(~ok)
+        if len(rest):
+            a = amounts[rest]
+            lo, hi = np.full(len(rest), -10.0), np.full(len(rest), 10.0)
+            f_lo = _npv(a, years, lo)
+            bracketed = np.sign(f_lo) != np.sign(_npv(a, years, hi))
+            for _ in range(100):
+                mid = (lo + hi) / 2
+                f_mid = _npv(a, years, mid)
+                left = np.sign(f_mid) == np.sign(f_lo)
+                lo, f_lo = np.where(left, mid, lo), np.where(left, f_mid, f_lo)
+                hi = np.where(left, hi, mid)
+            x[rest] = np.where(bracketed, (lo + hi) / 2, np.nan)
+            ok[rest] = bracketed
+
+    return np.where(ok, np.expm1(x), np.nan)
+
+def drawdowns(values, dates):
+    """Max drawdown (%) and the longest time under water (days) of each curve."""
+    peak = np.maximum.accumulate(values, axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        dd = np.where(peak > 0, (values - peak) / peak, 0.0)
+    # Position of the running peak for every date; duration = time since it
+    steps = np.arange(values.shape[1])
+    peak_pos = np.maximum.accumulate(np.where(values >= peak, steps, 0), axis=1)
+    days = _days(dates)
+    duration = (days[None, :] - days[peak_pos]).max(axis=1)
+    return dd.min(axis=1) * 100, duration
+
+def batch_metrics(values, cash_flows, dates, risk_free=0.0, baseline=0):
+    """
+    Risk/return metrics for a matrix of value curves.
+
+    values: (S x T) portfolio value on each date (after that date's contribution)
+    cash_flows: (S x T) amount contributed on each date (initial investment on the first one)
+    dates: the T dates
+    risk_free: annual rate used by Sharpe/Sortino
+    baseline: row whose total invested is 100% for 'capital_deployed'
+
+    Returns {metric: (S,) array}; see the keys at the bottom.
+    """
+    values = np.atleast_2d(np.asarray(values, dtype=float))
+    cash_flows = np.atleast_2d(np.asarray(cash_flows, dtype=float))
+    dates = pd.DatetimeIndex(dates)
+    ppy = periods_per_year(dates)
+    years = max((dates[-1] - dates[0]).days / 365.25, 1 / 365.25)
+
+    invested = cash_flows.sum(axis=1)
+    final = values[:, -1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        roi = np.where(invested > 0, (final - invested) / invested * 100, np.nan)
+
+    r = period_returns(values, cash_flows)
+    twr = np.prod(1 + r, axis=1) - 1
+    mean = r.mean(axis=1) * ppy
+    vol = r.std(axis=1, ddof=1) * np.sqrt(ppy) if r.shape[1] > 1 else np.zeros(len(r))
+    downside = np.sqrt((np.minimum(r, 0) ** 2).mean(axis=1)) * np.sqrt(ppy)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sharpe = np.where(vol > 0, (mean - risk_free) / vol, np.nan)
+        sortino = np.where(downside > 0, (mean - risk_free) / downside, np.nan)
+
+    mdd, mdd_days = drawdowns(values, dates)
+    twr_index = np.concatenate([np.ones((len(r), 1)), np.cumprod(1 + r, axis=1)], axis=1)
+    twr_mdd, _ = drawdowns(twr_index, dates)
+
+    return {
+        'final_value': final,
+        'invested': invested,
+        'profit': final - invested,
+        'roi': roi,
+        'xirr': xirr(cash_flows, final, dates) * 100,
+        'twr': twr * 100,
+        'twr_annual': ((1 + twr) ** (1 / years) - 1) * 100,
+        'volatility': vol * 100,
+        'sharpe': sharpe,
+        'sortino': sortino,
+        'max_drawdown': mdd,
+        'max_drawdown_days': mdd_days,
+        'twr_max_drawdown': twr_mdd,
+        'capital_deployed': invested / invested[baseline] * 100
+    }
+
+def backtest_metrics(res, risk_free=0.0):
+    """
+    batch_metrics for a backtest result, one row per strategy.
+    Accepts run_strategy_backtest output or run_portfolio_backtest(..., daily=True) output.
+    """
+    if 'names' in res:
+        names = res['names']
+        values = [res['values'][n] for n in names]
+        invested = [res['invested_curve'][n] for n in names]
+        dates = res['dates']
+    elif 'daily' in res:
+        names = ['std', 'v1', 'smart']
+        daily = res['daily']
+        values = [daily[f'{n}_val'] for n in names]
+        invested = [daily[f'{n}_invested'] for n in names]
+        dates = daily['dates']
+    else:
+        raise ValueError("backtest_metrics needs run_portfolio_backtest(..., daily=True) or run_strategy_backtest output")
+    out = batch_metrics(values, cash_flows_from_invested(invested), dates, risk_free)
+    return pd.DataFrame(out, index=names)
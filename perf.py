@@ -0,0 +1,184 @@
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+from pathlib import Path
+
+logger = logging.getLogger('smart_dca.perf')
+
+# Folder where one JSON ledger per run is written
+TIMING_LEDGER_DIR = Path(os.environ.get('SMART_DCA_TIMING_DIR', 'timing_ledger'))
+# The app's Performance Debug panel (timings, ledger writes, run reset) is shown only when set
+DEBUG_PANEL = os.environ.get('SMART_DCA_DEBUG') == '1'
+# Level for configure_logging(); INFO prints one JSON record per span
+LOG_LEVEL = os.environ.get('SMART_DCA_LOG_LEVEL')
+
+# Latency budgets in milliseconds (p95) per span name.
+# Used by check_slos(); override or extend at runtime as needed.
+DEFAULT_SLOS_MS = {
+    'data.fetch_data': 8000,
+    'data.download': 3000,
+    'analysis.calculate_indicators': 50,
+    'backtest.run_portfolio_backtest': 2000,
+    'email.send': 1500,
+}
+
+# Long-lived processes (the Streamlit server) keep only the most recent spans
+MAX_SPANS = 5000
+
+_lock = threading.Lock()
+
+def configure_logging(default='INFO'):
+    """Root handler for entry points: SMART_DCA_LOG_LEVEL, or `default` when unset."""
+    logging.basicConfig(level=(LOG_LEVEL or default).upper(), format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+def _new_run(run_id=None, label=None):
+    return {
+        'run_id': run_id or uuid.uuid4().hex[:12],
+        'label': label,
+        'started_at': datetime.now().isoformat(),
+        'spans': [],
+        'counters': {},
+    }
+
+_run = _new_run()
+
+def start_run(label=None, run_id=None):
+    """Reset the recorder and begin a new run. Returns the run id."""
+    global _run
+    with _lock:
+        _run = _new_run(run_id, label)
+        return _run['run_id']
+
+def current_run():
+    """Snapshot of the current run (spans + counters)."""
+    with _lock:
+        return {
+            **_run,
+            'spans': list(_run['spans']),
+            'counters': dict(_run['counters']),
+        }
+
+def incr(name, value=1):
+    """Increment a named counter (cache hits, rows processed, bytes downloaded...)."""
+    with _lock:
+        _run['counters'][name] = _run['counters'].get(name, 0) + value
+
+@contextmanager
+def span(name, **attrs):
+    """
+    Time a block of code.
+
+    Usage:
+        with span('data.download', ticker='VOO') as s:
+            df = ...
+            s['rows'] = len(df)
+
+    Extra keys set on the yielded dict end up in the span record.
+    """
+    record = dict(attrs)
+    status = 'ok'
+    t0 = time.perf_counter()
+    try:
+        yield record
+    except Exception as e:
+        status = 'error'
+        record['error'] = repr(e)
+        raise
+    finally:
+        entry = {
+            'name': name,
+            'ms': round((time.perf_counter() - t0) * 1000, 3),
+            'status': status,
+            'ts': datetime.now().isoformat(),
+            'thread': threading.current_thread().name,
+            **record,
+        }
+        with _lock:
+            _run['spans'].append(entry)
+            if len(_run['spans']) > MAX_SPANS:
+                del _run['spans'][:-MAX_SPANS]
+            run_id = _run['run_id']
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps({'run_id': run_id, **entry}, default=str))
+
+def timed(name):
+    """Decorator form of span()."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def _percentile(sorted_vals, q):
+    if not sorted_vals:
+        return 0.0
+    k = (len(sorted_vals) - 1) * q
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_vals) - 1)
+    return sorted_vals[lo] + (sorted_vals[hi] - sorted_vals[lo]) * (k - lo)
+
+def summarize(run=None):
+    """Aggregate spans by name: count, total, mean, p50, p95, p99, max, errors."""
+    run = run or current_run()
+    grouped = {}
+    for s in run['spans']:
+        grouped.setdefault(s['name'], []).append(s)
+
+    summary = {}
+    for name, items in grouped.items():
+        durations = sorted(s['ms'] for s in items)
+        total = sum(durations)
+        summary[name] = {
+            'count': len(durations),
+            'total_ms': round(total, 3),
+            'mean_ms': round(total / len(durations), 3),
+            'p50_ms': round(_percentile(durations, 0.50), 3),
+            'p95_ms': round(_percentile(durations, 0.95), 3),
+            'p99_ms': round(_percentile(durations, 0.99), 3),
+            'max_ms': durations[-1],
+            'errors': sum(1 for s in items if s['status'] != 'ok'),
+        }
+    return summary
+
+def check_slos(slos=None, run=None):
+    """
+    Compare p95 latencies against budgets.
+    Returns a list of violations: [{'name', 'p95_ms', 'budget_ms'}, ...]
+    """
+    slos = DEFAULT_SLOS_MS if slos is None else slos
+    summary = summarize(run)
+    violations = []
+    for name, budget in slos.items():
+        stats = summary.get(name)
+        if stats and stats['p95_ms'] > budget:
+            violations.append({'name': name, 'p95_ms': stats['p95_ms'], 'budget_ms': budget})
+    return violations
+
+def write_ledger(directory=None):
+    """
+    Persist the current run (raw spans, counters, summary, SLO check) as JSON.
+    Returns the path of the written file.
+    """
+    directory = Path(directory) if directory else TIMING_LEDGER_DIR
+    directory.mkdir(parents=True, exist_ok=True)
+    run = current_run()
+    payload = {
+        **run,
+        'finished_at': datetime.now().isoformat(),
+        'summary': summarize(run),
+        'slo_violations': check_slos(run=run),
+    }
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+    path = directory / f"{stamp}_{run['run_id']}.json"
+    with open(path, 'w') as f:
+        json.dump(payload, f, indent=2, default=str)
+    logger.info(json.dumps({'event': 'ledger_written', 'run_id': run['run_id'], 'path': str(path)}))
+    return path
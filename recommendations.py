@@ -0,0 +1,156 @@
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+from pathlib import Path
+import pandas as pd
+from analysis import get_strategy_multiplier, indicators_from_row, warmup_bars
+from data_handler import fetch_data, recent_window_start
+from live_stream import IncrementalIndicators
+from perf import span, incr
+
+logger = logging.getLogger(__name__)
+
+# Indicator state carried between snapshot runs, so a daily run only downloads the
+# bars since the previous one ("" disables it)
+INDICATOR_STATE_FILE = os.environ.get("SMART_DCA_INDICATOR_STATE", "indicator_state.json")
+
+def load_indicator_states(path):
+    """{ticker: {'through': 'YYYY-MM-DD', 'state': IncrementalIndicators.to_state()}}"""
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.warning("Ignoring unreadable indicator state %s: %s", path, e)
+        return {}
+
+def save_indicator_states(states, path):
+    path = Path(path)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, 'w') as f:
+        json.dump(states, f)
+    tmp.replace(path)
+    return path
+
+def build_market_snapshot(tickers, as_of=None, state_path=INDICATOR_STATE_FILE):
+    """
+    Compute the current multiplier/label for every ticker ONCE.
+    Recommendations only depend on the ticker (not on the subscriber),
+    so all subscribers and all shards can share this snapshot.
+
+    Tickers with saved indicator state (state_path) continue from it and only
+    fetch newer bars; the rest fetch just the warm-up history of the indicators.
+    Bars from as_of's own day may still be forming, so they are scored but not saved.
+    """
+    end_d = as_of or datetime.now()
+    session_start = pd.Timestamp(end_d).normalize()
+    full_start = recent_window_start(end_d, warmup_bars())
+    tickers = sorted(set(tickers))
+
+    saved = load_indicator_states(state_path) if state_path else {}
+    seeded = {t: saved[t] for t in tickers
+              if t in saved and pd.Timestamp(full_start) < pd.Timestamp(saved[t]['through']) < session_start}
+    fresh = [t for t in tickers if t not in seeded]
+
+    with span("recommendations.build_snapshot", tickers=len(tickers), seeded=len(seeded)):
+        data_map = {}
+        if fresh:
+            data_map.update(fetch_data(fresh, full_start, end_d, warmup=0))
+        if seeded:
+            since = min(pd.Timestamp(rec['through']) for rec in seeded.values()) + timedelta(days=1)
+            if since <= pd.Timestamp(end_d):
+                data_map.update(fetch_data(sorted(seeded), since.to_pydatetime(), end_d, warmup=0))
+        incr("recommendations.seeded_tickers", len(seeded))
+
+        snapshot = {
+            'created_at': datetime.now().isoformat(),
+            'vix': None,
+            'tickers': {}
+        }
+        updated = {}
+        for t in tickers:
+            if t in seeded:
+                state = IncrementalIndicators.from_state(seeded[t]['state'])
+                through = pd.Timestamp(seeded[t]['through'])
+            else:
+                state, through = IncrementalIndicators(), None
+            df = data_map.get(t)
+            if df is not None and through is not None:
+                df = df.loc[df.index > through]
+            last_date = through
+            if df is not None and not df.empty:
+                closed = df.index < session_start
+                for date, row in df.loc[closed].iterrows():
+                    state.update(float(row['Close']), row.get('VIX'), row.get('TNX'))
+                    last_date = through = date
+                prev = saved.get(t)
+                if through is not None and (prev is None or through > pd.Timestamp(prev['through'])):
+                    updated[t] = {'through': through.strftime('%Y-%m-%d'), 'state': state.to_state()}
+                if not closed.all():
+                    state = IncrementalIndicators.from_state(state.to_state())  # keep the saved one clean
+                    for date, row in df.loc[~closed].iterrows():
+                        state.update(float(row['Close']), row.get('VIX'), row.get('TNX'))
+                        last_date = date
+            if not state.last: continue
+
+            curr = state.last
+            price = float(curr['Close'])
+            vix_val = float(curr['VIX'])
+            mult, reason = get_strategy_multiplier(price, indicators_from_row(curr), vix_val)
+            snapshot['vix'] = vix_val
+            snapshot['tickers'][t] = {
+                'date': last_date.strftime('%Y-%m-%d'),
+                'price': price,
+                'multiplier': float(mult),
+                'label': reason
+            }
+
+    if state_path and updated:
+        saved.update(updated)
+        save_indicator_states(saved, state_path)
+    return snapshot
+
+def save_market_snapshot(snapshot, path):
+    path = Path(path)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, 'w') as f:
+        json.dump(snapshot, f, indent=2)
+    tmp.replace(path)  # atomic, so workers never read a half-written file
+    return path
+
+def load_market_snapshot(path):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def is_due(subscription, today=None):
+    """Emails go out on the first and last day of each selected week (Week 1 -> 1st and 7th)."""
+    day = (today or datetime.now()).day
+    for w in subscription.get('schedule_weeks', []):
+        if day in (7 * (w - 1) + 1, 7 * w):
+            return True
+    return False
+
+def build_action_plan(subscription, snapshot):
+    """
+    Turn a subscription into the rows used by send_notification_email.
+    Returns (action_data, total_invest). Tickers missing from the snapshot are skipped.
+    """
+    action_data = []
+    total_invest = 0
+    budget = subscription.get('budget', 0)
+    weights = subscription.get('weights', {})
+
+    for t in subscription.get('tickers', []):
+        info = snapshot['tickers'].get(t)
+        if info is None: continue
+        base_amt = budget * (weights.get(t, 0) / 100)
+        final_amt = base_amt * info['multiplier']
+        total_invest += final_amt
+        action_data.append({
+            "Ticker": t, "Price": f"${info['price']:.2f}",
+            "Condition": info['label'], "Action": f"{info['multiplier']}x",
+            "Target Invest": f"${final_amt:.0f}"
+        })
+    return action_data, total_invest
@@ -0,0 +1,262 @@
+import hashlib
+import importlib
+import inspect
+import json
+import logging
+import os
+import uuid
+from datetime import date, datetime
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import backtest
+from market_panel import MarketPanel
+from perf import span, incr
+
+try:
+    import fcntl
+except ImportError:  # Windows: eviction runs without the cross-process lock
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Shared directory (can live on a volume mounted by every replica)
+RESULT_CACHE_DIR = Path(os.environ.get("SMART_DCA_RESULT_CACHE", "result_cache"))
+# Evict least-recently-used results once the cache grows past this size
+RESULT_CACHE_MAX_BYTES = int(os.environ.get("SMART_DCA_RESULT_CACHE_MAX_MB", "256")) * 1024 * 1024
+# Bump to invalidate every stored result by hand (needed only for changes outside RESULT_CODE_MODULES)
+RESULT_CACHE_VERSION = 1
+# Modules whose whole source keys cached results: the backtest engine and everything it
+# calls to turn a panel into a result (strategies, rule tables, panel access)
+RESULT_CODE_MODULES = ('backtest', 'strategy_rules', 'market_panel', 'analysis')
+
+# Cache entries (files of earlier formats are never read; clear() removes them too)
+ENTRY_GLOB = "*/*.json"
+
+_code_version = None
+
+def strategy_code_version():
+    """Hash of the code that determines a backtest result, so edits invalidate old entries."""
+    global _code_version
+    if _code_version is None:
+        parts = [str(RESULT_CACHE_VERSION)]
+        for name in RESULT_CODE_MODULES:
+            parts.append(inspect.getsource(importlib.import_module(name)))
+        _code_version = hashlib.sha256("\n".join(parts).encode()).hexdigest()[:16]
+    return _code_version
+
+def result_key(data, weights, monthly_budget, initial_investment, enable_rebalancing, contribution_frequency, daily=False):
+    panel = data if isinstance(data, MarketPanel) else MarketPanel.from_data_map(data)
+    total = sum(weights.values())
+    norm_weights = {t: round(w / total, 12) for t, w in sorted(weights.items())} if total else {}
+    payload = {
+        'data': panel.fingerprint(),
+        'weights': norm_weights,
+        'budget': float(monthly_budget),
+        'initial': float(initial_investment),
+        'rebalancing': bool(enable_rebalancing),
+        'frequency': contribution_frequency,
+        'daily': bool(daily),
+        'code': strategy_code_version()
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+# === SAFE ENCODING ===
+# Cached results live on shared volumes, so they are stored as tagged JSON that can
+# only ever decode to plain data (never pickle). Arrays keep their dtype; floats,
+# including NaN and infinities, round-trip exactly.
+def _encode(value):
+    if value is None or isinstance(value, (bool, str, int, float)):
+        return value
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, dict):
+        return {'__dict': [[_encode(k), _encode(v)] for k, v in value.items()]}
+    if isinstance(value, list):
+        return [_encode(v) for v in value]
+    if isinstance(value, tuple):
+        return {'__tuple': [_encode(v) for v in value]}
+    if isinstance(value, pd.Timestamp):
+        return {'__ts': value.isoformat(), 'unit': value.unit, 'tz': str(value.tz) if value.tz else None}
+    if isinstance(value, (datetime, date)):
+        return {'__date': value.isoformat(), 'datetime': isinstance(value, datetime)}
+    if isinstance(value, pd.DataFrame):
+        return {'__df': [_encode(value.iloc[:, i].to_numpy()) for i in range(value.shape[1])],
+                'columns': _encode(value.columns), 'index': _encode(value.index)}
+    if isinstance(value, pd.Series):
+        return {'__series': _encode(value.to_numpy()), 'index': _encode(value.index), 'name': _encode(value.name)}
+    if isinstance(value, pd.DatetimeIndex):
+        tz = str(value.tz) if value.tz is not None else None
+        naive = value.tz_convert('UTC').tz_localize(None) if tz else value
+        return {'__dti': _encode(naive.to_numpy()), 'tz': tz, 'name': _encode(value.name)}
+    if isinstance(value, pd.Index) and not isinstance(value, pd.MultiIndex):
+        return {'__index': _encode(value.to_numpy()), 'name': _encode(value.name)}
+    if isinstance(value, np.ndarray):
+        if value.dtype == object:
+            return {'__objects': [_encode(v) for v in value.ravel()], 'shape': list(value.shape)}
+        if value.dtype.kind in 'biuf':
+            return {'__array': value.ravel().tolist(), 'dtype': value.dtype.str, 'shape': list(value.shape)}
+        if value.dtype.kind in 'mM':
+            return {'__array': value.view('i8').ravel().tolist(), 'dtype': value.dtype.str, 'shape': list(value.shape)}
+    raise TypeError(f"Cannot cache values of type {type(value).__name__}")
+
+def _decode(value):
+    if isinstance(value, list):
+        return [_decode(v) for v in value]
+    if not isinstance(value, dict):
+        return value
+    if '__dict' in value:
+        return {_decode(k): _decode(v) for k, v in value['__dict']}
+    if '__tuple' in value:
+        return tuple(_decode(v) for v in value['__tuple'])
+    if '__ts' in value:
+        ts = pd.Timestamp(value['__ts']).as_unit(value['unit'])
+        return ts.tz_convert(value['tz']) if value['tz'] else ts
+    if '__date' in value:
+        return (datetime if value['datetime'] else date).fromisoformat(value['__date'])
+    if '__df' in value:
+        df = pd.DataFrame({i: _decode(col) for i, col in enumerate(value['__df'])}, index=_decode(value['index']))
+        df.columns = _decode(value['columns'])
+        return df
+    if '__series' in value:
+        return pd.Series(_decode(value['__series']), index=_decode(value['index']), name=_decode(value['name']))
+    if '__dti' in value:
+        index = pd.DatetimeIndex(_decode(value['__dti']), name=_decode(value['name']))
+        return index.tz_localize('UTC').tz_convert(value['tz']) if value['tz'] else index
+    if '__index' in value:
+        return pd.Index(_decode(value['__index']), name=_decode(value['name']))
+    if '__objects' in value:
+        out = np.empty(len(value['__objects']), dtype=object)
+        out[:] = [_decode(v) for v in value['__objects']]
+        return out.reshape(value['shape'])
+    if '__array' in value:
+        dtype = np.dtype(value['dtype'])
+        if dtype.kind in 'mM':
+            return np.array(value['__array'], dtype='i8').view(dtype).reshape(value['shape'])
+        if dtype.kind not in 'biuf':
+            raise ValueError(f"Unsupported array dtype {dtype}")
+        return np.array(value['__array'], dtype=dtype).reshape(value['shape'])
+    raise ValueError(f"Unknown cache value tag: {sorted(value)[:3]}")
+
+def encode_result(value):
+    """Result (dicts, lists, numbers, dates, numpy arrays, pandas objects) -> JSON text."""
+    return json.dumps(_encode(value), separators=(',', ':'))
+
+def decode_result(text):
+    """Inverse of encode_result; builds only plain data, whatever the input."""
+    return _decode(json.loads(text))
+
+class ResultCache:
+    """
+    Content-addressed JSON store (see encode_result) with size-bounded LRU eviction.
+
+    Writes go to a unique temp file and are renamed into place, so concurrent
+    writers of the same key (on any replica) are harmless. A read refreshes the
+    file's mtime, which is what eviction orders by.
+    """
+    def __init__(self, directory=RESULT_CACHE_DIR, max_bytes=RESULT_CACHE_MAX_BYTES):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+
+    def _path(self, key):
+        return self.directory / key[:2] / f"{key}.json"
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'r') as f:
+                value = decode_result(f.read())
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning("Dropping unreadable cache entry %s: %s", path, e)
+            path.unlink(missing_ok=True)
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass  # evicted by another replica in the meantime
+        return value
+
+    def put(self, key, value):
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}.tmp")
+        try:
+            text = encode_result(value)
+        except TypeError as e:
+            logger.warning("Not caching result %s: %s", key[:12], e)
+            return
+        with open(tmp, 'w') as f:
+            f.write(text)
+        os.replace(tmp, path)
+        self.evict()
+
+    def size(self):
+        return sum(p.stat().st_size for p in self.directory.glob(ENTRY_GLOB))
+
+    def evict(self):
+        """Delete least-recently-used entries until the cache is under 90% of max_bytes."""
+        if not self.directory.exists(): return 0
+        lock_file = open(self.directory / ".evict.lock", 'w')
+        try:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    return 0  # another process is already evicting
+
+            entries = []
+            for p in self.directory.glob(ENTRY_GLOB):
+                try:
+                    st = p.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, p))
+            total = sum(size for _, size, _ in entries)
+            if total <= self.max_bytes: return 0
+
+            removed = 0
+            target = self.max_bytes * 0.9
+            for _, size, p in sorted(entries):
+                if total <= target: break
+                p.unlink(missing_ok=True)
+                total -= size
+                removed += 1
+            incr("result_cache.evicted", removed)
+            return removed
+        finally:
+            lock_file.close()
+
+    def clear(self):
+        for p in [*self.directory.glob(ENTRY_GLOB), *self.directory.glob("*/*.pkl")]:
+            p.unlink(missing_ok=True)
+
+_default_cache = None
+
+def get_result_cache():
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ResultCache()
+    return _default_cache
+
+def cached_backtest(data, weights, monthly_budget, initial_investment=0, enable_rebalancing=False, contribution_frequency='monthly', daily=False, cache=None):
+    """run_portfolio_backtest behind the content-addressed result cache."""
+    cache = cache or get_result_cache()
+    with span("result_cache.lookup") as s:
+        key = result_key(data, weights, monthly_budget, initial_investment, enable_rebalancing, contribution_frequency, daily)
+        result = cache.get(key)
+        s["hit"] = result is not None
+    if result is not None:
+        incr("result_cache.hit")
+        return result
+
+    incr("result_cache.miss")
+    result = backtest.run_portfolio_backtest(data, weights, monthly_budget, initial_investment,
+                                             enable_rebalancing, contribution_frequency, daily)
+    if result is not None:
+        try:
+            cache.put(key, result)
+        except OSError as e:
+            logger.warning("Could not store backtest result: %s", e)
+    return result
@@ -1,8 +1,12 @@
+import argparse
 import os
 import sys
 from datetime import datetime
 from pathlib import Path
 from email_service import send_recommendations_to_subscribers
+import sharding
+from perf import start_run, write_ledger, summarize, check_slos, configure_logging
+from market_data import set_provider
 
 # Load environment variables from .env file
 try:
@@ -12,12 +16,39 @@ except ImportError:
     print("Warning: python-dotenv not installed. Install with: pip install python-dotenv")
     print("Falling back to system environment variables...")
 
-def main():
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Send Smart DCA recommendations to subscribers.")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Run N local worker processes (builds the snapshot once, then shards)")
+    parser.add_argument("--build-snapshot", action="store_true",
+                        help="Only build the shared market snapshot, then exit")
+    parser.add_argument("--shard", type=int, help="Process a single shard (0-based); use with --num-shards")
+    parser.add_argument("--num-shards", type=int, help="Total number of shards across all machines")
+    parser.add_argument("--run-id", help="Run identifier shared by all shards of one distribution")
+    parser.add_argument("--snapshot", default=str(sharding.SNAPSHOT_FILE), help="Market snapshot path")
+    parser.add_argument("--coordinator", default=str(sharding.COORDINATOR_DB), help="Progress database path")
+    parser.add_argument("--dry-run", action="store_true", help="Build every report but do not send")
+    parser.add_argument("--market-data", help="Market data source: 'yahoo' (default), 'record:<dir>' or 'replay:<dir>'")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    configure_logging()
+
+    if args.market_data:
+        # Through the environment so worker processes pick the same provider
+        os.environ["SMART_DCA_MARKET_DATA"] = args.market_data
+        set_provider(None)
+
+    if args.build_snapshot:
+        print(f"Market snapshot written to {sharding.prepare_snapshot(args.snapshot)}")
+        return
+
     # Get configuration from .env file or environment variables
     api_key = os.environ.get('RESEND_API_KEY')
     from_email = os.environ.get('FROM_EMAIL', 'Smart DCA <onboarding@resend.dev>')
     
-    if not api_key:
+    if not api_key and not args.dry_run:
         print("ERROR: Resend API key not configured!")
         print("\nSetup is easy - just 3 steps:")
         print("1. Sign up at https://resend.com (FREE for 3,000 emails/month)")
@@ -37,12 +68,36 @@ def main():
     print(f"Starting Smart DCA Email Scheduler - {datetime.now()}")
     print(f"Sending from: {email_config['from_email']}")
     
+    start_run(label="scheduler")
     try:
-        send_recommendations_to_subscribers(email_config)
+        if args.shard is not None:
+            # One worker of a multi-machine run; the snapshot must already exist
+            if not args.num_shards or not args.run_id:
+                print("ERROR: --shard requires --num-shards and --run-id")
+                sys.exit(1)
+            stats = sharding.run_shard(args.shard, args.num_shards, args.run_id, email_config,
+                                       args.snapshot, args.coordinator, dry_run=args.dry_run)
+            print(f"Shard {args.shard}/{args.num_shards} finished: {stats}")
+        elif args.workers > 0:
+            summary = sharding.run_local_workers(args.workers, email_config, args.snapshot,
+                                                 args.coordinator, dry_run=args.dry_run, run_id=args.run_id)
+            print(f"Sharded run finished: {summary}")
+        else:
+            send_recommendations_to_subscribers(email_config, dry_run=args.dry_run)
         print("Email distribution completed successfully!")
     except Exception as e:
         print(f"Error during email distribution: {e}")
         sys.exit(1)
+    finally:
+        report_timings()
+
+def report_timings():
+    """Print a per-span timing summary and persist the run ledger."""
+    for name, stats in sorted(summarize().items()):
+        print(f"  {name:<36} n={stats['count']:<5} p50={stats['p50_ms']:>9.1f}ms  p95={stats['p95_ms']:>9.1f}ms")
+    for v in check_slos():
+        print(f"  SLO BREACH: {v['name']} p95 {v['p95_ms']:.0f}ms > {v['budget_ms']}ms")
+    print(f"Timing ledger written to {write_ledger()}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,149 @@
+import argparse
+import csv
+import io
+from datetime import datetime
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from analysis import PRO_DEFAULT_PARAMS
+from config import COMMON_TICKERS
+from market_panel import IMPULSE_CODES
+from perf import span, incr
+from strategy_rules import compile_strategy, pro_rules, referenced_fields
+
+SORT_KEYS = ['multiplier', 'depth']
+UNIVERSES = {'common': COMMON_TICKERS}
+
+# get_strategy_multiplier applies the non-QQQ thresholds to every ticker; so does the screener
+SCREEN_RULES = pro_rules({'rsi_panic_qqq': PRO_DEFAULT_PARAMS['rsi_panic']})
+SCREEN_FIELDS = sorted(referenced_fields(SCREEN_RULES))
+
+def parse_universe(text, csv_format=False):
+    """
+    Tickers from file contents: CSV with a Ticker/Symbol column (else the first column),
+    or plain text with tickers separated by whitespace or commas.
+    """
+    if csv_format:
+        rows = list(csv.reader(io.StringIO(text)))
+        header = [h.strip().lower() for h in rows[0]] if rows else []
+        col = next((header.index(c) for c in ('ticker', 'symbol') if c in header), None)
+        rows = rows[1:] if col is not None else rows
+        col = col or 0
+        tickers = [r[col] for r in rows if len(r) > col]
+    else:
+        tickers = text.replace(',', ' ').split()
+    return _unique_tickers(tickers)
+
+def _unique_tickers(tickers):
+    seen = {}
+    for t in tickers:
+        t = t.strip().upper()
+        if t and not t.startswith('#'): seen.setdefault(t, None)
+    return list(seen)
+
+def load_universe(source='common'):
+    """
+    Ticker list from a named universe ('common'), a list of tickers, or a file: .csv with
+    a Ticker/Symbol column (else the first column), or plain text with tickers separated
+    by whitespace or commas.
+    """
+    if isinstance(source, (list, tuple)):
+        return _unique_tickers(source)
+    if source in UNIVERSES:
+        return _unique_tickers(UNIVERSES[source])
+    path = Path(source)
+    with open(path, newline='') as f:
+        return parse_universe(f.read(), csv_format=path.suffix.lower() == '.csv')
+
+def _signal_labels(inputs):
+    """Label text per ticker, mirroring get_strategy_pro's signal list."""
+    p = PRO_DEFAULT_PARAMS
+    vix, dist, rsi, bb, imp = (inputs[k][0] for k in ('VIX', 'Dist_MA200', 'RSI', 'BB_PctB', 'Impulse'))
+    high = rsi > p['rsi_high']
+    masks = [
+        (vix > 30, lambda i: f"VIX PANIC({vix[i]:.1f})"),
+        (dist < 0, lambda i: f"BELOW MA200({dist[i]:.1%})"),
+        (rsi < p['rsi_panic'], lambda i: "RSI OVERSOLD"),
+        (bb < 0, lambda i: "BB BREAKDOWN"),
+        (high & (imp == IMPULSE_CODES.index('Red')), lambda i: "TOP FADING"),
+        (high & (imp == IMPULSE_CODES.index('Blue')), lambda i: "HIGH NEUTRAL")
+    ]
+    labels = []
+    for i in range(len(vix)):
+        signals = [text(i) for mask, text in masks if mask[i]]
+        labels.append(" + ".join(signals) if signals else "STANDARD")
+    return labels
+
+def screen_panel(panel, sort_by='multiplier', top=None):
+    """
+    Current multiplier, signal and key indicators for every ticker of a panel, in one pass.
+
+    sort_by: 'multiplier' (highest first, deeper below MA200 breaks ties)
+             or 'depth' (furthest below MA200 first)
+    Returns a DataFrame with one row per ticker that has data.
+    """
+    if sort_by not in SORT_KEYS:
+        raise ValueError(f"sort_by must be one of {SORT_KEYS}")
+    last = panel.last_positions()
+    has_data = last >= 0
+    if not has_data.any(): return pd.DataFrame()
+
+    with span("screener.screen", tickers=int(has_data.sum())):
+        positions = np.where(has_data, last, 0)[None, :]
+        inputs = panel.take(SCREEN_FIELDS, positions)
+        # Strategy defaults for missing impulse (no bar) match indicators_from_row
+        inputs['Impulse'] = np.where(inputs['Impulse'] < 0, IMPULSE_CODES.index('Blue'), inputs['Impulse'])
+        mult = compile_strategy(SCREEN_RULES, panel.tickers)(inputs)[0]
+        labels = _signal_labels(inputs)
+        incr("screener.tickers", int(has_data.sum()))
+
+        df = pd.DataFrame({
+            'Ticker': panel.tickers,
+            'Date': panel.dates[positions[0]].strftime('%Y-%m-%d'),
+            'Price': inputs['Close'][0],
+            'Multiplier': mult,
+            'Signal': labels,
+            'RSI': inputs['RSI'][0],
+            'Dist_MA200': inputs['Dist_MA200'][0] * 100,
+            'BB_PctB': inputs['BB_PctB'][0],
+            'Impulse': np.array(IMPULSE_CODES, dtype=object)[inputs['Impulse'][0]],
+            'VIX': inputs['VIX'][0]
+        })[has_data]
+
+    if sort_by == 'multiplier':
+        df = df.sort_values(['Multiplier', 'Dist_MA200'], ascending=[False, True], kind='stable')
+    else:
+        df = df.sort_values('Dist_MA200', ascending=True, kind='stable', na_position='last')
+    df = df.reset_index(drop=True)
+    return df.head(top) if top else df
+
+def screen_universe(source='common', sort_by='multiplier', top=None, as_of=None, panel=None):
+    """
+    Screen a universe (see load_universe). Uses the given MarketPanel if provided
+    (e.g. load_panel of a snapshot written by write_market_snapshot), else fetch_data.
+    """
+    tickers = load_universe(source)
+    if panel is None:
+        from data_handler import fetch_data, recent_window_start
+        end_d = as_of or datetime.now()
+        panel = fetch_data(tickers, recent_window_start(end_d), end_d, as_panel=True)
+    else:
+        keep = [t for t in tickers if t in panel.tickers]
+        if keep != panel.tickers:
+            panel = panel.select(keep)
+    return screen_panel(panel, sort_by, top)
+
+if __name__ == "__main__":
+    from market_panel import load_panel
+
+    parser = argparse.ArgumentParser(description="Rank a ticker universe by Smart DCA multiplier or MA200 depth.")
+    parser.add_argument("--universe", default="common", help="'common' or a .txt/.csv file of tickers")
+    parser.add_argument("--sort", choices=SORT_KEYS, default="multiplier")
+    parser.add_argument("--top", type=int, default=25)
+    parser.add_argument("--panel", help="Screen a saved panel directory (see write_market_snapshot) instead of downloading")
+    args = parser.parse_args()
+
+    panel = load_panel(args.panel) if args.panel else None
+    result = screen_universe(args.universe, args.sort, args.top, panel=panel)
+    pd.set_option('display.width', 200)
+    print(result.to_string(index=False) if not result.empty else "!! No data for this universe.")
@@ -0,0 +1,132 @@
+import hashlib
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from email_service import send_recommendations_to_subscribers
+from recommendations import build_market_snapshot, save_market_snapshot, load_market_snapshot
+from subscription_manager import get_active_subscriptions
+from perf import span
+
+# Shared files (put them on a common volume when workers run on several machines)
+SNAPSHOT_FILE = Path("market_snapshot.json")
+COORDINATOR_DB = Path("shard_progress.db")
+
+def shard_for_email(email, num_shards):
+    """Stable shard id for an email (same on every machine and Python run, unlike hash())."""
+    digest = hashlib.sha1(email.strip().lower().encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % num_shards
+
+def iter_shard(subscriptions, shard_index, num_shards):
+    for sub in subscriptions:
+        if shard_for_email(sub['email'], num_shards) == shard_index:
+            yield sub
+
+# ==========================================
+# PROGRESS COORDINATOR
+# ==========================================
+class ProgressCoordinator:
+    """
+    SQLite-backed progress board shared by all shard workers of a run.
+    Each worker upserts its own row, so writers never contend on the same record.
+    """
+    def __init__(self, path=COORDINATOR_DB):
+        self.path = Path(path)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS shard_progress (
+                    run_id TEXT, shard INTEGER, num_shards INTEGER,
+                    processed INTEGER, sent INTEGER, failed INTEGER, skipped INTEGER,
+                    status TEXT, started_at TEXT, updated_at TEXT,
+                    PRIMARY KEY (run_id, shard)
+                )""")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def report(self, run_id, shard, num_shards, stats, status="running"):
+        now = datetime.now().isoformat()
+        with self._connect() as conn:
+            conn.execute("""
+                INSERT INTO shard_progress VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(run_id, shard) DO UPDATE SET
+                    processed=excluded.processed, sent=excluded.sent, failed=excluded.failed,
+                    skipped=excluded.skipped, status=excluded.status, updated_at=excluded.updated_at
+            """, (run_id, shard, num_shards, stats.get('processed', 0), stats.get('sent', 0),
+                  stats.get('failed', 0), stats.get('skipped', 0), status, now, now))
+
+    def shards(self, run_id):
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            rows = conn.execute("SELECT * FROM shard_progress WHERE run_id=? ORDER BY shard", (run_id,)).fetchall()
+        return [dict(r) for r in rows]
+
+    def summary(self, run_id):
+        rows = self.shards(run_id)
+        totals = {k: sum(r[k] for r in rows) for k in ['processed', 'sent', 'failed', 'skipped']}
+        totals['shards_reported'] = len(rows)
+        totals['shards_done'] = sum(1 for r in rows if r['status'] == 'done')
+        return totals
+
+# ==========================================
+# WORKERS
+# ==========================================
+def prepare_snapshot(path=SNAPSHOT_FILE, subscriptions=None):
+    """Build the shared market snapshot once for every ticker any subscriber holds."""
+    subscriptions = get_active_subscriptions() if subscriptions is None else subscriptions
+    tickers = {t for s in subscriptions for t in s.get('tickers', [])}
+    return save_market_snapshot(build_market_snapshot(tickers), path)
+
+def run_shard(shard_index, num_shards, run_id, email_config=None, snapshot_path=SNAPSHOT_FILE,
+              coordinator_path=COORDINATOR_DB, dry_run=False, today=None):
+    """
+    Process one shard of the subscriber list. Safe to start on any machine that
+    sees the snapshot, the subscriptions file and the coordinator database.
+    """
+    coordinator = ProgressCoordinator(coordinator_path)
+    snapshot = load_market_snapshot(snapshot_path)
+    shard_subs = iter_shard(get_active_subscriptions(), shard_index, num_shards)
+
+    def on_progress(stats):
+        coordinator.report(run_id, shard_index, num_shards, stats)
+
+    on_progress({})
+    try:
+        with span("sharding.run_shard", shard=shard_index, num_shards=num_shards):
+            stats = send_recommendations_to_subscribers(
+                email_config, subscriptions=shard_subs, snapshot=snapshot,
+                today=today, on_progress=on_progress, dry_run=dry_run
+            )
+    except Exception:
+        coordinator.report(run_id, shard_index, num_shards, {}, status="error")
+        raise
+    coordinator.report(run_id, shard_index, num_shards, stats, status="done")
+    return stats
+
+def run_local_workers(num_workers, email_config=None, snapshot_path=SNAPSHOT_FILE,
+                      coordinator_path=COORDINATOR_DB, dry_run=False, today=None, run_id=None):
+    """
+    Single-host driver: build the snapshot once, then fan the shards out
+    over `num_workers` processes. Returns the coordinator summary.
+    """
+    run_id = run_id or datetime.now().strftime("%Y%m%d-%H%M%S")
+    prepare_snapshot(snapshot_path)
+
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=num_workers) as pool:
+        futures = [
+            pool.submit(run_shard, i, num_workers, run_id, email_config,
+                        snapshot_path, coordinator_path, dry_run, today)
+            for i in range(num_workers)
+        ]
+        for f in futures:
+            f.result()
+    elapsed = time.perf_counter() - t0
+
+    summary = ProgressCoordinator(coordinator_path).summary(run_id)
+    summary['run_id'] = run_id
+    summary['elapsed_s'] = round(elapsed, 3)
+    summary['per_second'] = round(summary['processed'] / elapsed, 1) if elapsed > 0 else 0.0
+    return summary
@@ -0,0 +1,194 @@
+import hashlib
+import json
+import logging
+import os
+import stat
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from perf import incr
+
+try:
+    import fcntl
+except ImportError:  # Windows: coalescing stays within the process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Host-local directory for cross-process lock and handover files; must be private to
+# the user (mode 0700), otherwise coalescing stays within the process
+_USER = os.getuid() if hasattr(os, 'getuid') else 'user'
+SINGLE_FLIGHT_DIR = Path(os.environ.get("SMART_DCA_SINGLE_FLIGHT_DIR",
+                                        Path(tempfile.gettempdir()) / f"smart_dca_single_flight_{_USER}"))
+# Handover and waiter files older than this belong to crashed processes
+STALE_S = 600
+
+# === FRAME HANDOVER ===
+def save_frame(df, f):
+    """Write a DataFrame as .npz (plain arrays + JSON labels; no pickle). Raises TypeError for object data."""
+    index = df.index
+    meta = {'columns': [list(c) if isinstance(c, tuple) else c for c in df.columns],
+            'multi': isinstance(df.columns, pd.MultiIndex), 'column_names': list(df.columns.names),
+            'index_name': index.name, 'tz': None}
+    if isinstance(index, pd.DatetimeIndex) and index.tz is not None:
+        meta['tz'] = str(index.tz)
+        index = index.tz_convert('UTC').tz_localize(None)
+    arrays = {'index': index.to_numpy()}
+    arrays.update({f'c{i}': df.iloc[:, i].to_numpy() for i in range(df.shape[1])})
+    if any(a.dtype == object for a in arrays.values()):
+        raise TypeError("object columns cannot be shared without pickle")
+    np.savez(f, meta=np.array(json.dumps(meta)), **arrays)
+
+def load_frame(f):
+    with np.load(f, allow_pickle=False) as npz:
+        meta = json.loads(str(npz['meta']))
+        index = pd.Index(npz['index'], name=meta['index_name'])
+        if meta['tz']:
+            index = index.tz_localize('UTC').tz_convert(meta['tz'])
+        labels = [tuple(c) for c in meta['columns']] if meta['multi'] else meta['columns']
+        columns = (pd.MultiIndex.from_tuples(labels, names=meta['column_names']) if meta['multi']
+                   else pd.Index(labels, name=meta['column_names'][0]))
+        df = pd.DataFrame({i: npz[f'c{i}'] for i in range(len(labels))}, index=index)
+    df.columns = columns
+    return df
+
+def _private_dir(directory):
+    """Create `directory` as 0700; False if it exists but is not a directory owned by this user alone."""
+    try:
+        directory.mkdir(mode=0o700, parents=True, exist_ok=True)
+        st = os.lstat(directory)
+        if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid():
+            raise PermissionError(f"{directory} is not a directory owned by this user")
+        if st.st_mode & 0o077:
+            os.chmod(directory, 0o700)
+        return True
+    except OSError as e:
+        logger.warning("Cross-process coalescing disabled: %s", e)
+        return False
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls with the same key into one execution.
+
+    Threads: the first caller runs fn, later callers wait for it and get the same
+    result (or exception). Processes: the running caller holds a lock file for the
+    key. A process that finds the lock taken registers as a waiter and blocks on it;
+    the runner hands its result over in a file that only waiters registered before
+    it finished may read, and the last of them deletes it. A caller that arrives after
+    the run has finished runs fn itself: this merges concurrent calls, it is not a cache.
+    Results cross processes via dump/load (default: DataFrames as .npz); anything they
+    cannot write is not shared.
+    """
+    def __init__(self, name, directory=SINGLE_FLIGHT_DIR, cross_process=True, dump=save_frame, load=load_frame):
+        self.name = name
+        self.directory = Path(directory)
+        self.cross_process = cross_process and fcntl is not None
+        self.dump = dump
+        self.load = load
+        self._checked_dir = False
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            incr(f"{self.name}.coalesced")
+            if call.error is not None: raise call.error
+            return call.result
+
+        try:
+            call.result = self._run_locked(key, fn) if self._use_files() else fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def _use_files(self):
+        if self.cross_process and not self._checked_dir:
+            self.cross_process = _private_dir(self.directory)
+            self._checked_dir = True
+        return self.cross_process
+
+    def _run_locked(self, key, fn):
+        digest = hashlib.sha1(f"{self.name}:{key!r}".encode()).hexdigest()
+        result_path = self.directory / f"{digest}.result"
+
+        with open(self.directory / f"{digest}.lock", 'w') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # Another process is running this key: wait for it and take its result
+                waiter = self.directory / f"{digest}.wait.{uuid.uuid4().hex[:12]}"
+                waiter.touch()
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                    result = self._take(result_path, waiter, digest)
+                finally:
+                    waiter.unlink(missing_ok=True)
+                if result is not None:
+                    incr(f"{self.name}.coalesced_process")
+                    return result
+
+            result = fn()
+            if any(self.directory.glob(f"{digest}.wait.*")):
+                self._hand_over(result, result_path, digest)
+        self._prune()
+        return result
+
+    def _take(self, result_path, waiter, digest):
+        """The result written after `waiter` registered, or None; deletes it when no other waiter is left."""
+        try:
+            if result_path.stat().st_mtime_ns < waiter.stat().st_mtime_ns:
+                return None  # finished before we started waiting: not ours to reuse
+            with open(result_path, 'rb') as f:
+                result = self.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning("Ignoring unreadable single-flight result %s: %s", result_path, e)
+            return None
+        finally:
+            if not any(p != waiter for p in self.directory.glob(f"{digest}.wait.*")):
+                result_path.unlink(missing_ok=True)
+        return result
+
+    def _hand_over(self, result, result_path, digest):
+        tmp = result_path.with_name(f".{digest}.{uuid.uuid4().hex[:8]}.tmp")
+        try:
+            with open(tmp, 'wb') as f:
+                self.dump(result, f)
+            os.replace(tmp, result_path)
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning("Could not share single-flight result: %s", e)
+            tmp.unlink(missing_ok=True)
+
+    def _prune(self):
+        """Drop handover and waiter files left behind by crashed processes."""
+        cutoff = time.time() - STALE_S
+        for pattern in ("*.result", "*.wait.*", ".*.tmp"):
+            for path in self.directory.glob(pattern):
+                try:
+                    if path.stat().st_mtime < cutoff:
+                        path.unlink()
+                except FileNotFoundError:
+                    pass
@@ -0,0 +1,208 @@
+"""
+Strategies as data.
+
+A strategy is a dict:
+
+    {
+        'name': 'Smart DCA',
+        'layers': [                                 # layers MULTIPLY together, in order
+            {'name': 'oversold', 'rules': [         # inside a layer the FIRST matching rule wins
+                {'when': [('RSI', '<', 30)], 'mult': 1.3, 'label': 'RSI OVERSOLD'},
+                {'when': [('RSI', '<', 40)], 'mult': 1.15},
+            ]},
+        ],
+        'default': 1.0,                             # starting multiplier
+        'clamp': [0.5, 3.0],                        # optional
+        'round': 2                                  # optional
+    }
+
+Conditions are (field, op, value) and all conditions of a rule must hold.
+    value: a number, another field name ('Close' < 'MA200'), an Impulse colour,
+           or a per-ticker dict {'QQQ': 30, 'default': 35}.
+A rule's 'mult' is a number or an expression:
+    ('ramp', field, origin, divisor)  -> 1 + (x - origin) / divisor
+    ('depth', field, scale)           -> 1 + |x| * scale
+
+A single-layer table with a 'default' of 1.0 therefore gives plain first-match
+semantics (get_strategy_v1), while several layers give the multiplicative
+stacking of get_strategy_pro. compile_strategy turns a table into one function
+evaluated over whole (dates x tickers) arrays.
+"""
+import operator
+import numpy as np
+from analysis import PRO_DEFAULT_PARAMS
+from market_panel import IMPULSE_CODES
+
+_OPS = {
+    '<': operator.lt, '<=': operator.le,
+    '>': operator.gt, '>=': operator.ge,
+    '==': operator.eq, '!=': operator.ne
+}
+
+def pro_rules(params=None):
+    """get_strategy_pro as a rule table. params override analysis.PRO_DEFAULT_PARAMS."""
+    p = {**PRO_DEFAULT_PARAMS, **(params or {})}
+    panic = {'QQQ': p['rsi_panic_qqq'], 'default': p['rsi_panic']}
+    dip = {'QQQ': p['rsi_panic_qqq'] + p['rsi_dip_band'], 'default': p['rsi_panic'] + p['rsi_dip_band']}
+    return {
+        'name': 'Smart DCA',
+        'layers': [
+            {'name': 'vix', 'rules': [
+                {'when': [('VIX', '>', p['vix_floor'])], 'mult': ('ramp', 'VIX', p['vix_floor'], p['vix_scale']), 'label': 'VIX'}
+            ]},
+            {'name': 'ma200_depth', 'rules': [
+                {'when': [('Dist_MA200', '<', 0)], 'mult': ('depth', 'Dist_MA200', p['depth_scale']), 'label': 'BELOW MA200'}
+            ]},
+            {'name': 'rsi_oversold', 'rules': [
+                {'when': [('RSI', '<', panic)], 'mult': p['rsi_panic_mult'], 'label': 'RSI OVERSOLD'},
+                {'when': [('RSI', '<', dip)], 'mult': p['rsi_dip_mult'], 'label': 'RSI DIP'}
+            ]},
+            {'name': 'bb_breakdown', 'rules': [
+                {'when': [('BB_PctB', '<', 0)], 'mult': p['bb_mult'], 'label': 'BB BREAKDOWN'}
+            ]},
+            {'name': 'momentum_fade', 'rules': [
+                {'when': [('RSI', '>', p['rsi_high']), ('Impulse', '==', 'Red')], 'mult': p['fade_red_mult'], 'label': 'TOP FADING'},
+                {'when': [('RSI', '>', p['rsi_high']), ('Impulse', '==', 'Blue')], 'mult': p['fade_blue_mult'], 'label': 'HIGH NEUTRAL'}
+            ]}
+        ],
+        'clamp': [p['floor'], p['cap']],
+        'round': 2
+    }
+
+# get_strategy_v1: one first-match layer
+V1_RULES = {
+    'name': 'V1',
+    'layers': [
+        {'name': 'v1', 'rules': [
+            {'when': [('VIX', '>', 30)], 'mult': 2.0, 'label': 'V1: PANIC'},
+            {'when': [('Close', '<', 'MA200')], 'mult': 1.6, 'label': 'V1: VALUE'},
+            {'when': [('RSI', '<', 30)], 'mult': 1.4, 'label': 'V1: RSI'},
+            {'when': [('Close', '<', 'MA50')], 'mult': 1.2, 'label': 'V1: DIP'},
+            {'when': [('RSI', '>', 70), ('MACD_Hist', '>', 0)], 'mult': 1.0, 'label': 'V1: MOMENTUM'},
+            {'when': [('RSI', '>', 70)], 'mult': 0.6, 'label': 'V1: FADING'}
+        ]}
+    ]
+}
+
+STANDARD_RULES = {'name': 'Standard', 'layers': []}
+
+def _is_field_ref(field, value):
+    return isinstance(value, str) and not (field == 'Impulse' and value in IMPULSE_CODES)
+
+def condition_fields(conditions):
+    """Fields read by a list of (field, op, value) conditions."""
+    fields = set()
+    for field, _, value in conditions:
+        fields.add(field)
+        if _is_field_ref(field, value): fields.add(value)
+    return fields
+
+def referenced_fields(spec):
+    """Every panel field a strategy reads (always includes Close)."""
+    fields = {'Close'}
+    for layer in spec.get('layers', []):
+        for rule in layer['rules']:
+            fields |= condition_fields(rule.get('when', []))
+            if isinstance(rule['mult'], (tuple, list)):
+                fields.add(rule['mult'][1])
+    return fields
+
+def _compile_value(field, value, tickers):
+    if isinstance(value, dict):
+        default = value.get('default', np.nan)
+        return lambda inputs: np.array([value.get(t, default) for t in tickers], dtype=float)
+    if field == 'Impulse' and value in IMPULSE_CODES:
+        code = IMPULSE_CODES.index(value)
+        return lambda inputs: code
+    if isinstance(value, str):
+        return lambda inputs: inputs[value]
+    return lambda inputs: value
+
+def _compile_condition(cond, tickers):
+    field, op, value = cond
+    compare = _OPS[op]
+    rhs = _compile_value(field, value, tickers)
+    return lambda inputs: compare(inputs[field], rhs(inputs))
+
+def compile_conditions(conditions, tickers):
+    """f(inputs) -> boolean array, True where every condition holds."""
+    compiled = [_compile_condition(c, tickers) for c in conditions]
+
+    def holds(inputs):
+        mask = np.ones(inputs['Close'].shape, dtype=bool)
+        for cond in compiled:
+            mask &= cond(inputs)
+        return mask
+
+    return holds
+
+def _compile_mult(mult):
+    if not isinstance(mult, (tuple, list)):
+        return lambda inputs: mult
+    kind, field = mult[0], mult[1]
+    if kind == 'ramp':
+        origin, divisor = mult[2], mult[3]
+        return lambda inputs: 1 + (inputs[field] - origin) / divisor
+    if kind == 'depth':
+        scale = mult[2]
+        return lambda inputs: 1 + np.abs(inputs[field]) * scale
+    raise ValueError(f"Unknown multiplier expression: {kind}")
+
+def compile_layer_factors(spec, tickers):
+    """
+    Compile each layer of a rule table on its own.
+    Returns f(inputs) -> list with one factor array per layer (1.0 where no rule matched).
+    """
+    layers = []
+    for layer in spec.get('layers', []):
+        rules = [([_compile_condition(c, tickers) for c in rule.get('when', [])], _compile_mult(rule['mult']))
+                 for rule in layer['rules']]
+        layers.append(rules)
+
+    def factors(inputs):
+        shape = inputs['Close'].shape
+        out = []
+        for rules in layers:
+            # Walk rules last-to-first so earlier rules overwrite later ones (first match wins)
+            factor = np.ones(shape)
+            for conditions, mult in reversed(rules):
+                mask = np.ones(shape, dtype=bool)
+                for cond in conditions:
+                    mask &= cond(inputs)
+                factor = np.where(mask, mult(inputs), factor)
+            out.append(factor)
+        return out
+
+    return factors
+
+def compile_strategy(spec, tickers):
+    """
+    Compile a rule table for a fixed ticker order.
+    Returns f(inputs) -> multiplier array, where inputs maps field -> (dates x tickers) array
+    (see MarketPanel.take).
+    """
+    layer_factors = compile_layer_factors(spec, tickers)
+    default = spec.get('default', 1.0)
+    clamp = spec.get('clamp')
+    digits = spec.get('round')
+
+    def evaluate(inputs):
+        m = np.full(inputs['Close'].shape, default, dtype=float)
+        for factor in layer_factors(inputs):
+            m = m * factor
+        if clamp is not None:
+            m = np.clip(m, clamp[0], clamp[1])
+        if digits is not None:
+            m = np.round(m, digits)
+        return m
+
+    return evaluate
+
+def without_layers(spec, names):
+    """Copy of a rule table with the named layers removed (for ablations)."""
+    names = {names} if isinstance(names, str) else set(names)
+    return {**spec, 'layers': [layer for layer in spec.get('layers', []) if layer['name'] not in names]}
+
+def evaluate_strategies(specs, inputs, tickers):
+    """Stack the multipliers of many strategies: (strategies x dates x tickers)."""
+    return np.stack([compile_strategy(spec, tickers)(inputs) for spec in specs])
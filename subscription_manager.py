@@ -1,8 +1,14 @@
 import json
 import os
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
 
+try:
+    import fcntl
+except ImportError:  # Windows: writers are not serialized
+    fcntl = None
+
 # File to store subscriptions
 SUBSCRIPTIONS_FILE = Path("subscriptions.json")
 
@@ -18,8 +24,95 @@ def load_subscriptions():
 
 def save_subscriptions(subscriptions):
     """Save subscriptions to file"""
-    with open(SUBSCRIPTIONS_FILE, 'w') as f:
+    tmp = SUBSCRIPTIONS_FILE.with_suffix(".json.tmp")
+    with open(tmp, 'w') as f:
         json.dump(subscriptions, f, indent=2)
+    tmp.replace(SUBSCRIPTIONS_FILE)  # readers never see a half-written file
+
+@contextmanager
+def store_lock():
+    """Serialize read-modify-write cycles on the subscriptions file across processes."""
+    with open(SUBSCRIPTIONS_FILE.with_suffix(".lock"), 'w') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield
+
+def iter_subscriptions(path=None, chunk_size=1 << 16):
+    """
+    Stream subscriptions one at a time without loading the whole file.
+    Stops quietly at a malformed or truncated file (like load_subscriptions).
+    """
+    for obj, _ in _scan_subscriptions(path, chunk_size):
+        yield obj
+
+def _scan_subscriptions(path=None, chunk_size=1 << 16):
+    """Yield (subscription, raw JSON text) pairs from the store."""
+    path = Path(path or SUBSCRIPTIONS_FILE)
+    if not path.exists(): return
+    decoder = json.JSONDecoder()
+    with open(path, 'r') as f:
+        buf, pos, eof, started = '', 0, False, False
+        while True:
+            # Skip whitespace/commas, reading more when the buffer runs out
+            while True:
+                while pos < len(buf) and buf[pos] in ' \t\r\n,':
+                    pos += 1
+                if pos < len(buf) or eof: break
+                chunk = f.read(chunk_size)
+                buf, pos, eof = buf[pos:] + chunk, 0, not chunk
+            if pos >= len(buf): return
+
+            if not started:
+                if buf[pos] != '[': return
+                started, pos = True, pos + 1
+                continue
+            if buf[pos] == ']': return
+
+            try:
+                obj, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof: return
+                chunk = f.read(chunk_size)  # object spans the buffer boundary
+                buf, pos, eof = buf[pos:] + chunk, 0, not chunk
+                continue
+            yield obj, buf[pos:end]
+            pos = end
+
+def _dump_item(f, obj, first):
+    # Same layout as json.dump(..., indent=2) on the whole list
+    f.write(("[\n" if first else ",\n") + "  " + json.dumps(obj, indent=2).replace("\n", "\n  "))
+
+def upsert_subscriptions(records):
+    """
+    Insert or update many subscriptions (matched by email) in one transaction.
+    The file is streamed into a new copy and swapped in atomically, so memory
+    use is bounded by len(records), not by the size of the store.
+    Returns (added, updated).
+    """
+    now = datetime.now().isoformat()
+    pending = {r['email']: r for r in records}
+    added = updated = 0
+    with store_lock():
+        tmp = SUBSCRIPTIONS_FILE.with_suffix(".json.tmp")
+        first = True
+        with open(tmp, 'w') as f:
+            for sub, raw in _scan_subscriptions():
+                new = pending.pop(sub['email'], None)
+                if new is None:
+                    # Untouched records are copied verbatim (re-encoding with indent is slow)
+                    f.write(("[\n  " if first else ",\n  ") + raw)
+                else:
+                    _dump_item(f, {**sub, **new, 'created_at': sub.get('created_at', now), 'updated_at': now}, first)
+                    updated += 1
+                first = False
+            for new in pending.values():
+                _dump_item(f, {**new, 'created_at': new.get('created_at') or now, 'updated_at': now,
+                               'active': new.get('active', True)}, first)
+                first = False
+                added += 1
+            f.write("[]" if first else "\n]")
+        tmp.replace(SUBSCRIPTIONS_FILE)
+    return added, updated
 
 def add_subscription(email, tickers, weights, budget, schedule_weeks):
     """
@@ -32,6 +125,10 @@ def add_subscription(email, tickers, weights, budget, schedule_weeks):
         budget: Contribution budget
         schedule_weeks: List of weeks to send (1-4)
     """
+    with store_lock():
+        return _add_subscription(email, tickers, weights, budget, schedule_weeks)
+
+def _add_subscription(email, tickers, weights, budget, schedule_weeks):
     subscriptions = load_subscriptions()
     
     # Check if email already exists
@@ -63,9 +160,10 @@ def add_subscription(email, tickers, weights, budget, schedule_weeks):
 
 def remove_subscription(email):
     """Remove a subscription by email"""
-    subscriptions = load_subscriptions()
-    subscriptions = [s for s in subscriptions if s['email'] != email]
-    save_subscriptions(subscriptions)
+    with store_lock():
+        subscriptions = load_subscriptions()
+        subscriptions = [s for s in subscriptions if s['email'] != email]
+        save_subscriptions(subscriptions)
 
 def get_subscription(email):
     """Get subscription details for an email"""
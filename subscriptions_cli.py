@@ -0,0 +1,276 @@
+"""
+Bulk import/export of email subscriptions.
+
+    python subscriptions_cli.py export subscribers.jsonl
+    python subscriptions_cli.py export subscribers.csv --active-only
+    python subscriptions_cli.py import subscribers.csv --batch-size 20000 --check-tickers --rejects rejects.jsonl
+
+Both directions stream one record at a time; an import holds one batch in memory
+and writes each batch as a single transaction on subscriptions.json.
+CSV lists use ';' (tickers "VOO;QQQ", weights "VOO:50;QQQ:50", schedule_weeks "1;3").
+"""
+import argparse
+import csv
+import json
+import math
+import re
+import sys
+import time
+from itertools import islice
+from pathlib import Path
+from perf import span, incr
+from subscription_manager import iter_subscriptions, upsert_subscriptions
+
+CSV_FIELDS = ['email', 'tickers', 'weights', 'budget', 'schedule_weeks', 'active', 'created_at', 'updated_at']
+EMAIL_RE = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+TICKER_RE = re.compile(r"^[A-Z0-9.\-^=]{1,15}$")
+# Weights are percentages and must add up to 100 (within this tolerance)
+WEIGHT_TOLERANCE = 0.5
+REPORT_EVERY_S = 2.0
+
+# === FORMATS ===
+def _format_for(path, fmt):
+    if fmt: return fmt
+    return 'csv' if str(path).lower().endswith('.csv') else 'jsonl'
+
+def _to_csv_row(sub):
+    return {
+        'email': sub.get('email', ''),
+        'tickers': ';'.join(sub.get('tickers', [])),
+        'weights': ';'.join(f"{t}:{w}" for t, w in sub.get('weights', {}).items()),
+        'budget': sub.get('budget', ''),
+        'schedule_weeks': ';'.join(str(w) for w in sub.get('schedule_weeks', [])),
+        'active': str(sub.get('active', True)).lower(),
+        'created_at': sub.get('created_at', ''),
+        'updated_at': sub.get('updated_at', '')
+    }
+
+def _from_csv_row(row):
+    """Parse a CSV row into a subscription dict; raises ValueError on malformed values."""
+    weights = {}
+    for part in filter(None, (row.get('weights') or '').split(';')):
+        t, _, w = part.partition(':')
+        weights[t.strip()] = float(w)
+    sub = {
+        'email': (row.get('email') or '').strip(),
+        'tickers': [t.strip() for t in (row.get('tickers') or '').split(';') if t.strip()],
+        'weights': weights,
+        'budget': float(row.get('budget') or 0),
+        'schedule_weeks': [int(w) for w in (row.get('schedule_weeks') or '').split(';') if w.strip()]
+    }
+    if row.get('active'):
+        sub['active'] = row['active'].strip().lower() not in ('false', '0', 'no')
+    if row.get('created_at'):
+        sub['created_at'] = row['created_at']
+    return sub
+
+def read_records(path, fmt=None):
+    """Yield (line_number, subscription or None, error) from a JSONL or CSV file ('-' = stdin)."""
+    fmt = _format_for(path, fmt)
+    f = sys.stdin if str(path) == '-' else open(path, 'r', newline='')
+    try:
+        if fmt == 'csv':
+            for n, row in enumerate(csv.DictReader(f), start=2):
+                try:
+                    yield n, _from_csv_row(row), None
+                except ValueError as e:
+                    yield n, row, f"unparseable value: {e}"
+        else:
+            for n, line in enumerate(f, start=1):
+                if not line.strip(): continue
+                try:
+                    yield n, json.loads(line), None
+                except json.JSONDecodeError as e:
+                    yield n, line.rstrip('\n'), f"invalid JSON: {e}"
+    finally:
+        if f is not sys.stdin: f.close()
+
+# === VALIDATION ===
+def _shape_error(sub):
+    """Type checks a parsed record must pass before it can be normalized. Returns an error string or None."""
+    if not isinstance(sub, dict): return "record must be an object"
+    if not isinstance(sub.get('email', ''), str): return "email must be a string"
+    if not isinstance(sub.get('tickers', []), list): return "tickers must be a list"
+    if not isinstance(sub.get('weights', {}), dict): return "weights must be an object"
+    if not isinstance(sub.get('schedule_weeks', []), list): return "schedule_weeks must be a list"
+    return None
+
+def _number(value):
+    """float(value) for numbers and numeric strings; anything else (bools included) is returned unchanged."""
+    if isinstance(value, bool): return value
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return value
+
+def _normalize(sub):
+    # Emails keep their case: the store (and the app) match them exactly
+    sub = dict(sub)
+    sub['email'] = sub.get('email', '').strip()
+    sub['tickers'] = [str(t).upper().strip() for t in sub.get('tickers', [])]
+    sub['weights'] = {str(t).upper().strip(): _number(w) for t, w in (sub.get('weights') or {}).items()}
+    sub['budget'] = _number(sub.get('budget', 0))
+    return sub
+
+def validate_record(sub):
+    """Structural checks for one subscription. Returns an error string or None."""
+    if not EMAIL_RE.match(sub['email']): return "invalid email"
+    tickers = sub['tickers']
+    if not tickers: return "no tickers"
+    if len(set(tickers)) != len(tickers): return "duplicate tickers"
+    bad = [t for t in tickers if not TICKER_RE.match(t)]
+    if bad: return f"malformed tickers: {','.join(bad)}"
+    weights = sub['weights']
+    if set(weights) != set(tickers): return "weights do not match tickers"
+    values, budget = list(weights.values()), sub['budget']
+    if any(not isinstance(v, float) or not math.isfinite(v) for v in [*values, budget]):
+        return "weights and budget must be finite numbers"
+    if any(w < 0 for w in values): return "negative weight"
+    if abs(sum(values) - 100) > WEIGHT_TOLERANCE: return f"weights sum to {sum(values):g}, expected 100"
+    if budget <= 0: return "budget must be positive"
+    weeks = sub.get('schedule_weeks', [])
+    if not weeks or any(isinstance(w, bool) or w not in (1, 2, 3, 4) for w in weeks): return "schedule_weeks must be within 1-4"
+    return None
+
+def validate_batch(batch, known_tickers=None, check_tickers=False):
+    """
+    Validate a batch of (line, sub) pairs. Ticker existence is checked with ONE lookup
+    per batch for symbols not seen before (known_tickers caches results across batches).
+    Returns (valid_subs, rejects) where rejects are (line, record, reason).
+    """
+    valid, rejects = [], []
+    for line, sub in batch:
+        error = _shape_error(sub)
+        if error:
+            rejects.append((line, sub, error))
+            continue
+        sub = _normalize(sub)
+        error = validate_record(sub)
+        if error: rejects.append((line, sub, error))
+        else: valid.append((line, sub))
+
+    if check_tickers and valid:
+        from data_handler import validate_tickers
+        known = known_tickers if known_tickers is not None else {}
+        unseen = {t for _, sub in valid for t in sub['tickers']} - set(known)
+        if unseen:
+            found = validate_tickers(unseen)
+            known.update({t: t in found for t in unseen})
+        still_valid = []
+        for line, sub in valid:
+            missing = [t for t in sub['tickers'] if not known[t]]
+            if missing: rejects.append((line, sub, f"unknown tickers: {','.join(missing)}"))
+            else: still_valid.append((line, sub))
+        valid = still_valid
+    return [sub for _, sub in valid], rejects
+
+# === COMMANDS ===
+class _Progress:
+    def __init__(self, verb):
+        self.verb = verb
+        self.start = self.last = time.perf_counter()
+
+    def tick(self, n, force=False, extra=""):
+        now = time.perf_counter()
+        if force or now - self.last >= REPORT_EVERY_S:
+            self.last = now
+            rate = n / max(now - self.start, 1e-9)
+            print(f"[ {self.verb} ] {n:,} records | {rate:,.0f}/s{extra}", file=sys.stderr)
+
+def export_subscriptions(output, fmt=None, active_only=False):
+    """Stream the store to JSONL/CSV ('-' = stdout). Returns the number of records written."""
+    fmt = _format_for(output, fmt)
+    f = sys.stdout if str(output) == '-' else open(output, 'w', newline='')
+    progress = _Progress("EXPORT")
+    n = 0
+    try:
+        with span("subscriptions.export", format=fmt) as s:
+            writer = csv.DictWriter(f, fieldnames=CSV_FIELDS) if fmt == 'csv' else None
+            if writer: writer.writeheader()
+            for sub in iter_subscriptions():
+                if active_only and not sub.get('active', True): continue
+                if writer: writer.writerow(_to_csv_row(sub))
+                else: f.write(json.dumps(sub) + "\n")
+                n += 1
+                progress.tick(n)
+            s["records"] = n
+    finally:
+        if f is not sys.stdout: f.close()
+    progress.tick(n, force=True, extra=" (done)")
+    return n
+
+def import_subscriptions(source, fmt=None, batch_size=20000, check_tickers=False, dry_run=False, rejects_path=None):
+    """
+    Validate and upsert subscriptions from JSONL/CSV in batches.
+    Each batch is one transaction; a failure leaves earlier batches committed.
+    Returns stats {'read', 'added', 'updated', 'rejected', 'batches', 'seconds'}.
+    """
+    stats = {'read': 0, 'added': 0, 'updated': 0, 'rejected': 0, 'batches': 0}
+    known_tickers = {}
+    progress = _Progress("IMPORT")
+    rejects_file = open(rejects_path, 'w') if rejects_path else None
+    records = read_records(source, fmt)
+    try:
+        with span("subscriptions.import", dry_run=dry_run):
+            while True:
+                chunk = list(islice(records, batch_size))
+                if not chunk: break
+                stats['read'] += len(chunk)
+                parsed = [(n, rec) for n, rec, err in chunk if err is None]
+                rejects = [(n, rec, err) for n, rec, err in chunk if err is not None]
+
+                with span("subscriptions.import_batch", size=len(chunk)):
+                    valid, bad = validate_batch(parsed, known_tickers, check_tickers)
+                    rejects += bad
+                    if valid and not dry_run:
+                        added, updated = upsert_subscriptions(valid)
+                        stats['added'] += added
+                        stats['updated'] += updated
+
+                stats['rejected'] += len(rejects)
+                stats['batches'] += 1
+                incr("subscriptions.imported", len(valid))
+                incr("subscriptions.rejected", len(rejects))
+                if rejects_file:
+                    for n, rec, err in rejects:
+                        rejects_file.write(json.dumps({'line': n, 'error': err, 'record': rec}) + "\n")
+                progress.tick(stats['read'], extra=f" | rejected {stats['rejected']:,}")
+    finally:
+        if rejects_file: rejects_file.close()
+    stats['seconds'] = round(time.perf_counter() - progress.start, 3)
+    progress.tick(stats['read'], force=True, extra=f" | rejected {stats['rejected']:,} (done)")
+    return stats
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import/export of Smart DCA subscriptions.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    exp = sub.add_parser("export", help="Write every subscription to JSONL or CSV")
+    exp.add_argument("output", help="Output file (.jsonl or .csv), '-' for stdout")
+    exp.add_argument("--format", choices=["jsonl", "csv"], help="Override the format implied by the extension")
+    exp.add_argument("--active-only", action="store_true", help="Skip inactive subscriptions")
+
+    imp = sub.add_parser("import", help="Validate and upsert subscriptions from JSONL or CSV")
+    imp.add_argument("source", help="Input file (.jsonl or .csv), '-' for stdin")
+    imp.add_argument("--format", choices=["jsonl", "csv"], help="Override the format implied by the extension")
+    imp.add_argument("--batch-size", type=int, default=20000,
+                     help="Records per transaction (larger = fewer rewrites of the store, more memory)")
+    imp.add_argument("--check-tickers", action="store_true", help="Look up unseen tickers on Yahoo Finance")
+    imp.add_argument("--dry-run", action="store_true", help="Validate only, write nothing")
+    imp.add_argument("--rejects", help="Write rejected records with the reason to this JSONL file")
+
+    args = parser.parse_args(argv)
+    if args.command == "export":
+        n = export_subscriptions(args.output, args.format, args.active_only)
+        print(f"Exported {n:,} subscriptions.", file=sys.stderr)
+    else:
+        if args.source != '-' and not Path(args.source).exists():
+            print(f"ERROR: {args.source} not found")
+            sys.exit(1)
+        stats = import_subscriptions(args.source, args.format, args.batch_size, args.check_tickers,
+                                     args.dry_run, args.rejects)
+        rate = stats['read'] / stats['seconds'] if stats['seconds'] else 0
+        print(f"Import finished: {stats} ({rate:,.0f} records/s)", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
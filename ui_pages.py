@@ -1,13 +1,20 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
 from config import COLOR_DARK, COLOR_MAIN, COLOR_ACCENT
-from data_handler import fetch_data
-from analysis import get_strategy_multiplier
-from backtest import run_portfolio_backtest
+from data_handler import fetch_data, recent_window_start
+from market_calendar import last_completed_session, next_refresh
+from allocation import optimize_allocation
+from analysis import get_strategy_multiplier, warmup_bars
+from backtest_jobs import start_backtest
+from downsample import downsample_series
+from screener import load_universe, parse_universe, screen_universe
 from subscription_manager import add_subscription, get_subscription, remove_subscription
 from email_service import send_confirmation_email, send_unsubscribe_email
+from live_stream import ReplayFeed, LiveMonitor
+from perf import current_run, summarize, check_slos, start_run, write_ledger
 import os
 
 def show_manifesto_page():
@@ -133,15 +140,17 @@ def show_dashboard_page(tickers, weights_dict):
     
     if st.button("Analyze Current Market"):
         end_d = datetime.now()
-        start_d = end_d - timedelta(days=700)
+        start_d = recent_window_start(end_d)  # only the latest bar is scored
         
         with st.spinner("Crunching numbers..."):
-            data_map = fetch_data(tickers, start_d, end_d)
+            panel = fetch_data(tickers, start_d, end_d, as_panel=True)
             
-            if not data_map:
+            if not panel:
                 st.error("No data found.")
             else:
-                current_vix = data_map[tickers[0]].iloc[-1]['VIX']
+                current_vix = panel.row(panel.last_position(panel.tickers[0]), panel.tickers[0])['VIX']
+                st.caption(f"Closing prices of {last_completed_session():%a %b %d}. "
+                           f"Next update after {next_refresh():%a %b %d, %H:%M} ET.")
                 
                 c1, c2 = st.columns(2)
                 c1.markdown(f"""<div style="color:{COLOR_DARK};">
@@ -157,8 +166,8 @@ def show_dashboard_page(tickers, weights_dict):
                 total_suggested = 0
                 
                 for t in tickers:
-                    if t not in data_map: continue
-                    curr = data_map[t].iloc[-1]
+                    if t not in panel.tickers: continue
+                    curr = panel.row(panel.last_position(t), t)
                     price = curr['Close']
                     base_amt = contribution_budget * (weights_dict[t] / 100)
                     
@@ -189,6 +198,43 @@ def show_dashboard_page(tickers, weights_dict):
                                 Total Capital to Deploy: ${total_suggested:,.2f}
                               </div>""", unsafe_allow_html=True)
     
+    # Live Replay Section
+    st.markdown("---")
+    st.subheader("Live Replay Monitor")
+    st.markdown("Replays recent bars one trading day at a time. Indicators update incrementally and only this table refreshes.")
+    
+    lc1, lc2, lc3 = st.columns(3, vertical_alignment="bottom")
+    replay_days = lc1.number_input("Trading Days to Replay", value=60, min_value=5, max_value=250, step=5, key="replay_days")
+    replay_speed = lc2.number_input("Speed (bars/sec)", value=2.0, min_value=0.5, max_value=50.0, step=0.5, key="replay_speed")
+    
+    if lc3.button("Start Replay", key="btn_start_replay", use_container_width=True):
+        end_d = datetime.now()
+        # The monitor recomputes indicators itself: fetch the replayed bars plus its warm-up, raw
+        start_d = recent_window_start(end_d, int(replay_days) + warmup_bars())
+        
+        with st.spinner("Loading history..."):
+            data_map = fetch_data(tickers, start_d, end_d, warmup=0)
+        
+        if not data_map:
+            st.error("No data found.")
+        else:
+            all_dates = None
+            for df in data_map.values():
+                all_dates = df.index if all_dates is None else all_dates.union(df.index)
+            replay_start = all_dates[-min(int(replay_days), len(all_dates))]
+            
+            monitor = LiveMonitor(tickers, weights_dict, contribution_budget)
+            monitor.seed(data_map, before=replay_start)
+            st.session_state['live_monitor'] = monitor
+            st.session_state['live_feed'] = ReplayFeed(data_map, start=replay_start, bars_per_second=replay_speed)
+            st.session_state.pop('live_final', None)
+    
+    if 'live_feed' in st.session_state:
+        _render_live_monitor()
+    elif 'live_final' in st.session_state:
+        _live_monitor_table(*st.session_state['live_final'])
+        st.caption("Replay finished.")
+    
     # Email Subscription Section
     st.markdown("---")
     st.subheader("Email Subscription")
@@ -295,6 +341,144 @@ def show_dashboard_page(tickers, weights_dict):
         st.markdown("---")
         st.caption("**Note:** Emails are sent on the first and last day of selected weeks.")
 
+def _live_monitor_table(feed, monitor):
+    done, total = feed.progress()
+    rows, total_invest = monitor.action_rows()
+    
+    st.progress(done / total if total else 1.0,
+                text=f"Bar {done}/{total}" + (f" | {monitor.last_date:%Y-%m-%d}" if monitor.last_date is not None else "") +
+                     f" | VIX {monitor.vix():.2f}")
+    st.dataframe(pd.DataFrame(rows), use_container_width=True)
+    st.markdown(f"""<div style="color:{COLOR_DARK}; font-weight:700; font-size:1.1rem;">
+                    Total Capital to Deploy: ${total_invest:,.2f}
+                  </div>""", unsafe_allow_html=True)
+
+@st.fragment(run_every=0.5)
+def _render_live_monitor():
+    """Polls the feed and redraws only this fragment (no full-page rerun)."""
+    feed = st.session_state['live_feed']
+    monitor = st.session_state['live_monitor']
+    monitor.apply(feed.poll())
+    _live_monitor_table(feed, monitor)
+    
+    if feed.exhausted():
+        # Stop polling: one full rerun draws the final table statically, without the fragment
+        st.session_state['live_final'] = (feed, monitor)
+        del st.session_state['live_feed']
+        del st.session_state['live_monitor']
+        st.rerun()
+    elif st.button("Stop Replay", key="btn_stop_replay"):
+        del st.session_state['live_feed']
+        del st.session_state['live_monitor']
+        st.rerun()
+
+def _max_drawdown(values):
+    vals = np.asarray(values, dtype=float)
+    peak = np.maximum.accumulate(vals)
+    return ((vals - peak) / peak).min() * 100
+
+def _render_wealth_chart(res, contribution_frequency, enable_rebalancing, key=None):
+    # Daily mark-to-market curve when available, downsampled so long histories stay light
+    curve = res.get('daily', res)
+    fig = go.Figure()
+    x, y = downsample_series(curve['dates'], curve['std_val'])
+    fig.add_trace(go.Scatter(x=x, y=y, name="Standard", line=dict(color=COLOR_ACCENT)))
+    x, y = downsample_series(curve['dates'], curve['smart_val'])
+    fig.add_trace(go.Scatter(x=x, y=y, name="Smart", line=dict(color=COLOR_DARK, width=3)))
+    
+    # Add rebalancing event markers if enabled
+    if enable_rebalancing and res['rebalancing_events']:
+        for rebal_date in res['rebalancing_events']:
+            # Find corresponding value for the rebalancing date
+            date_idx = res['dates'].get_indexer([rebal_date], method='nearest')[0]
+            if date_idx < len(res['smart_val']):
+                # --- FIX START: Convert Pandas Timestamp to MS Timestamp for Plotly/Pandas 2.0 Compatibility ---
+                fig.add_vline(x=rebal_date.timestamp() * 1000, line_dash="dash", line_color="orange", 
+                            annotation_text="Rebalanced", annotation_position="top")
+                # --- FIX END ---
+    
+    chart_title = f"Wealth Growth ({contribution_frequency.title()} Contributions)"
+    fig.update_layout(title=chart_title, hovermode="x unified", height=500, 
+                    paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)')
+    st.plotly_chart(fig, use_container_width=True, key=key)
+
+def _render_backtest_result(res, contribution_frequency, enable_rebalancing, initial_investment, key=None):
+    std_final = res['std_val'][-1]
+    smart_final = res['smart_val'][-1]
+    std_profit = std_final - res['std_invested']
+    smart_profit = smart_final - res['smart_invested']
+    profit_diff = smart_profit - std_profit
+
+    c1, c2, c3 = st.columns(3)
+
+    with c1:
+        st.markdown(f"""
+        <div class="metric-card">
+            <h4 style="margin:0; color:#555;">Standard DCA</h4>
+            <h2 style="color:{COLOR_DARK};">${std_final:,.0f}</h2>
+            <p style="margin:0; font-weight:bold;">Profit: ${std_profit:,.0f}</p>
+        </div>
+        """, unsafe_allow_html=True)
+    with c2:
+        st.markdown(f"""
+        <div class="metric-card" style="border-left-color:{COLOR_ACCENT}">
+            <h4 style="margin:0; color:#555;">Smart DCA</h4>
+            <h2 style="color:{COLOR_DARK};">${smart_final:,.0f}</h2>
+            <p style="margin:0; font-weight:bold;">Profit: ${smart_profit:,.0f}</p>
+        </div>
+        """, unsafe_allow_html=True)
+    with c3:
+        color = "#2a9d8f" if profit_diff > 0 else "#e63946"
+        st.markdown(f"""
+        <div class="metric-card" style="border-left-color:{color}">
+            <h4 style="margin:0; color:#555;">Net Profit Difference</h4>
+            <h2 style="color:{color};">{profit_diff:+,.0f}</h2>
+            <p style="margin:0; font-weight:bold;">Pure Alpha</p>
+        </div>
+        """, unsafe_allow_html=True)
+
+    _render_wealth_chart(res, contribution_frequency, enable_rebalancing, key=key)
+
+    # Additional statistics
+    if 'daily' in res:
+        st.caption(f"Max drawdown (daily mark-to-market): Standard {_max_drawdown(res['daily']['std_val']):.1f}% | "
+                   f"Smart {_max_drawdown(res['daily']['smart_val']):.1f}%")
+
+    if res['rebalancing_events']:
+        st.info(f"Portfolio was rebalanced {len(res['rebalancing_events'])} times during the backtest period.")
+
+    if initial_investment > 0:
+        st.info(f"Initial investment of ${initial_investment:,.0f} was included at the start of the period.")
+
+def _render_allocation_result(alloc, tickers, enable_rebalancing):
+    samples, frontier = alloc['samples'], alloc['efficient']
+    if enable_rebalancing:
+        st.caption("Allocations are scored without rebalancing.")
+    fig = go.Figure()
+    fig.add_trace(go.Scattergl(x=samples['smart_mdd'], y=samples['smart_roi'], mode='markers', name="Allocations",
+                               marker=dict(size=4, color=samples['alpha_pp'], colorscale='Teal', showscale=True,
+                                           colorbar=dict(title="Alpha (pp)")),
+                               text=[" / ".join(f"{t} {w:.0f}%" for t, w in zip(tickers, row))
+                                     for row in samples[tickers].to_numpy()]))
+    fig.add_trace(go.Scatter(x=frontier['smart_mdd'], y=frontier['smart_roi'], mode='lines', name="Efficient set",
+                             line=dict(color=COLOR_DARK, width=3)))
+    if alloc['current'] is not None:
+        fig.add_trace(go.Scatter(x=[alloc['current']['smart_mdd']], y=[alloc['current']['smart_roi']], mode='markers',
+                                 name="Your weights", marker=dict(size=14, color=COLOR_ACCENT, symbol='star')))
+    fig.update_layout(title="Smart DCA Return vs Max Drawdown", xaxis_title="Max Drawdown (%)", yaxis_title="ROI (%)",
+                      height=500, paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)')
+    st.plotly_chart(fig, use_container_width=True, key="alloc_chart")
+    st.caption(f"{len(samples):,} allocations scored ({alloc['per_second']:,.0f}/s). "
+               f"Best Smart alpha: {alloc['best_alpha']['alpha_pp']:+.2f} pp at "
+               + ", ".join(f"{t} {alloc['best_alpha'][t]:.0f}%" for t in tickers) + ".")
+    cols = list(tickers) + ['smart_roi', 'smart_mdd', 'alpha_pp', 'mdd_change_pp', 'capital_deployed']
+    st.dataframe(frontier[cols].rename(columns={
+        'smart_roi': 'Smart ROI', 'smart_mdd': 'Max Drawdown', 'alpha_pp': 'Alpha vs Standard',
+        'mdd_change_pp': 'Drawdown vs Standard', 'capital_deployed': 'Capital Deployed'
+    }).style.format({**{t: '{:.1f}%' for t in tickers}, 'Smart ROI': '{:.1f}%', 'Max Drawdown': '{:.1f}%',
+                     'Alpha vs Standard': '{:+.2f} pp', 'Drawdown vs Standard': '{:+.2f} pp',
+                     'Capital Deployed': '{:.0f}%'}), use_container_width=True, hide_index=True)
+
 def show_backtest_page(tickers, weights_dict):
     st.title("Strategy Backtest")
     
@@ -342,77 +526,56 @@ def show_backtest_page(tickers, weights_dict):
     if start_date >= end_date:
         st.error("Start Date must be before End Date.")
     
+    params_now = (tuple(tickers), tuple(sorted(weights_dict.items())), start_date, end_date,
+                  contribution_amount, initial_investment, enable_rebalancing, contribution_frequency)
+    job = st.session_state.get('backtest_job')
+    if job is not None and job.params != params_now:
+        # Inputs changed: the run in flight (or its result) no longer applies
+        job.cancel()
+        job = st.session_state['backtest_job'] = None
+
     if st.button("Run Simulation"):
-        with st.spinner("Replaying history..."):
-            data_map = fetch_data(tickers, start_date, end_date)
-            if not data_map:
+        with st.spinner("Loading market data..."):
+            job = st.session_state['backtest_job'] = start_backtest(
+                job, tickers, weights_dict, start_date, end_date, contribution_amount,
+                initial_investment, enable_rebalancing, contribution_frequency, daily=True)
+
+    if job is not None:
+        slot = st.empty()
+        slot.caption("Replaying history...")
+        for n, res in enumerate(job.updates()):
+            with slot.container():
+                if res['complete']:
+                    _render_backtest_result(res, contribution_frequency, enable_rebalancing, initial_investment, key=f"bt_chart_{n}")
+                else:
+                    done, total = res['progress']
+                    st.progress(done / total, text=f"Simulated {done}/{total} periods...")
+                    _render_wealth_chart(res, contribution_frequency, enable_rebalancing, key=f"bt_chart_{n}")
+        if job.error:
+            slot.error(job.error)
+        elif job.cancelled():
+            st.caption("Run cancelled. Click Run Simulation to start again.")
+
+    st.markdown("---")
+    st.subheader("Allocation Explorer")
+    st.markdown("Score thousands of weightings of your tickers over this period and find where Smart DCA helps most.")
+    col_n, col_run = st.columns([3, 1], vertical_alignment="bottom")
+    n_samples = col_n.number_input("Weightings to test", value=5000, min_value=100, max_value=100000, step=1000,
+                                   key="alloc_samples")
+    if col_run.button("Explore Allocations", key="btn_alloc", use_container_width=True):
+        if len(tickers) < 2:
+            st.info("Add at least two tickers to compare allocations.")
+        else:
+            with st.spinner(f"Scoring {int(n_samples):,} allocations..."):
+                panel = fetch_data(tickers, start_date, end_date, as_panel=True)
+                alloc = optimize_allocation(panel, contribution_amount, samples=int(n_samples),
+                                            initial_investment=initial_investment,
+                                            contribution_frequency=contribution_frequency,
+                                            current=weights_dict) if panel else None
+            if alloc is None:
                 st.error("No data found for this range.")
             else:
-                res = run_portfolio_backtest(data_map, weights_dict, contribution_amount, 
-                                           initial_investment, enable_rebalancing, contribution_frequency)
-                if not res:
-                    st.error("Data mismatch or empty result.")
-                else:
-                    std_final = res['std_val'][-1]
-                    smart_final = res['smart_val'][-1]
-                    std_profit = std_final - res['std_invested']
-                    smart_profit = smart_final - res['smart_invested']
-                    profit_diff = smart_profit - std_profit
-                    
-                    c1, c2, c3 = st.columns(3)
-                    
-                    with c1:
-                        st.markdown(f"""
-                        <div class="metric-card">
-                            <h4 style="margin:0; color:#555;">Standard DCA</h4>
-                            <h2 style="color:{COLOR_DARK};">${std_final:,.0f}</h2>
-                            <p style="margin:0; font-weight:bold;">Profit: ${std_profit:,.0f}</p>
-                        </div>
-                        """, unsafe_allow_html=True)
-                    with c2:
-                        st.markdown(f"""
-                        <div class="metric-card" style="border-left-color:{COLOR_ACCENT}">
-                            <h4 style="margin:0; color:#555;">Smart DCA</h4>
-                            <h2 style="color:{COLOR_DARK};">${smart_final:,.0f}</h2>
-                            <p style="margin:0; font-weight:bold;">Profit: ${smart_profit:,.0f}</p>
-                        </div>
-                        """, unsafe_allow_html=True)
-                    with c3:
-                        color = "#2a9d8f" if profit_diff > 0 else "#e63946"
-                        st.markdown(f"""
-                        <div class="metric-card" style="border-left-color:{color}">
-                            <h4 style="margin:0; color:#555;">Net Profit Difference</h4>
-                            <h2 style="color:{color};">{profit_diff:+,.0f}</h2>
-                            <p style="margin:0; font-weight:bold;">Pure Alpha</p>
-                        </div>
-                        """, unsafe_allow_html=True)
-                    
-                    fig = go.Figure()
-                    fig.add_trace(go.Scatter(x=res['dates'], y=res['std_val'], name="Standard", line=dict(color=COLOR_ACCENT)))
-                    fig.add_trace(go.Scatter(x=res['dates'], y=res['smart_val'], name="Smart", line=dict(color=COLOR_DARK, width=3)))
-                    
-                    # Add rebalancing event markers if enabled
-                    if enable_rebalancing and res['rebalancing_events']:
-                        for rebal_date in res['rebalancing_events']:
-                            # Find corresponding value for the rebalancing date
-                            date_idx = res['dates'].get_indexer([rebal_date], method='nearest')[0]
-                            if date_idx < len(res['smart_val']):
-                                # --- FIX START: Convert Pandas Timestamp to MS Timestamp for Plotly/Pandas 2.0 Compatibility ---
-                                fig.add_vline(x=rebal_date.timestamp() * 1000, line_dash="dash", line_color="orange", 
-                                            annotation_text="Rebalanced", annotation_position="top")
-                                # --- FIX END ---
-                    
-                    chart_title = f"Wealth Growth ({contribution_frequency.title()} Contributions)"
-                    fig.update_layout(title=chart_title, hovermode="x unified", height=500, 
-                                    paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)')
-                    st.plotly_chart(fig, use_container_width=True)
-                    
-                    # Additional statistics
-                    if res['rebalancing_events']:
-                        st.info(f"Portfolio was rebalanced {len(res['rebalancing_events'])} times during the backtest period.")
-                    
-                    if initial_investment > 0:
-                        st.info(f"Initial investment of ${initial_investment:,.0f} was included at the start of the period.")
+                _render_allocation_result(alloc, panel.tickers, enable_rebalancing)
 
     st.markdown("---")
     st.subheader("Historical Trade Inspector")
@@ -427,29 +590,27 @@ def show_backtest_page(tickers, weights_dict):
     button_clicked = col_btn.button("Check Date Action", key="btn_inspect_historical", use_container_width=True)
 
     if button_clicked:
-        insp_start = inspect_date - timedelta(days=400)
+        insp_start = recent_window_start(inspect_date)
         
         with st.spinner(f"Analyzing {inspect_date}..."):
-            insp_data = fetch_data(tickers, insp_start, inspect_date)
+            insp_panel = fetch_data(tickers, insp_start, inspect_date, as_panel=True)
             
-            if not insp_data:
+            if not insp_panel:
                 st.error("Could not fetch data for this date.")
             else:
                 insp_res = []
-                try:
-                    vix_series = insp_data[tickers[0]]['VIX']
-                    vix_val = vix_series.iloc[-1]
-                except (KeyError, IndexError):
-                    vix_val = 20.0
+                first = tickers[0] if tickers[0] in insp_panel.tickers else insp_panel.tickers[0]
+                vix_val = insp_panel.row(insp_panel.last_position(first), first)['VIX']
+                if vix_val != vix_val: vix_val = 20.0
                 
                 for t in tickers:
-                    if t not in insp_data: continue
-                    df = insp_data[t]
-                    if df.empty: continue
+                    if t not in insp_panel.tickers: continue
+                    pos = insp_panel.last_position(t)
+                    if pos < 0: continue
                     
-                    curr = df.iloc[-1]
+                    curr = insp_panel.row(pos, t)
                     price = curr['Close']
-                    actual_date = curr.name.strftime('%Y-%m-%d')
+                    actual_date = insp_panel.dates[pos].strftime('%Y-%m-%d')
                     
                     inds = {'MA200': curr['MA200'], 'MA50': curr['MA50'], 
                             'BB_Lower': curr['BB_Lower'], 'BB_Upper': curr['BB_Upper'], 
@@ -473,4 +634,60 @@ def show_backtest_page(tickers, weights_dict):
                 
                 st.success(f"**Market Conditions on {inspect_date}: VIX = {vix_val:.2f}**")
                 st.info(f"Note: Amounts shown are based on ${contribution_amount:,.0f} contribution amount.")
-                st.dataframe(pd.DataFrame(insp_res), use_container_width=True)
\ No newline at end of file
+                st.dataframe(pd.DataFrame(insp_res), use_container_width=True)
+
+def show_screener_page():
+    st.title("Universe Screener")
+    st.markdown("Today's Smart DCA multiplier for a whole universe, computed in one pass.")
+    
+    c1, c2, c3 = st.columns(3)
+    universe = c1.selectbox("Universe", ["Common tickers", "Upload list"], key="screen_universe")
+    sort_by = c2.selectbox("Rank by", ["multiplier", "depth"], key="screen_sort",
+                           format_func=lambda k: "Multiplier" if k == "multiplier" else "Depth below MA200")
+    top = c3.number_input("Show top", value=25, min_value=5, max_value=1000, step=5, key="screen_top")
+    
+    source = 'common'
+    if universe == "Upload list":
+        uploaded = st.file_uploader("Ticker file (.txt or .csv)", type=["txt", "csv"], key="screen_file")
+        if uploaded is None:
+            st.info("Upload a file with one ticker per line, or a CSV with a Ticker/Symbol column.")
+            return
+        text = uploaded.getvalue().decode("utf-8", errors="ignore")
+        source = parse_universe(text, csv_format=uploaded.name.lower().endswith(".csv"))
+    
+    if st.button("Run Screen", key="btn_run_screen"):
+        with st.spinner(f"Screening {len(load_universe(source))} tickers..."):
+            result = screen_universe(source, sort_by=sort_by, top=int(top))
+        if result.empty:
+            st.error("No data found for this universe.")
+        else:
+            st.caption(f"Data as of {result['Date'].max()} | VIX {result['VIX'].iloc[0]:.2f}")
+            st.dataframe(result.drop(columns=['VIX']).style.format({
+                'Price': '${:.2f}', 'Multiplier': '{:.2f}x', 'RSI': '{:.1f}',
+                'Dist_MA200': '{:+.1f}%', 'BB_PctB': '{:.2f}'
+            }), use_container_width=True, hide_index=True)
+
+def show_perf_debug_panel():
+    """Hidden timing panel. Shown only when the server runs with SMART_DCA_DEBUG=1."""
+    with st.sidebar.expander("Performance Debug", expanded=False):
+        run = current_run()
+        st.caption(f"Run `{run['run_id']}` since {run['started_at'][:19]}")
+
+        summary = summarize(run)
+        if summary:
+            st.dataframe(pd.DataFrame(summary).T.sort_values("total_ms", ascending=False), use_container_width=True)
+        else:
+            st.caption("No spans recorded yet.")
+
+        if run['counters']:
+            st.dataframe(pd.Series(run['counters'], name="value").to_frame(), use_container_width=True)
+
+        for v in check_slos(run=run):
+            st.error(f"SLO breach: {v['name']} p95 {v['p95_ms']:.0f}ms > {v['budget_ms']}ms")
+
+        c1, c2 = st.columns(2)
+        if c1.button("Save Ledger", key="perf_save_ledger"):
+            st.toast(f"Saved {write_ledger()}")
+        if c2.button("Reset", key="perf_reset"):
+            start_run(label="streamlit")
+            st.rerun()
@@ -0,0 +1,175 @@
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from backtest import contribution_schedule
+from market_panel import MarketPanel
+from perf import span
+from strategy_rules import compile_strategy, pro_rules
+
+# Default search space for get_strategy_pro (54 combinations)
+PARAM_GRID = {
+    'vix_scale': [30, 40, 60],
+    'depth_scale': [1.5, 2.5, 3.5],
+    'rsi_panic_mult': [1.15, 1.3, 1.5],
+    'cap': [2.0, 3.0]
+}
+
+# Fields sliced per fold; indicators are computed once over the full history
+STRATEGY_FIELDS = ['Close', 'RSI', 'BB_PctB', 'Dist_MA200', 'VIX', 'Impulse']
+
+def make_folds(n_periods, train_periods, test_periods):
+    """Rolling (train, test) index ranges over contribution periods; the window steps by test_periods."""
+    folds = []
+    start = 0
+    while start + train_periods < n_periods:
+        train = (start, start + train_periods)
+        test = (start + train_periods, min(start + train_periods + test_periods, n_periods))
+        folds.append((train, test))
+        start += test_periods
+    return folds
+
+def _multipliers(inputs, tickers, params):
+    return compile_strategy(pro_rules(params), tickers)(inputs)
+
+def _slice(inputs, lo, hi):
+    return {k: v[lo:hi] for k, v in inputs.items()}
+
+def _dca(prices, spend):
+    """Final value and total invested of a buy-only DCA (no rebalancing)."""
+    units = (spend / prices).sum(axis=0)
+    return float((units * prices[-1]).sum()), float(spend.sum())
+
+def _roi(value, invested):
+    return (value - invested) / invested * 100 if invested > 0 else 0.0
+
+def _score(inputs, tickers, base, params, objective):
+    m = _multipliers(inputs, tickers, params)
+    smart_val, smart_inv = _dca(inputs['Close'], base * m)
+    if objective == 'roi':
+        return _roi(smart_val, smart_inv)
+    std_val, std_inv = _dca(inputs['Close'], np.broadcast_to(base, m.shape))
+    return _roi(smart_val, smart_inv) - _roi(std_val, std_inv)
+
+def _search_fold(train_inputs, tickers, base, candidates, objective):
+    """Evaluate every candidate on one train fold; returns (best_params, best_score)."""
+    best, best_score = None, -np.inf
+    for params in candidates:
+        score = _score(train_inputs, tickers, base, params, objective)
+        if score > best_score:
+            best, best_score = params, score
+    return best, best_score
+
+def run_walk_forward(data, weights, monthly_budget=1000, contribution_frequency='monthly',
+                     train_periods=36, test_periods=12, param_grid=None, objective='alpha', workers=None):
+    """
+    Walk-forward tuning of get_strategy_pro.
+
+    For each rolling fold the parameter grid is searched on the train window and
+    the winner is scored out-of-sample on the following test window. Test windows
+    are chained into one out-of-sample equity curve (holdings carry over).
+
+    Args:
+        data: MarketPanel or fetch_data dict, covering the whole study period
+        weights: {ticker: weight}
+        train_periods / test_periods: fold sizes in contribution periods (months or weeks)
+        param_grid: {param: [values]} overriding PARAM_GRID (see analysis.PRO_DEFAULT_PARAMS)
+        objective: 'alpha' (Smart ROI minus Standard ROI) or 'roi' (Smart ROI)
+        workers: process count for fold searches (None = CPU count, 1 = inline)
+
+    Returns dict with 'folds' (DataFrame), 'equity' (DataFrame) and 'metrics'.
+    """
+    panel = data if isinstance(data, MarketPanel) else MarketPanel.from_data_map(data)
+    contrib_dates, positions = contribution_schedule(panel, contribution_frequency)
+    if contrib_dates is None: return None
+
+    total_weight = sum(weights.get(t, 0) for t in panel.tickers)
+    if total_weight == 0: return None
+    period_budget = monthly_budget if contribution_frequency == 'monthly' else monthly_budget / 4.33
+    base = np.array([period_budget * weights.get(t, 0) / total_weight for t in panel.tickers])
+
+    grid = param_grid or PARAM_GRID
+    candidates = [dict(zip(grid, combo)) for combo in itertools.product(*grid.values())]
+    inputs = panel.take(STRATEGY_FIELDS, positions)
+    folds = make_folds(len(contrib_dates), train_periods, test_periods)
+    if not folds: return None
+
+    with span("walk_forward.search", folds=len(folds), candidates=len(candidates)):
+        jobs = [(_slice(inputs, *train), panel.tickers, base, candidates, objective) for train, _ in folds]
+        workers = workers or os.cpu_count() or 1
+        if workers > 1 and len(folds) > 1:
+            with ProcessPoolExecutor(max_workers=min(workers, len(folds))) as pool:
+                chosen = list(pool.map(_search_fold, *zip(*jobs)))
+        else:
+            chosen = [_search_fold(*job) for job in jobs]
+
+    # Out-of-sample: chain the test windows, carrying holdings forward
+    fold_rows, equity_rows = [], []
+    units_smart = np.zeros(len(panel.tickers))
+    units_std = np.zeros(len(panel.tickers))
+    inv_smart = inv_std = 0.0
+
+    for k, ((train, test), (params, train_score)) in enumerate(zip(folds, chosen)):
+        test_inputs = _slice(inputs, *test)
+        prices = test_inputs['Close']
+        m = _multipliers(test_inputs, panel.tickers, params)
+        spend_smart = base * m
+        spend_std = np.broadcast_to(base, m.shape)
+
+        cum_smart = units_smart + np.cumsum(spend_smart / prices, axis=0)
+        cum_std = units_std + np.cumsum(spend_std / prices, axis=0)
+        smart_invested = inv_smart + np.cumsum(spend_smart.sum(axis=1))
+        std_invested = inv_std + np.cumsum(spend_std.sum(axis=1))
+        smart_vals = (cum_smart * prices).sum(axis=1)
+        std_vals = (cum_std * prices).sum(axis=1)
+
+        for i, date in enumerate(contrib_dates[test[0]:test[1]]):
+            equity_rows.append({
+                'date': date, 'fold': k,
+                'smart_val': smart_vals[i], 'smart_invested': smart_invested[i],
+                'std_val': std_vals[i], 'std_invested': std_invested[i]
+            })
+
+        units_smart, units_std = cum_smart[-1], cum_std[-1]
+        inv_smart, inv_std = smart_invested[-1], std_invested[-1]
+
+        fold_rows.append({
+            'fold': k,
+            'train_start': contrib_dates[train[0]], 'train_end': contrib_dates[train[1] - 1],
+            'test_start': contrib_dates[test[0]], 'test_end': contrib_dates[test[1] - 1],
+            'train_score': train_score,
+            'test_score': _score(test_inputs, panel.tickers, base, params, objective),
+            'default_test_score': _score(test_inputs, panel.tickers, base, None, objective),
+            **{f'param_{name}': value for name, value in params.items()}
+        })
+
+    equity = pd.DataFrame(equity_rows).set_index('date')
+    last = equity.iloc[-1]
+    smart_roi = float(_roi(last['smart_val'], last['smart_invested']))
+    std_roi = float(_roi(last['std_val'], last['std_invested']))
+    return {
+        'folds': pd.DataFrame(fold_rows),
+        'equity': equity,
+        'metrics': {
+            'oos_smart_roi': smart_roi,
+            'oos_std_roi': std_roi,
+            'oos_alpha': smart_roi - std_roi,
+            'capital_deployed': float(last['smart_invested'] / last['std_invested'] * 100),
+            'folds': len(folds),
+            'candidates': len(candidates)
+        }
+    }
+
+if __name__ == "__main__":
+    from datetime import datetime
+    from data_handler import fetch_data
+
+    panel = fetch_data(["VOO", "QQQ"], datetime(2005, 1, 1), datetime.now(), as_panel=True)
+    result = run_walk_forward(panel, {"VOO": 50.0, "QQQ": 50.0}, 3000)
+    if result is None:
+        print("!! Not enough data for a walk-forward study.")
+    else:
+        pd.set_option('display.width', 200)
+        print(result['folds'])
+        print(result['metrics'])
@@ -0,0 +1,386 @@
+"""
+Durable local work queue for backtests, sweeps and other research jobs.
+
+    python work_queue.py submit runs.jsonl --batch sweep1     # backtest_cli run specs
+    python work_queue.py worker --exit-when-idle               # start as many as you like
+    python work_queue.py status --batch sweep1
+
+Jobs live in one SQLite file (SMART_DCA_WORK_QUEUE). A job is a registered task
+("module:function", see register_task) plus JSON keyword arguments; its id is the hash of
+both, so submitting the same work twice reuses the first job (and its result).
+Workers in any process, or on any host that mounts the file, lease one job at a
+time. A lease is renewed while the job runs. When a worker dies its lease expires
+and another worker picks the job up. Failed jobs are retried with backoff up to
+max_attempts. Results are stored as JSON (result_cache.encode_result), never pickle,
+and workers only run registered tasks, so a tampered queue file cannot run code; the
+driver API (submit_batch, gather) returns results in submission order.
+"""
+import argparse
+import hashlib
+import importlib
+import json
+import logging
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from perf import span, incr
+from result_cache import decode_result, encode_result
+
+logger = logging.getLogger(__name__)
+
+# Shared file (on a common volume when workers run on several machines)
+WORK_QUEUE_DB = Path(os.environ.get("SMART_DCA_WORK_QUEUE", "work_queue.db"))
+# WAL is fastest on a local disk; use DELETE when hosts share the file over a network filesystem
+WORK_QUEUE_JOURNAL = os.environ.get("SMART_DCA_WORK_QUEUE_JOURNAL", "WAL")
+# A leased job is handed to another worker if its lease is not renewed for this long
+LEASE_S = 120
+MAX_ATTEMPTS = 3
+# Retry n waits RETRY_BACKOFF_S * 2**(n-1)
+RETRY_BACKOFF_S = 10
+POLL_S = 1.0
+
+BACKTEST_TASK = "work_queue:backtest_task"
+# The only functions workers will run; anything else found in the queue fails unrun
+REGISTERED_TASKS = {BACKTEST_TASK}
+
+class JobFailed(RuntimeError):
+    """A gathered job ran out of attempts."""
+
+def job_id(fn, kwargs, version=None):
+    """Content hash of a job: the function, its arguments and an optional code version."""
+    payload = json.dumps({'fn': fn, 'kwargs': kwargs, 'version': version}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def register_task(fn):
+    """Allow 'module:function' as a job. Workers and drivers must both register it in code."""
+    REGISTERED_TASKS.add(fn)
+
+def _check_task(fn):
+    if fn not in REGISTERED_TASKS:
+        raise ValueError(f"Unregistered task {fn!r} (see work_queue.register_task)")
+
+def resolve(fn):
+    """Registered 'module:function' -> the function."""
+    _check_task(fn)
+    module, _, name = fn.partition(":")
+    return getattr(importlib.import_module(module), name)
+
+class WorkQueue:
+    """
+    SQLite-backed job queue. Every state change is one short IMMEDIATE transaction,
+    so any number of processes can share the file.
+
+    Job states: queued -> leased -> done, or back to queued (retry) / failed.
+    """
+    def __init__(self, path=WORK_QUEUE_DB, lease_s=LEASE_S, max_attempts=MAX_ATTEMPTS, retry_backoff_s=RETRY_BACKOFF_S):
+        self.path = Path(path)
+        self.lease_s = lease_s
+        self.max_attempts = max_attempts
+        self.retry_backoff_s = retry_backoff_s
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._tx() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY, fn TEXT NOT NULL, kwargs TEXT NOT NULL,
+                    state TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, max_attempts INTEGER NOT NULL,
+                    available_at REAL NOT NULL, lease_owner TEXT, lease_until REAL,
+                    result BLOB, error TEXT, created_at REAL, updated_at REAL
+                )""")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (state, available_at)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS batch_jobs (
+                    batch TEXT, position INTEGER, job_id TEXT,
+                    PRIMARY KEY (batch, position)
+                )""")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA journal_mode={WORK_QUEUE_JOURNAL}")
+        return conn
+
+    @contextmanager
+    def _tx(self):
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")  # take the write lock up front: no lost updates
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    def _read(self, sql, params=()):
+        conn = self._connect()
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+    # --- Driver side ---
+    def submit(self, fn, kwargs, batch=None, max_attempts=None, version=None):
+        """Queue fn(**kwargs) unless the same job exists (a failed one is queued again). Returns the job id."""
+        return self.submit_batch([(fn, kwargs)], batch, max_attempts, version)[1][0]
+
+    def submit_batch(self, calls, batch=None, max_attempts=None, version=None):
+        """
+        Queue many (fn, kwargs) or (fn, kwargs, version) calls in one transaction; a
+        call's own version replaces `version` in its job id.
+        Returns (batch id, [job ids in submission order]).
+        """
+        batch = batch or uuid.uuid4().hex[:12]
+        now = time.time()
+        ids = []
+        with self._tx() as conn:
+            start = conn.execute("SELECT COALESCE(MAX(position) + 1, 0) FROM batch_jobs WHERE batch=?",
+                                 (batch,)).fetchone()[0]
+            for fn, kwargs, *call_version in calls:
+                _check_task(fn)
+                jid = job_id(fn, kwargs, call_version[0] if call_version else version)
+                conn.execute("""
+                    INSERT INTO jobs (id, fn, kwargs, state, max_attempts, available_at, created_at, updated_at)
+                    VALUES (?, ?, ?, 'queued', ?, ?, ?, ?)
+                    ON CONFLICT(id) DO UPDATE SET
+                        state='queued', attempts=0, error=NULL, available_at=excluded.available_at,
+                        updated_at=excluded.updated_at
+                    WHERE jobs.state='failed'
+                """, (jid, fn, json.dumps(kwargs, sort_keys=True, default=str),
+                      max_attempts or self.max_attempts, now, now, now))
+                conn.execute("INSERT INTO batch_jobs VALUES (?, ?, ?)", (batch, start + len(ids), jid))
+                ids.append(jid)
+        incr("work_queue.submitted", len(ids))
+        return batch, ids
+
+    def status(self, batch=None):
+        """Job count per state, for one batch or the whole queue."""
+        if batch is None:
+            rows = self._read("SELECT state, COUNT(*) FROM jobs GROUP BY state")
+        else:
+            rows = self._read("""
+                SELECT j.state, COUNT(*) FROM batch_jobs b JOIN jobs j ON j.id = b.job_id
+                WHERE b.batch=? GROUP BY j.state""", (batch,))
+        counts = {'queued': 0, 'leased': 0, 'done': 0, 'failed': 0}
+        counts.update({state: n for state, n in rows})
+        return counts
+
+    def next_due(self):
+        """
+        Earliest time a queued job becomes due or a lease runs out, or None when
+        nothing is queued or leased (the queue is drained).
+        """
+        row = self._read("""
+            SELECT MIN(CASE WHEN state='queued' THEN available_at ELSE lease_until END) FROM jobs
+            WHERE state IN ('queued', 'leased')""")
+        return row[0][0]
+
+    def results(self, batch):
+        """[(state, result or None, error or None)] for a batch, in submission order."""
+        rows = self._read("""
+            SELECT j.state, j.result, j.error FROM batch_jobs b JOIN jobs j ON j.id = b.job_id
+            WHERE b.batch=? ORDER BY b.position""", (batch,))
+        out = []
+        for r in rows:
+            state, result, error = r['state'], None, r['error']
+            if r['result'] is not None:
+                try:
+                    result = decode_result(r['result'])
+                except (ValueError, KeyError, TypeError) as e:
+                    state, error = 'failed', f"unreadable result: {e}"
+            out.append((state, result, error))
+        return out
+
+    def gather(self, batch, timeout=None, poll_s=POLL_S, raise_errors=True):
+        """
+        Wait until every job of the batch is done or failed; return the results in
+        submission order. A failed job raises JobFailed, or with raise_errors=False
+        is returned as a JobFailed instance in its place.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            counts = self.status(batch)
+            if counts['queued'] == counts['leased'] == 0: break
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError(f"Batch {batch} unfinished after {timeout}s: {counts}")
+            time.sleep(poll_s)
+        out = []
+        for state, result, error in self.results(batch):
+            if state == 'failed':
+                if raise_errors: raise JobFailed(error)
+                result = JobFailed(error)
+            out.append(result)
+        return out
+
+    # --- Worker side ---
+    def lease(self, owner):
+        """
+        Claim the next runnable job for `owner`: queued and due, or leased by a worker
+        whose lease ran out. Jobs naming an unregistered task are failed, never run.
+        Returns {'id', 'fn', 'kwargs', 'attempts'} or None.
+        """
+        now = time.time()
+        tasks = sorted(REGISTERED_TASKS)
+        marks = ",".join("?" * len(tasks))
+        with self._tx() as conn:
+            conn.execute(f"""
+                UPDATE jobs SET state='failed', error='unregistered task', lease_owner=NULL, updated_at=?
+                WHERE state IN ('queued', 'leased') AND fn NOT IN ({marks})""", (now, *tasks))
+            # Expired leases that used their last attempt fail instead of running again
+            conn.execute("""
+                UPDATE jobs SET state='failed', error=COALESCE(error, 'lease expired'), lease_owner=NULL, updated_at=?
+                WHERE state='leased' AND lease_until < ? AND attempts >= max_attempts""", (now, now))
+            row = conn.execute("""
+                SELECT id, fn, kwargs, attempts FROM jobs
+                WHERE (state='queued' AND available_at <= ?) OR (state='leased' AND lease_until < ?)
+                ORDER BY available_at LIMIT 1""", (now, now)).fetchone()
+            if row is None: return None
+            conn.execute("""
+                UPDATE jobs SET state='leased', lease_owner=?, lease_until=?, attempts=attempts+1, updated_at=?
+                WHERE id=?""", (owner, now + self.lease_s, now, row['id']))
+        incr("work_queue.leased")
+        return {'id': row['id'], 'fn': row['fn'], 'kwargs': json.loads(row['kwargs']), 'attempts': row['attempts'] + 1}
+
+    def _update_leased(self, jid, owner, sql, params):
+        """Apply an update only while `owner` still holds the lease. Returns False if it was lost."""
+        with self._tx() as conn:
+            cur = conn.execute(sql + " WHERE id=? AND state='leased' AND lease_owner=?", (*params, jid, owner))
+            return cur.rowcount == 1
+
+    def renew(self, jid, owner):
+        now = time.time()
+        return self._update_leased(jid, owner, "UPDATE jobs SET lease_until=?, updated_at=?", (now + self.lease_s, now))
+
+    def complete(self, jid, owner, result):
+        """Store the result (JSON; raises TypeError for values encode_result cannot hold)."""
+        text = encode_result(result)
+        return self._update_leased(jid, owner, """
+            UPDATE jobs SET state='done', result=?, error=NULL, lease_owner=NULL, updated_at=?""", (text, time.time()))
+
+    def fail(self, jid, owner, error):
+        """Record an error: back to the queue after a backoff, or failed after the last attempt."""
+        now = time.time()
+        return self._update_leased(jid, owner, """
+            UPDATE jobs SET
+                state=CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'queued' END,
+                available_at=? + ? * (1 << (attempts - 1)), error=?, lease_owner=NULL, updated_at=?""",
+            (now, self.retry_backoff_s, error, now))
+
+# === WORKERS ===
+def _heartbeat(queue, jid, owner, stop):
+    while not stop.wait(queue.lease_s / 3):
+        if not queue.renew(jid, owner):
+            logger.warning("Lost the lease on job %s", jid[:12])
+            return
+
+def run_worker(queue=None, owner=None, max_jobs=None, exit_when_idle=False, poll_s=POLL_S):
+    """
+    Lease and run jobs until max_jobs have run (or, with exit_when_idle, nothing is
+    queued or leased any more: jobs waiting out a retry backoff or held by another
+    worker keep it running). Returns the number of jobs run.
+    """
+    queue = queue or WorkQueue()
+    owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+    ran = 0
+    while max_jobs is None or ran < max_jobs:
+        job = queue.lease(owner)
+        if job is None:
+            due = queue.next_due()
+            if due is None and exit_when_idle: break
+            # Sleep until the next retry or lease expiry, polling for new work meanwhile
+            time.sleep(poll_s if due is None else min(poll_s, max(due - time.time(), 0.05)))
+            continue
+
+        stop = threading.Event()
+        beat = threading.Thread(target=_heartbeat, args=(queue, job['id'], owner, stop), daemon=True)
+        beat.start()
+        try:
+            with span("work_queue.job", fn=job['fn'], attempt=job['attempts']):
+                result = resolve(job['fn'])(**job['kwargs'])
+            stored = queue.complete(job['id'], owner, result)
+        except Exception as e:
+            logger.warning("Job %s (%s) failed on attempt %d: %s", job['id'][:12], job['fn'], job['attempts'], e)
+            incr("work_queue.failed_attempts")
+            queue.fail(job['id'], owner, f"{type(e).__name__}: {e}")
+        else:
+            if stored:
+                incr("work_queue.completed")
+            else:
+                logger.warning("Result of job %s dropped: its lease went to another worker", job['id'][:12])
+        finally:
+            stop.set()
+            beat.join()
+        ran += 1
+    return ran
+
+# === BACKTEST JOBS ===
+def backtest_task(**spec):
+    """
+    One backtest_cli run spec (weights, start, end, budget, ...) ->
+    run_portfolio_backtest(..., daily=True) result, or None without data.
+    """
+    from backtest import run_portfolio_backtest
+    from backtest_cli import normalize_run
+    from data_handler import fetch_data
+    run = normalize_run(spec, 0)
+    panel = fetch_data(list(run['weights']), run['start'].to_pydatetime(), run['end'].to_pydatetime(), as_panel=True)
+    return run_portfolio_backtest(panel, run['weights'], run['budget'], run['initial'], run['rebalance'],
+                                  run['frequency'], daily=True)
+
+def submit_backtests(specs, queue=None, batch=None):
+    """
+    Queue backtest_cli run specs. Jobs are keyed on the spec, the strategy code version
+    and, for a range reaching past the last completed session, that session's date
+    (market_calendar.cache_window), so a finished job is reused only while its data is current.
+    """
+    from backtest_cli import normalize_run
+    from market_calendar import cache_window
+    from result_cache import strategy_code_version
+    queue = queue or WorkQueue()
+    code = strategy_code_version()
+    calls = []
+    for i, spec in enumerate(specs):
+        run = normalize_run(spec, i)  # reject bad specs before anything is queued
+        data_version = cache_window(run['start'], run['end'])[2]
+        calls.append((BACKTEST_TASK, spec, code if data_version is None else f"{code}:{data_version}"))
+    return queue.submit_batch(calls, batch)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Shared work queue for Smart DCA research jobs.")
+    parser.add_argument("--db", default=str(WORK_QUEUE_DB), help="Queue database path")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("submit", help="Queue the backtests of a backtest_cli batch file")
+    p.add_argument("file", help="JSON/JSONL run specs (see backtest_cli.py)")
+    p.add_argument("--batch", help="Batch id (default: random)")
+    p = sub.add_parser("worker", help="Run jobs")
+    p.add_argument("--max-jobs", type=int)
+    p.add_argument("--exit-when-idle", action="store_true", help="Stop once nothing is queued or leased")
+    p = sub.add_parser("status", help="Job counts per state")
+    p.add_argument("--batch")
+    args = parser.parse_args(argv)
+
+    queue = WorkQueue(args.db)
+    if args.command == "submit":
+        from backtest_cli import load_batch
+        try:
+            batch, ids = submit_backtests(load_batch(args.file), queue, args.batch)
+        except (ValueError, KeyError, OSError) as e:
+            parser.error(str(e))
+        print(f"Queued {len(ids)} job(s) as batch {batch}")
+    elif args.command == "worker":
+        print(f"Ran {run_worker(queue, max_jobs=args.max_jobs, exit_when_idle=args.exit_when_idle)} job(s)")
+    else:
+        counts = queue.status(args.batch)
+        print(json.dumps(counts))
+        if counts['failed']:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()